@@ -0,0 +1,14 @@
+"""
+Puts Homework2/tech_prototype on sys.path for the modules the filters share
+with the app: metrics.py and the stores the ingest hooks keep up to date.
+Import it before any of them:
+
+    import app_modules
+    import metrics
+"""
+import sys
+from pathlib import Path
+
+TECH_PROTOTYPE_PATH = Path(__file__).resolve().parent.parent.parent / "Homework2" / "tech_prototype"
+if str(TECH_PROTOTYPE_PATH) not in sys.path:
+    sys.path.append(str(TECH_PROTOTYPE_PATH))
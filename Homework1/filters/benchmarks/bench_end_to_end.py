@@ -0,0 +1,311 @@
+"""
+End-to-end benchmark: filter1 -> filter2 -> filter3 ingest from a local MSE
+stand-in (mse_standin.py), then the Flask API under load, on synthetic
+histories of N issuers x Y years. Nothing touches mse.mk or the real
+databases; everything is written to a temporary folder.
+
+Stages:
+  ingest    pipeline.run_pipeline() against the stand-in, then a second run
+            with nothing new to fetch (the daily re-run)
+  parse     table_parser.parse_rows over every yearly page of every issuer
+  write     IngestPipeline inserting those rows into an empty database,
+            without and with the post-commit hooks (derived stores)
+  api       /api/stock_data and /api/technical_analysis at 1, 8 and 32
+            concurrent clients (response cache off unless --cache)
+
+The results are printed and, with --report, written as JSON (flat metric
+names, plus the commit, machine and settings) so two versions can be
+compared. --compare prints the change of every metric against an older
+report and exits with 1 if any got worse by more than --threshold percent.
+
+Usage:
+    python benchmarks/bench_end_to_end.py                               # 20 issuers x 3 years
+    python benchmarks/bench_end_to_end.py --issuers 100 --years 10 --report new.json
+    python benchmarks/bench_end_to_end.py --compare old.json --report new.json
+    python benchmarks/bench_end_to_end.py --latency 0.05 --error-rate 0.05   # a slow, flaky site
+
+filter2 fetches at most the last 10 years, so --years above 10 only makes
+the stand-in bigger.
+"""
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+FILTERS = Path(__file__).resolve().parent.parent
+TECH_PROTOTYPE = FILTERS.parent.parent / "Homework2" / "tech_prototype"
+sys.path.insert(0, str(FILTERS))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+sys.path.append(str(TECH_PROTOTYPE))
+sys.path.append(str(TECH_PROTOTYPE / "benchmarks"))
+
+import fetch_engine
+import filter1
+import filter2
+import filter3
+import pipeline
+from ingest_pipeline import IngestPipeline
+from mse_standin import MSEStandIn
+from table_parser import parse_rows
+
+CLIENTS = (1, 8, 32)
+SECONDS = 5.0
+THRESHOLD = 10.0        # percent
+
+def quiet():
+    """The filters print a line per issuer and per row; keep them out of the report."""
+    return contextlib.redirect_stdout(io.StringIO())
+
+def count_rows(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM stock_data").fetchone()[0]
+    finally:
+        conn.close()
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q / 100 * len(values)))]
+
+def bench_ingest(standin, directory, workers):
+    stock_db = directory / "stock_data.db"
+    filter1.ISSUERS_URL = standin.base_url + "avk"
+    filter2.BASE_URL = filter3.BASE_URL = standin.base_url
+    filter1.PUBLISHERS_DB = filter2.PUBLISHERS_DB = directory / "publishers.db"
+    filter2.STOCK_DB = filter3.DB_PATH = stock_db
+    filter2.LAST_DATES_PATH = filter3.LAST_DATES_PATH = directory / "last_dates.json"
+
+    metrics = {}
+    for run in ("ingest", "ingest_rerun"):
+        standin.reset_counts()
+        rows_before = count_rows(stock_db) if stock_db.exists() else 0
+        started = time.perf_counter()
+        with quiet():
+            result = pipeline.run_pipeline(workers)
+        seconds = time.perf_counter() - started
+        rows = count_rows(stock_db) - rows_before
+        counts = dict(standin.counts)
+        metrics[f"{run}_seconds"] = seconds
+        metrics[f"{run}_rows"] = rows
+        metrics[f"{run}_pages"] = counts["pages"]
+        metrics[f"{run}_server_errors"] = counts["errors"]
+        if run == "ingest":
+            metrics["ingest_rows_per_s"] = rows / seconds
+            metrics["ingest_pages_per_s"] = counts["pages"] / seconds
+            metrics["ingest_mb_per_s"] = counts["bytes"] / 1e6 / seconds
+            for stage, stage_seconds in result["stage_seconds"].items():
+                if stage != "total":
+                    metrics[f"ingest_{stage}_seconds"] = stage_seconds
+    return stock_db, metrics
+
+def yearly_pages(standin):
+    """Every issuer's history as the yearly pages filter2 fetches."""
+    today = date.today()
+    pages = []
+    for code in standin.codes:
+        first = standin.histories[code][0][0]
+        start = first
+        while start <= today:
+            end = min(start + timedelta(days=365), today)
+            pages.append((code, standin.results_page(code, start, end)[0]))
+            start = end + timedelta(days=1)
+    return pages
+
+def bench_parse(standin):
+    pages = yearly_pages(standin)
+    started = time.perf_counter()
+    parsed = [(code, parse_rows(page)) for code, page in pages]
+    seconds = time.perf_counter() - started
+    rows = sum(len(data) for _, data in parsed)
+    return parsed, {
+        "parse_pages": len(pages),
+        "parse_ms_per_page": seconds * 1000 / len(pages),
+        "parse_rows_per_s": rows / seconds,
+    }
+
+def bench_write(parsed, directory):
+    metrics = {}
+    for label, hooks in (("write", []), ("write_hooks", None)):
+        db_path = directory / f"{label}.db"
+        with quiet():
+            ingest = IngestPipeline(db_path, report_every=0, hooks=hooks)
+            started = time.perf_counter()
+            with ingest:
+                for code, data in parsed:
+                    ingest.put(code, [(code,) + row for row in data])
+            seconds = time.perf_counter() - started
+        metrics[f"{label}_rows_per_s"] = ingest.rows_written / seconds
+        metrics[f"{label}_transactions"] = ingest.transactions
+    return metrics
+
+def bench_api(stock_db, publishers_db, clients, seconds, cache):
+    from werkzeug.serving import make_server
+
+    import app as app_module
+    import technical_analysis
+    from analysis_pool import AnalysisPool
+    from load_test import endpoints, run_clients
+    from response_cache import ResponseCache
+
+    app_module.STOCK_DB_PATH = technical_analysis.STOCK_DB_PATH = stock_db
+    app_module.PUBLISHERS_DB_PATH = publishers_db
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    if not cache:
+        app_module.response_cache = ResponseCache(max_entries=0)
+    # queue rather than reject past the pending limit: measure throughput, not 503s
+    app_module.analysis_pool = AnalysisPool(saturation="queue").start()
+    app_module.init_db()
+
+    server = make_server("127.0.0.1", 0, app_module.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+    metrics = {}
+    try:
+        urls = endpoints(stock_db)
+        for endpoint in ("stock_data", "technical_analysis"):
+            run_clients(base, urls[endpoint], 1, min(seconds, 1.0))     # warm up
+            for n in clients:
+                latencies = []
+                rate, errors = run_clients(base, urls[endpoint], n, seconds, latencies)
+                name = f"api_{endpoint}_c{n}"
+                metrics[f"{name}_req_per_s"] = rate
+                metrics[f"{name}_p50_ms"] = percentile(latencies, 50) * 1000
+                metrics[f"{name}_p95_ms"] = percentile(latencies, 95) * 1000
+                metrics[f"{name}_errors"] = errors
+    finally:
+        server.shutdown()
+        app_module.analysis_pool.shutdown()
+    return metrics
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=FILTERS,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def direction(metric):
+    """+1 if higher is better, -1 if lower is better, 0 for plain counts."""
+    if metric.endswith("_per_s"):
+        return 1
+    if metric.endswith(("_seconds", "_ms")):
+        return -1
+    return 0
+
+def compare(old, new, threshold):
+    """Print every metric against the old report; returns the regressed ones."""
+    print(f"\nCompared with {old.get('commit') or '?'} ({old.get('created', '?')})")
+    if old.get("config") != new["config"]:
+        print("  note: the reports were made with different settings")
+    regressions = []
+    for metric, value in new["metrics"].items():
+        before = old["metrics"].get(metric)
+        if before is None:
+            continue
+        if not before:
+            print(f"  {metric:40s} {before:12.2f} -> {value:12.2f}")
+            continue
+        change = (value - before) / before * 100
+        sign = direction(metric)
+        worse = sign and -sign * change > threshold
+        if worse:
+            regressions.append(metric)
+        print(f"  {metric:40s} {before:12.2f} -> {value:12.2f}  {change:+7.1f}%"
+              + ("  REGRESSION" if worse else ""))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--issuers", type=int, default=20)
+    parser.add_argument("--years", type=float, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per page")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of 503 answers")
+    parser.add_argument("--backoff", type=float, default=fetch_engine.BACKOFF,
+                        help="fetch retry backoff in seconds")
+    parser.add_argument("--workers", type=int, default=pipeline.WORKERS)
+    parser.add_argument("--clients", type=int, nargs="+", default=list(CLIENTS))
+    parser.add_argument("--seconds", type=float, default=SECONDS, help="per API run")
+    parser.add_argument("--cache", action="store_true", help="keep the response cache on")
+    parser.add_argument("--skip-api", action="store_true")
+    parser.add_argument("--report", type=Path, help="write the results as JSON")
+    parser.add_argument("--compare", type=Path, help="an older JSON report")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                        help="percent change counted as a regression")
+    args = parser.parse_args()
+
+    config = {key: value for key, value in vars(args).items()
+              if key not in ("report", "compare", "threshold")}
+    standin = MSEStandIn(args.issuers, args.years, seed=args.seed,
+                         latency=args.latency, error_rate=args.error_rate).start()
+    fetch_engine.get_engine(backoff=args.backoff)
+    print(f"{args.issuers} issuers x {args.years:g} years = {standin.rows} rows, "
+          f"stand-in at {standin.base_url}")
+
+    # price arrays go next to each temporary database, never to a configured folder
+    os.environ.pop("PRICE_ARRAYS_DIR", None)
+    metrics = {}
+    with tempfile.TemporaryDirectory() as folder:
+        directory = Path(folder)
+        stock_db, found = bench_ingest(standin, directory, args.workers)
+        metrics.update(found)
+        print(f"ingest    {metrics['ingest_rows']} rows in {metrics['ingest_seconds']:.2f}s "
+              f"({metrics['ingest_rows_per_s']:.0f} rows/s, {metrics['ingest_pages_per_s']:.1f} pages/s, "
+              f"{metrics['ingest_server_errors']} 503s); re-run {metrics['ingest_rerun_seconds']:.2f}s")
+
+        parsed, found = bench_parse(standin)
+        metrics.update(found)
+        print(f"parse     {metrics['parse_ms_per_page']:.2f} ms/page, "
+              f"{metrics['parse_rows_per_s']:.0f} rows/s")
+
+        metrics.update(bench_write(parsed, directory))
+        print(f"write     {metrics['write_rows_per_s']:.0f} rows/s, "
+              f"{metrics['write_hooks_rows_per_s']:.0f} rows/s with the ingest hooks")
+        standin.stop()
+
+        if not args.skip_api:
+            found = bench_api(stock_db, filter1.PUBLISHERS_DB, args.clients, args.seconds, args.cache)
+            metrics.update(found)
+            for endpoint in ("stock_data", "technical_analysis"):
+                print(f"/api/{endpoint}")
+                for n in args.clients:
+                    name = f"api_{endpoint}_c{n}"
+                    errors = metrics[f"{name}_errors"]
+                    print(f"  {n:3d} clients {metrics[f'{name}_req_per_s']:8.1f} req/s  "
+                          f"p50 {metrics[f'{name}_p50_ms']:7.1f} ms  p95 {metrics[f'{name}_p95_ms']:7.1f} ms"
+                          + (f"  ({errors} errors)" if errors else ""))
+
+    report = {
+        "commit": git_commit(),
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "config": config,
+        "metrics": {k: round(v, 4) if isinstance(v, float) else v for k, v in metrics.items()},
+    }
+    if args.report:
+        args.report.write_text(json.dumps(report, indent=2))
+        print(f"Report written to {args.report}")
+    if args.compare:
+        regressions = compare(json.loads(args.compare.read_text()), report, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} metrics regressed by more than {args.threshold:g}%")
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
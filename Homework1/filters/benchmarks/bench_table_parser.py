@@ -0,0 +1,100 @@
+"""
+Parse time per page and peak memory of every table_parser backend.
+
+Usage:
+    python benchmarks/bench_table_parser.py                 # synthetic MSE-like pages
+    python benchmarks/bench_table_parser.py saved_pages/    # a folder of saved *.html pages
+
+Saved pages can be produced with e.g.
+    curl "https://www.mse.mk/mk/stats/symbolhistory/ALK?FromDate=01.01.2023&ToDate=31.12.2023" > ALK_2023.html
+"""
+import random
+import sys
+import time
+import tracemalloc
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from table_parser import BACKENDS, parse_rows
+
+ROWS_PER_PAGE = 250     # about one trading year
+PAGES = 20
+REPEAT = 3
+
+def euro(value):
+    return f"{value:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.')
+
+def make_page(rows, seed=0):
+    """An MSE symbolhistory-like page: site chrome plus one resultsTable."""
+    rnd = random.Random(seed)
+    day = date(2015, 1, 1)
+    price = rnd.uniform(500, 30000)
+    body = []
+    for _ in range(rows):
+        day += timedelta(days=1)
+        price *= 1 + rnd.uniform(-0.03, 0.03)
+        qty = rnd.randint(1, 5000)
+        qty_str = f"{qty:,}".replace(',', '.')
+        body.append(
+            "<tr>"
+            f"<td>{day.strftime('%d.%m.%Y')}</td><td>{euro(price)}</td>"
+            f"<td>{euro(price * 1.01)}</td><td>{euro(price * 0.99)}</td>"
+            f"<td>{euro(price)}</td><td>{euro(rnd.uniform(-3, 3))}</td>"
+            f"<td>{qty_str}</td><td>{euro(qty * price)}</td><td>{euro(qty * price)}</td>"
+            "</tr>"
+        )
+    chrome = "".join(
+        f"<div class='menu'><a href='/mk/page/{i}'>Линк {i}</a><span>&nbsp;</span></div>"
+        for i in range(300)
+    )
+    return (
+        "<!DOCTYPE html><html><head><title>Историја на симбол</title></head><body>"
+        f"{chrome}<select id='Code'><option value='ALK'>ALK</option></select>"
+        "<table id=\"resultsTable\" class=\"table table-bordered\"><thead><tr>"
+        "<th>Датум</th><th>Цена</th><th>Макс.</th><th>Мин.</th><th>Просечна цена</th>"
+        "<th>%пром.</th><th>Количина</th><th>Промет во БЕСТ</th><th>Вкупен промет</th>"
+        "</tr></thead><tbody>" + "".join(body) + "</tbody></table>"
+        f"{chrome}</body></html>"
+    )
+
+def load_pages(folder):
+    if folder:
+        return [p.read_text(encoding='utf-8') for p in sorted(Path(folder).glob('*.html'))]
+    return [make_page(ROWS_PER_PAGE, seed=i) for i in range(PAGES)]
+
+def bench(backend, pages):
+    best = float('inf')
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        for page in pages:
+            parse_rows(page, backend)
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    parse_rows(pages[0], backend)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best / len(pages), peak
+
+def main():
+    pages = load_pages(sys.argv[1] if len(sys.argv) > 1 else None)
+    if not pages:
+        print("No pages to parse.")
+        return
+
+    reference = parse_rows(pages[0], "bs4")
+    print(f"{len(pages)} pages, {len(reference)} rows on the first page")
+    print(f"{'backend':<10} {'ms/page':>10} {'peak KiB':>10}  matches bs4")
+    for backend in BACKENDS:
+        try:
+            per_page, peak = bench(backend, pages)
+        except ImportError as e:
+            print(f"{backend:<10} skipped ({e.name} not installed)")
+            continue
+        same = parse_rows(pages[0], backend) == reference
+        print(f"{backend:<10} {per_page * 1000:>10.2f} {peak / 1024:>10.0f}  {same}")
+
+if __name__ == '__main__':
+    main()
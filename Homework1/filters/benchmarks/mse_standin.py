@@ -0,0 +1,215 @@
+"""
+Local stand-in for https://www.mse.mk/mk/stats/symbolhistory/<code>.
+
+Serves synthetic market data in the shape the filters read:
+  - without FromDate: a symbol-history page with the issuer dropdown
+    (<select id="Code">) that filter1 reads, plus a few bond codes filter1 skips
+  - with FromDate / ToDate (dd.mm.yyyy): the resultsTable of the issuer's
+    trading days in that range, newest first, like the real site
+
+Every issuer's history is a random walk over the weekdays of the last `years`
+years (the same for the same seed); about 2% of the days have no max/min, as
+on the site. Rows are rendered once up front, so the server is not what a
+benchmark measures. `latency` (seconds per page) and `error_rate` (share of
+503 answers) imitate a slow or overloaded site.
+
+    server = MSEStandIn(issuers=20, years=3).start()
+    filter1.ISSUERS_URL = server.base_url + "avk"
+    filter2.BASE_URL = filter3.BASE_URL = server.base_url
+    ...
+    server.stop()
+
+Run this file directly to serve on a fixed port for manual testing:
+    python benchmarks/mse_standin.py [issuers] [years] [port]
+"""
+import bisect
+import random
+import sys
+import threading
+import time
+from datetime import date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from bench_table_parser import euro
+
+PATH = "/mk/stats/symbolhistory/"
+BONDS = ("RMDEN21", "RMDEN22")      # not alphabetic, filter1 skips them
+HEADER = (
+    "<thead><tr><th>Датум</th><th>Цена на последна трансакција</th><th>Мак.</th>"
+    "<th>Мин.</th><th>Просечна цена</th><th>%пром.</th><th>Количина</th>"
+    "<th>Промет во БЕСТ во денари</th><th>Вкупен промет во денари</th></tr></thead>"
+)
+CHROME = "".join(
+    f"<div class='menu'><a href='/mk/page/{i}'>Линк {i}</a><span>&nbsp;</span></div>"
+    for i in range(100)
+)
+
+def issuer_codes(n):
+    """n distinct alphabetic codes: AAA, AAB, ..."""
+    letters = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+    return [letters[i // 676 % 26] + letters[i // 26 % 26] + letters[i % 26] for i in range(n)]
+
+def synthetic_history(code, years, seed=0, today=None):
+    """(days, rows) of one issuer, oldest first: days as date objects, rows as
+    rendered <tr> strings."""
+    rnd = random.Random(f"{seed}:{code}")
+    today = today or date.today()
+    day = today - timedelta(days=round(365.25 * years))
+    price = rnd.uniform(100, 30000)
+    days, rows = [], []
+    while day <= today:
+        if day.weekday() < 5:
+            change = rnd.uniform(-0.03, 0.03)
+            price *= 1 + change
+            qty = rnd.randint(1, 5000)
+            if rnd.random() < 0.02:
+                high = low = ""
+            else:
+                high = euro(price * (1 + rnd.uniform(0, 0.02)))
+                low = euro(price * (1 - rnd.uniform(0, 0.02)))
+            qty_str = f"{qty:,}".replace(',', '.')
+            days.append(day)
+            rows.append(
+                "<tr>"
+                f"<td>{day.strftime('%d.%m.%Y')}</td><td>{euro(price)}</td>"
+                f"<td>{high}</td><td>{low}</td>"
+                f"<td>{euro(price)}</td><td>{euro(change * 100)}</td>"
+                f"<td>{qty_str}</td><td>{euro(qty * price)}</td><td>{euro(qty * price)}</td>"
+                "</tr>"
+            )
+        day += timedelta(days=1)
+    return days, rows
+
+def _parse_date(value):
+    return datetime.strptime(value, '%d.%m.%Y').date()
+
+class MSEStandIn:
+    def __init__(self, issuers=20, years=3, seed=0, latency=0.0, error_rate=0.0,
+                 host="127.0.0.1", port=0):
+        self.codes = issuer_codes(issuers)
+        self.histories = {code: synthetic_history(code, years, seed) for code in self.codes}
+        self.latency = latency
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.counts = {"pages": 0, "dropdowns": 0, "errors": 0, "bytes": 0, "rows": 0}
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}{PATH}"
+
+    @property
+    def rows(self):
+        """Number of trading days over all issuers."""
+        return sum(len(days) for days, _ in self.histories.values())
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def reset_counts(self):
+        with self.lock:
+            self.counts = dict.fromkeys(self.counts, 0)
+
+    def _count(self, **amounts):
+        with self.lock:
+            for name, amount in amounts.items():
+                self.counts[name] += amount
+
+    def dropdown_page(self):
+        options = "".join(f"<option value='{code}'>{code}</option>"
+                          for code in self.codes + list(BONDS))
+        return (
+            "<!DOCTYPE html><html><head><title>Историја на симбол</title></head><body>"
+            f"{CHROME}<select id='Code'><option value=''>-</option>{options}</select>"
+            f"{CHROME}</body></html>"
+        )
+
+    def results_page(self, code, from_date, to_date):
+        """(page, rows) for one issuer and date range; (None, 0) for an unknown code."""
+        if code not in self.histories:
+            return None, 0
+        days, rows = self.histories[code]
+        start = bisect.bisect_left(days, from_date)
+        end = bisect.bisect_right(days, to_date)
+        body = "".join(reversed(rows[start:end]))
+        return (
+            "<!DOCTYPE html><html><head><title>Историја на симбол</title></head><body>"
+            f"{CHROME}<table id=\"resultsTable\" class=\"table table-bordered\">{HEADER}"
+            f"<tbody>{body}</tbody></table>{CHROME}</body></html>"
+        ), end - start
+
+    def _handler(self):
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def send(self, status, body=b""):
+                self.send_response(status)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                query = parse_qs(url.query)
+                if not url.path.startswith(PATH):
+                    return self.send(404)
+                if standin.latency:
+                    time.sleep(standin.latency)
+                if "FromDate" not in query:
+                    body = standin.dropdown_page().encode()
+                    standin._count(dropdowns=1, bytes=len(body))
+                    return self.send(200, body)
+
+                with standin.lock:
+                    failing = standin.random.random() < standin.error_rate
+                if failing:
+                    standin._count(errors=1)
+                    return self.send(503)
+                code = query.get("Code", [url.path[len(PATH):]])[0]
+                try:
+                    from_date = _parse_date(query["FromDate"][0])
+                    to_date = _parse_date(query.get("ToDate", [date.today().strftime('%d.%m.%Y')])[0])
+                except ValueError:
+                    return self.send(400)
+                page, rows = standin.results_page(code, from_date, to_date)
+                if page is None:
+                    return self.send(404)
+                body = page.encode()
+                standin._count(pages=1, rows=rows, bytes=len(body))
+                self.send(200, body)
+
+        return Handler
+
+def main():
+    issuers = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    years = float(sys.argv[2]) if len(sys.argv) > 2 else 3
+    port = int(sys.argv[3]) if len(sys.argv) > 3 else 8765
+    standin = MSEStandIn(issuers, years, port=port)
+    print(f"{issuers} issuers, {standin.rows} rows at {standin.base_url}")
+    try:
+        standin.server.serve_forever()
+    except KeyboardInterrupt:
+        standin.stop()
+
+if __name__ == "__main__":
+    main()
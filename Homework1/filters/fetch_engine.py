@@ -0,0 +1,157 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# metrics.py is shared with the app (Homework2/tech_prototype)
+import app_modules
+import metrics
+
+BASE_URL = 'https://www.mse.mk/mk/stats/symbolhistory/'
+
+# Defaults for the shared engine; override via get_engine(...) / FetchEngine(...)
+MAX_PER_HOST = 8
+RETRIES = 3
+BACKOFF = 0.5        # seconds, doubled on every retry
+TIMEOUT = 30         # seconds per request
+RETRY_STATUSES = (500, 502, 503, 504)
+
+class AdaptiveLimit:
+    """Per-host concurrency limit.
+
+    Halves on a 5xx / timeout and grows back by one after `limit` successes
+    in a row, never above the configured maximum.
+    """
+    def __init__(self, max_limit, min_limit=1):
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.limit = max_limit
+        self.in_flight = 0
+        self.successes = 0
+        self.cond = threading.Condition()
+
+    def acquire(self):
+        with self.cond:
+            while self.in_flight >= self.limit:
+                self.cond.wait()
+            self.in_flight += 1
+
+    def release(self, ok):
+        with self.cond:
+            self.in_flight -= 1
+            if ok:
+                self.successes += 1
+                if self.successes >= self.limit and self.limit < self.max_limit:
+                    self.limit += 1
+                    self.successes = 0
+            else:
+                self.limit = max(self.min_limit, self.limit // 2)
+                self.successes = 0
+            self.cond.notify_all()
+
+class FetchEngine:
+    """Shared keep-alive HTTP client for the filters.
+
+    One requests.Session (connection pool per host), an adaptive per-host
+    concurrency limit and retry with exponential backoff on 5xx / timeouts.
+    """
+    def __init__(self, base_url=BASE_URL, max_per_host=MAX_PER_HOST,
+                 retries=RETRIES, backoff=BACKOFF, timeout=TIMEOUT):
+        self.base_url = base_url
+        self.max_per_host = max_per_host
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max_per_host)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self.limits = {}
+        self.limits_lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=max_per_host)
+
+    def _limit_for(self, url):
+        host = urlsplit(url).netloc
+        with self.limits_lock:
+            if host not in self.limits:
+                self.limits[host] = AdaptiveLimit(self.max_per_host)
+            return self.limits[host]
+
+    def get(self, url, params=None, stream=False):
+        """GET with retries. Returns the Response, or None if every attempt failed.
+
+        With stream=True only the headers have been read; the caller reads
+        the body (iter_content) and closes the response.
+        """
+        limit = self._limit_for(url)
+        for attempt in range(self.retries + 1):
+            limit.acquire()
+            ok = False
+            response = None
+            started = time.perf_counter()
+            try:
+                response = self.session.get(url, params=params, timeout=self.timeout, stream=stream)
+                ok = response.status_code not in RETRY_STATUSES
+            except (requests.Timeout, requests.ConnectionError) as e:
+                print(f"Request to {url} failed ({e.__class__.__name__}), attempt {attempt + 1}")
+            finally:
+                limit.release(ok)
+                metrics.observe("mse_fetch_seconds", time.perf_counter() - started,
+                                status=response.status_code if response is not None else "error")
+            if ok:
+                return response
+            if attempt < self.retries:
+                metrics.count("mse_fetch_retries_total")
+                time.sleep(self.backoff * (2 ** attempt))
+        metrics.count("mse_fetch_failures_total")
+        return response
+
+    def fetch_stock_data(self, publisher_code, from_date, to_date, base_url=None):
+        params = {'FromDate': from_date, 'ToDate': to_date, 'Code': publisher_code}
+        response = self.get((base_url or self.base_url) + publisher_code, params=params)
+        if response is not None and response.status_code == 200:
+            return response.text
+        status = response.status_code if response is not None else "no response"
+        print(f"Error fetching data for {publisher_code}. Status code: {status}")
+        return None
+
+    def fetch_windows(self, publisher_code, windows, base_url=None):
+        """Fetch every (from_date, to_date) window of one issuer at the same time.
+
+        Returns the html pages (or None) in the same order as `windows`.
+        """
+        futures = [
+            self.executor.submit(self.fetch_stock_data, publisher_code, from_date, to_date, base_url)
+            for from_date, to_date in windows
+        ]
+        return [future.result() for future in futures]
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        self.session.close()
+
+def yearly_windows(from_date, to_date, days=365):
+    """Split [from_date, to_date] into 'dd.mm.yyyy' windows the MSE site accepts."""
+    windows = []
+    while from_date < to_date:
+        end_date = min(from_date + timedelta(days=days), to_date)
+        windows.append((from_date.strftime('%d.%m.%Y'), end_date.strftime('%d.%m.%Y')))
+        from_date = end_date + timedelta(days=1)
+    return windows
+
+_engine = None
+_engine_lock = threading.Lock()
+
+def get_engine(**kwargs):
+    """Process-wide engine so every filter shares the same connection pool."""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = FetchEngine(**kwargs)
+        return _engine
@@ -1,30 +1,67 @@
-import requests
-from bs4 import BeautifulSoup
 import sqlite3
+from html.parser import HTMLParser
 from pathlib import Path
-import subprocess
 
-def fetch_publisher_codes():
-    url = 'https://www.mse.mk/mk/stats/symbolhistory/avk'
-    response = requests.get(url)
-    if response.status_code != 200:
+from fetch_engine import get_engine
+
+THIS_FOLDER = Path(__file__).parent.resolve()
+# Go UP two levels to the project root, then down into Homework2/tech_prototype
+TECH_PROTOTYPE_PATH = THIS_FOLDER.parent.parent / "Homework2" / "tech_prototype"
+PUBLISHERS_DB = TECH_PROTOTYPE_PATH / "publishers.db"
+
+ISSUERS_URL = 'https://www.mse.mk/mk/stats/symbolhistory/avk'
+CHUNK_SIZE = 16 * 1024      # bytes of the issuers page parsed at a time
+
+class CodeParser(HTMLParser):
+    """Collects the option values of <select id="Code"> as the page is fed."""
+    def __init__(self):
+        super().__init__()
+        self.codes = []
+        self.in_dropdown = False
+        self.done = False
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == 'select' and attrs.get('id') == 'Code':
+            self.in_dropdown = True
+        elif tag == 'option' and self.in_dropdown:
+            value = attrs.get('value')
+            if value and value.isalpha():
+                self.codes.append(value)
+
+    def handle_endtag(self, tag):
+        if tag == 'select' and self.in_dropdown:
+            self.in_dropdown = False
+            self.done = True
+
+def iter_publisher_codes():
+    """Yield issuer codes from the dropdown as the page is downloaded and
+    parsed, so the pipeline can start fetching the first issuers before the
+    rest of the page has arrived."""
+    response = get_engine().get(ISSUERS_URL, stream=True)
+    if response is None or response.status_code != 200:
         print("Failed to fetch issuers.")
-        return []
-    soup = BeautifulSoup(response.text, 'html.parser')
-    dropdown = soup.find('select', {'id': 'Code'})
-    publisher_codes = [
-        option.get('value') for option in dropdown.find_all('option')
-        if option.get('value') and option.get('value').isalpha()
-    ] if dropdown else []
-    return publisher_codes
+        if response is not None:
+            response.close()
+        return
+    response.encoding = response.encoding or 'utf-8'
+    parser = CodeParser()
+    try:
+        for chunk in response.iter_content(CHUNK_SIZE, decode_unicode=True):
+            if parser.done:
+                continue    # no codes after the dropdown; read to the end so
+                            # the connection goes back to the pool
+            parser.feed(chunk)
+            yield from parser.codes
+            parser.codes.clear()
+    finally:
+        response.close()
 
-def save_to_database(publishers):
-    THIS_FOLDER = Path(__file__).parent.resolve()
-    # Go UP two levels to the project root, then down into Homework2/tech_prototype
-    TECH_PROTOTYPE_PATH = THIS_FOLDER.parent.parent / "Homework2" / "tech_prototype"
-    db_path = TECH_PROTOTYPE_PATH / "publishers.db"
+def fetch_publisher_codes():
+    return list(iter_publisher_codes())
 
-    conn = sqlite3.connect(db_path)
+def save_to_database(publishers):
+    conn = sqlite3.connect(PUBLISHERS_DB)
     cursor = conn.cursor()
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS publishers (
@@ -41,20 +78,10 @@ def save_to_database(publishers):
     conn.commit()
     conn.close()
 
-def call_filter2():
-    filter2_path = Path(__file__).parent / "filter2.py"
-    subprocess.run(["python", str(filter2_path)])
-
 def main():
-    publisher_codes = fetch_publisher_codes()
-    if publisher_codes:
-        print(f"Found {len(publisher_codes)} issuers.")
-        unique_codes = list(set(publisher_codes))
-        save_to_database(unique_codes)
-        print("Filter1 completed. Calling Filter2...")
-        call_filter2()
-    else:
-        print("No issuers found.")
+    # filter1 -> filter2 -> filter3 run in-process as overlapping stages
+    from pipeline import run_pipeline
+    run_pipeline()
 
 if __name__ == '__main__':
     main()
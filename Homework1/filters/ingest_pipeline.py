@@ -0,0 +1,194 @@
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from issuer_state import ensure_issuer_state, record_fetch, record_rows
+from stock_schema import ensure_stock_table, INSERT_STOCK_ROW
+
+# The app-side stores that are derived from stock_data live next to app.py,
+# and so does metrics.py
+import app_modules
+import metrics
+
+MAX_QUEUE = 64           # parsed pages waiting for the writer (back-pressure)
+BATCH_ROWS = 5000        # rows per write transaction
+REPORT_EVERY = 5.0       # seconds between progress lines
+
+_STOP = object()
+
+log = logging.getLogger(__name__)
+
+def default_hooks():
+    """Post-commit hooks that keep the derived stores in step with stock_data.
+
+    Each hook is called from the writer thread as hook(conn, touched) where
+    touched maps publisher_code -> oldest date written in that transaction.
+    """
+    import indicator_store
+    import price_arrays
+    import response_cache
+    import timeframes
+    # response_cache last: cached responses are dropped once the stores are current
+    return [indicator_store.on_ingest, timeframes.on_ingest, price_arrays.on_ingest,
+            response_cache.on_ingest]
+
+def configure_writer(conn):
+    # WAL lets the Flask app keep reading while we write; NORMAL is safe with WAL
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA cache_size=-65536")   # 64 MB
+    conn.execute("PRAGMA temp_store=MEMORY")
+
+class IngestPipeline:
+    """Producer/consumer ingest: many fetch/parse workers, ONE SQLite writer.
+
+    Workers call put(publisher_code, rows) with already-typed stock_data rows.
+    A single writer thread drains the bounded queue and inserts with
+    executemany inside large transactions, so threads never fight over the
+    SQLite write lock.
+    """
+    def __init__(self, db_path, max_queue=MAX_QUEUE, batch_rows=BATCH_ROWS,
+                 report_every=REPORT_EVERY, hooks=None):
+        self.db_path = db_path
+        self.hooks = default_hooks() if hooks is None else hooks
+        self.batch_rows = batch_rows
+        self.report_every = report_every
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.rows_written = 0
+        self.transactions = 0
+        self.busy_seconds = 0.0     # writer time in transactions and hooks
+        self.error = None
+        self.started_at = None
+        self.done = threading.Event()
+        self.writer = threading.Thread(target=self._write_loop, name="ingest-writer", daemon=True)
+        self.reporter = threading.Thread(target=self._report_loop, name="ingest-reporter", daemon=True)
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        self.writer.start()
+        if self.report_every:
+            self.reporter.start()
+        return self
+
+    def put(self, publisher_code, rows):
+        """Queue rows for writing. Blocks while the queue is full."""
+        if rows:
+            self.queue.put((publisher_code, rows, None))
+
+    def mark_fetched(self, publisher_code):
+        """Record in issuer_state that the issuer was fetched just now."""
+        fetched_at = datetime.now().isoformat(timespec='seconds')
+        self.queue.put((publisher_code, [], fetched_at))
+
+    def close(self):
+        """Flush everything still queued, stop the writer and print a summary.
+
+        The metrics this process recorded (fetch, parse, write) are added to
+        the ingest metrics file that /api/metrics serves.
+        """
+        self.queue.put(_STOP)
+        self.writer.join()
+        self.done.set()
+        if self.reporter.is_alive():
+            self.reporter.join()
+        self.report(final=True)
+        try:
+            metrics.flush(metrics.ingest_file(self.db_path))
+        except OSError as e:
+            print(f"Could not save the ingest metrics: {e}")
+        if self.error:
+            raise self.error
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def rows_per_second(self):
+        elapsed = time.perf_counter() - self.started_at if self.started_at else 0
+        return self.rows_written / elapsed if elapsed > 0 else 0.0
+
+    def report(self, final=False):
+        label = "Ingest finished" if final else "Ingest"
+        print(f"{label}: {self.rows_written} rows in {self.transactions} transactions, "
+              f"{self.rows_per_second():.0f} rows/s, queue depth {self.queue.qsize()}")
+
+    def _report_loop(self):
+        while not self.done.wait(self.report_every):
+            self.report()
+
+    def _next_batch(self):
+        """Block for one item, then take whatever else is ready up to batch_rows.
+
+        Returns (rows, fetch_marks, stopping).
+        """
+        rows, fetches = [], []
+        item = self.queue.get()
+        while item is not _STOP:
+            publisher_code, item_rows, fetched_at = item
+            rows.extend(item_rows)
+            if fetched_at:
+                fetches.append((publisher_code, fetched_at))
+            if len(rows) >= self.batch_rows:
+                return rows, fetches, False
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                return rows, fetches, False
+        return rows, fetches, True
+
+    def _run_hooks(self, conn, touched):
+        if not touched:
+            return
+        for hook in self.hooks:
+            try:
+                with metrics.span("mse_ingest_hook_seconds", hook=hook.__module__):
+                    hook(conn, touched)
+            except Exception:
+                # The rows are committed; a derived store can be rebuilt later
+                log.exception("Ingest hook %s.%s failed", hook.__module__, hook.__name__)
+
+    def _write_loop(self):
+        conn = None
+        try:
+            conn = sqlite3.connect(self.db_path)
+            configure_writer(conn)
+            ensure_stock_table(conn)
+            ensure_issuer_state(conn)
+            conn.commit()
+        except sqlite3.Error as e:
+            # Keep draining the queue below so producers never block forever
+            print(f"Writer could not open {self.db_path}: {e}")
+            self.error = e
+            conn = None
+
+        stopping = False
+        while not stopping:
+            batch, fetches, stopping = self._next_batch()
+            if (not batch and not fetches) or conn is None:
+                continue
+            busy_from = time.perf_counter()
+            try:
+                # Rows and the issuers' high-water marks commit together
+                with metrics.span("mse_ingest_write_seconds"), conn:
+                    conn.executemany(INSERT_STOCK_ROW, batch)
+                    touched = record_rows(conn, batch)
+                    for publisher_code, fetched_at in fetches:
+                        record_fetch(conn, publisher_code, fetched_at)
+            except sqlite3.Error as e:
+                print(f"Writer failed on a batch of {len(batch)} rows: {e}")
+                self.error = e
+                self.busy_seconds += time.perf_counter() - busy_from
+                continue
+            self.rows_written += len(batch)
+            metrics.count("mse_ingest_rows_total", len(batch))
+            self.transactions += 1
+            self._run_hooks(conn, touched)
+            self.busy_seconds += time.perf_counter() - busy_from
+
+        if conn is not None:
+            conn.close()
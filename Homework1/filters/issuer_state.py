@@ -0,0 +1,109 @@
+from datetime import datetime, time, timedelta
+
+# Per-issuer high-water mark, kept next to stock_data and updated by the
+# ingest writer in the same transaction as the rows themselves:
+#   last_date  - latest trading day stored (ISO 'YYYY-MM-DD')
+#   last_fetch - when every window of the issuer was last fetched (ISO timestamp)
+#   row_count  - rows stored for the issuer
+# A daily update reads this table instead of scanning stock_data.
+
+# The MSE session ends at 13:00; a day's bar is final after that
+MARKET_CLOSE = time(13, 0)
+CREATE_ISSUER_STATE = '''
+    CREATE TABLE IF NOT EXISTS issuer_state (
+        publisher_code TEXT PRIMARY KEY,
+        last_date TEXT,
+        last_fetch TEXT,
+        row_count INTEGER NOT NULL DEFAULT 0
+    )
+'''
+
+def ensure_issuer_state(conn):
+    """Create issuer_state, seeding it from stock_data the first time."""
+    conn.execute(CREATE_ISSUER_STATE)
+    if conn.execute("SELECT 1 FROM issuer_state LIMIT 1").fetchone() is None:
+        conn.execute('''
+            INSERT INTO issuer_state (publisher_code, last_date, row_count)
+            SELECT publisher_code, MAX(date), COUNT(*)
+            FROM stock_data
+            GROUP BY publisher_code
+        ''')
+
+def load_issuer_states(conn):
+    cursor = conn.execute(
+        "SELECT publisher_code, last_date, last_fetch, row_count FROM issuer_state"
+    )
+    return {
+        code: {"last_date": last_date, "last_fetch": last_fetch, "row_count": row_count}
+        for code, last_date, last_fetch, row_count in cursor.fetchall()
+    }
+
+def last_trading_day(now=None):
+    """The latest weekday whose session has closed, as 'YYYY-MM-DD'."""
+    now = now or datetime.now()
+    day = now.date()
+    if now.time() < MARKET_CLOSE:
+        day -= timedelta(days=1)
+    while day.weekday() >= 5:
+        day -= timedelta(days=1)
+    return day.isoformat()
+
+def is_current(state, now=None):
+    """True if the issuer has the bar of the last closed trading day, or was
+    completely fetched after that session closed (a holiday, or a day without
+    trades, leaves no bar to wait for).
+
+    A fetch before the close (or one that failed) does not count, so a later
+    run the same day still picks up the day's bar.
+    """
+    if not state:
+        return False
+    now = now or datetime.now()
+    trading_day = last_trading_day(now)
+    if (state.get("last_date") or "") >= trading_day:
+        return True
+    closed = datetime.combine(datetime.fromisoformat(trading_day), MARKET_CLOSE)
+    return (state.get("last_fetch") or "") >= closed.isoformat(timespec='seconds')
+
+def record_rows(conn, rows):
+    """Advance the high-water mark for the stock_data rows just written.
+
+    Must run in the writer's transaction. Rows past the old mark are counted
+    directly (the normal incremental case); if a batch rewrites older dates
+    the issuer's count is recomputed instead. Returns {publisher_code: oldest
+    date written}.
+    """
+    per_issuer = {}
+    for row in rows:
+        per_issuer.setdefault(row[0], set()).add(row[1])
+
+    for code, dates in per_issuer.items():
+        found = conn.execute(
+            "SELECT last_date FROM issuer_state WHERE publisher_code = ?", (code,)
+        ).fetchone()
+        old_mark = found[0] if found and found[0] else ""
+        new_mark = max(max(dates), old_mark)
+        if min(dates) > old_mark:
+            conn.execute('''
+                INSERT INTO issuer_state (publisher_code, last_date, row_count)
+                VALUES (?, ?, ?)
+                ON CONFLICT(publisher_code) DO UPDATE SET
+                    last_date = excluded.last_date,
+                    row_count = row_count + excluded.row_count
+            ''', (code, new_mark, len(dates)))
+        else:
+            conn.execute('''
+                INSERT INTO issuer_state (publisher_code, last_date, row_count)
+                VALUES (?, ?, (SELECT COUNT(*) FROM stock_data WHERE publisher_code = ?))
+                ON CONFLICT(publisher_code) DO UPDATE SET
+                    last_date = excluded.last_date,
+                    row_count = excluded.row_count
+            ''', (code, new_mark, code))
+    return {code: min(dates) for code, dates in per_issuer.items()}
+
+def record_fetch(conn, publisher_code, fetched_at):
+    conn.execute('''
+        INSERT INTO issuer_state (publisher_code, last_fetch)
+        VALUES (?, ?)
+        ON CONFLICT(publisher_code) DO UPDATE SET last_fetch = excluded.last_fetch
+    ''', (publisher_code, fetched_at))
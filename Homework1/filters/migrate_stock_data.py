@@ -0,0 +1,34 @@
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+from stock_schema import is_legacy_layout, migrate_stock_data
+
+THIS_FOLDER = Path(__file__).parent.resolve()
+TECH_PROTOTYPE_PATH = THIS_FOLDER.parent.parent / "Homework2" / "tech_prototype"
+STOCK_DB = TECH_PROTOTYPE_PATH / "stock_data.db"
+
+def main():
+    # Usage: python migrate_stock_data.py [path/to/stock_data.db]
+    db_path = Path(sys.argv[1]) if len(sys.argv) > 1 else STOCK_DB
+    if not db_path.exists():
+        print(f"{db_path} does not exist, nothing to migrate.")
+        return
+
+    conn = sqlite3.connect(db_path)
+    if not is_legacy_layout(conn):
+        print(f"{db_path} already uses the typed stock_data layout.")
+        conn.close()
+        return
+
+    start = time.perf_counter()
+    copied, skipped = migrate_stock_data(conn)
+    # Reclaim the space of the dropped TEXT table
+    conn.execute("VACUUM")
+    conn.close()
+    elapsed = time.perf_counter() - start
+    print(f"Migrated {copied} rows ({skipped} skipped, unparseable date) in {elapsed:.1f}s.")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+import re
+from datetime import datetime
+
+# Typed layout for stock_data:
+#   - date is stored as ISO-8601 'YYYY-MM-DD' so ORDER BY / MAX() follow time
+#   - prices and turnovers are REAL, quantity is INTEGER
+#   - (publisher_code, date) is the clustered primary key (WITHOUT ROWID)
+# Values scraped from mse.mk ('2.140,00', '06.10.2015') are parsed ONCE here,
+# at ingest, instead of on every API request.
+CREATE_STOCK_DATA = '''
+    CREATE TABLE IF NOT EXISTS stock_data (
+        publisher_code TEXT NOT NULL,
+        date TEXT NOT NULL,
+        price REAL,
+        max REAL,
+        min REAL,
+        avg REAL,
+        percent_change REAL,
+        quantity INTEGER,
+        best_turnover REAL,
+        total_turnover REAL,
+        PRIMARY KEY (publisher_code, date)
+    ) WITHOUT ROWID
+'''
+
+INSERT_STOCK_ROW = '''
+    INSERT OR REPLACE INTO stock_data (
+        publisher_code, date, price, max, min, avg,
+        percent_change, quantity, best_turnover, total_turnover
+    )
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+LEGACY_TABLE = "stock_data_legacy"
+
+# '1 234.50' as the old filter3 stored prices (see parse_mse_number)
+OLD_FILTER3_NUMBER = re.compile(r'-?\d{1,3}( \d{3})*\.\d{2}$')
+
+def parse_mse_date(date_str):
+    """'06.10.2015' -> '2015-10-06'. Already-ISO values are passed through."""
+    if date_str is None:
+        return None
+    date_str = str(date_str).strip()
+    for fmt in ('%d.%m.%Y', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(date_str, fmt).strftime('%Y-%m-%d')
+        except ValueError:
+            pass
+    return None
+
+def parse_mse_number(val_str):
+    """'2.140,00' -> 2140.0, '21.400' -> 21400.0, '' -> None.
+
+    Rows the old filter3 wrote went through its format_price first: dot
+    decimals with exactly two places and space thousands ('2.14',
+    '5 000.00'). mse.mk itself never has two digits after a dot, so those
+    are recognised by OLD_FILTER3_NUMBER and read as written.
+    """
+    if val_str is None:
+        return None
+    if isinstance(val_str, (int, float)):
+        return float(val_str)
+    s = str(val_str).strip().replace('\xa0', ' ')
+    if s in ("", "None", "nan"):
+        return None
+    if OLD_FILTER3_NUMBER.match(s):
+        s = s.replace(' ', '')
+    else:
+        s = s.replace('.', '').replace(',', '.')
+    try:
+        return float(s)
+    except ValueError:
+        return None
+
+def parse_mse_int(val_str):
+    number = parse_mse_number(val_str)
+    return None if number is None else int(round(number))
+
+def parse_cells(cells):
+    """Typed row from the 9 resultsTable cells, in stock_data column order:
+    (date, price, max, min, avg, percent_change, quantity, best_turnover, total_turnover)
+    """
+    return (
+        parse_mse_date(cells[0]),
+        parse_mse_number(cells[1]),
+        parse_mse_number(cells[2]),
+        parse_mse_number(cells[3]),
+        parse_mse_number(cells[4]),
+        parse_mse_number(cells[5]),
+        parse_mse_int(cells[6]),
+        parse_mse_number(cells[7]),
+        parse_mse_number(cells[8])
+    )
+
+def to_stock_row(publisher_code, cells):
+    """Turn the raw cells of one scraped row into a typed stock_data row."""
+    return (publisher_code,) + parse_cells(cells)
+
+def is_legacy_layout(conn):
+    """True if stock_data still has the old all-TEXT layout with an id column."""
+    cursor = conn.execute("PRAGMA table_info(stock_data)")
+    columns = {row[1]: row[2] for row in cursor.fetchall()}
+    return bool(columns) and ('id' in columns or columns.get('price') == 'TEXT')
+
+def ensure_stock_table(conn):
+    """Create stock_data in the typed layout, migrating a legacy table if found."""
+    if is_legacy_layout(conn):
+        migrate_stock_data(conn)
+    conn.execute(CREATE_STOCK_DATA)
+
+def migrate_stock_data(conn, batch_size=10000):
+    """Convert a legacy TEXT stock_data table into the typed layout in bulk.
+
+    Returns (rows_copied, rows_skipped). Rows whose date cannot be parsed are
+    skipped because they could never be ordered or analysed anyway.
+    """
+    copied = skipped = 0
+    with conn:
+        # BEGIN IMMEDIATE takes the write lock first, so the rename + copy + drop
+        # is all-or-nothing and a second caller sees the finished table
+        conn.execute("BEGIN IMMEDIATE")
+        if not is_legacy_layout(conn):
+            return 0, 0
+        conn.execute(f"DROP TABLE IF EXISTS {LEGACY_TABLE}")
+        conn.execute(f"ALTER TABLE stock_data RENAME TO {LEGACY_TABLE}")
+        conn.execute(CREATE_STOCK_DATA)
+
+        cursor = conn.execute(f'''
+            SELECT publisher_code, date, price, max, min, avg,
+                   percent_change, quantity, best_turnover, total_turnover
+            FROM {LEGACY_TABLE}
+        ''')
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            batch = []
+            for row in rows:
+                typed = to_stock_row(row[0], row[1:])
+                if typed[1] is None:
+                    skipped += 1
+                    continue
+                batch.append(typed)
+            conn.executemany(INSERT_STOCK_ROW, batch)
+            copied += len(batch)
+
+        conn.execute(f"DROP TABLE {LEGACY_TABLE}")
+    return copied, skipped
@@ -0,0 +1,85 @@
+import html as html_lib
+import re
+
+from stock_schema import parse_cells
+
+# Backend used by filter2/filter3. "tokenizer" needs nothing beyond the stdlib,
+# "lxml" needs the lxml package, "bs4" is the original BeautifulSoup parser and
+# stays as the reference implementation.
+DEFAULT_BACKEND = "tokenizer"
+
+TABLE_ID = "resultsTable"
+CELLS_PER_ROW = 9
+
+_ROW_RE = re.compile(r'<tr\b[^>]*>(.*?)</tr\s*>', re.S | re.I)
+_CELL_RE = re.compile(r'<td\b[^>]*>(.*?)</td\s*>', re.S | re.I)
+_TAG_RE = re.compile(r'<[^>]+>')
+_TABLE_RE = re.compile(r'<table\b[^>]*\bid\s*=\s*["\']?' + TABLE_ID + r'\b', re.I)
+
+def _clean(cell_html):
+    text = _TAG_RE.sub('', cell_html)
+    if '&' in text:
+        text = html_lib.unescape(text)
+    return text.strip()
+
+def _table_slice(html):
+    """Just the <table id="resultsTable">...</table> part of the page."""
+    # the id attribute itself: "#resultsTable" in a <style> or <script> does not count
+    match = _TABLE_RE.search(html)
+    if match is None:
+        return None
+    end = html.find('</table', match.end())
+    return html[match.start():end if end >= 0 else len(html)]
+
+def cells_tokenizer(html):
+    """Targeted tokenizer: only scans the resultsTable slice for <td> cells."""
+    table = _table_slice(html)
+    if table is None:
+        return
+    for row in _ROW_RE.finditer(table):
+        cells = [_clean(cell) for cell in _CELL_RE.findall(row.group(1))]
+        if cells:
+            yield cells
+
+def cells_lxml(html):
+    from lxml import html as lxml_html
+    root = lxml_html.fromstring(html)
+    for table in root.xpath(f'//table[@id="{TABLE_ID}"]'):
+        for row in table.iter('tr'):
+            cells = [td.text_content().strip() for td in row.findall('td')]
+            if cells:
+                yield cells
+
+def cells_bs4(html):
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, 'html.parser')
+    table = soup.find('table', {'id': TABLE_ID})
+    if not table:
+        return
+    for row in table.find_all('tr'):
+        cells = [td.text.strip() for td in row.find_all('td')]
+        if cells:
+            yield cells
+
+BACKENDS = {
+    "tokenizer": cells_tokenizer,
+    "lxml": cells_lxml,
+    "bs4": cells_bs4,
+}
+
+def iter_rows(html, backend=None):
+    """Yield typed rows (date, price, max, min, avg, percent_change, quantity,
+    best_turnover, total_turnover) from an MSE symbolhistory page.
+
+    Header rows, short rows and rows without a parseable date are skipped.
+    """
+    cells_fn = BACKENDS[backend or DEFAULT_BACKEND]
+    for cells in cells_fn(html):
+        if len(cells) < CELLS_PER_ROW:
+            continue
+        row = parse_cells(cells)
+        if row[0]:
+            yield row
+
+def parse_rows(html, backend=None):
+    return list(iter_rows(html, backend))
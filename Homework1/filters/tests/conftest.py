@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The filters are scripts run from this folder, not an installed package
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,75 @@
+import sqlite3
+from datetime import datetime, timedelta
+
+import filter2
+import filter3
+from ingest_pipeline import IngestPipeline
+from issuer_state import ensure_issuer_state, is_current, load_issuer_states
+from stock_schema import ensure_stock_table
+
+PAGE = """<table id="resultsTable"><tbody>
+<tr><td>{date}</td><td>2.140,00</td><td>2.150,00</td><td>2.100,00</td>
+<td>2.120,00</td><td>0,50</td><td>10</td><td>21.400</td><td>21.400</td></tr>
+</tbody></table>"""
+
+class FakeEngine:
+    """fetch_windows() answering from a list: a page or None (failed window)."""
+    def __init__(self, pages):
+        self.pages = pages
+        self.calls = []
+
+    def fetch_windows(self, publisher_code, windows, base_url=None):
+        self.calls.append(list(windows))
+        return [self.pages[i % len(self.pages)] for i in range(len(windows))]
+
+def issuer_state(db_path, publisher_code):
+    conn = sqlite3.connect(db_path)
+    ensure_stock_table(conn)
+    ensure_issuer_state(conn)
+    conn.commit()
+    state = load_issuer_states(conn).get(publisher_code)
+    conn.close()
+    return state
+
+def run_filters(db_path, monkeypatch, pages):
+    """filter2 then filter3 for one issuer, as run_pipeline() chains them."""
+    engine = FakeEngine(pages)
+    monkeypatch.setattr(filter2, "get_engine", lambda: engine)
+    monkeypatch.setattr(filter3, "get_engine", lambda: engine)
+    issuer_state(db_path, "ALK")    # creates the tables
+    with IngestPipeline(db_path, hooks=[], report_every=0) as pipeline:
+        _, last_date = filter2.process_publisher("ALK", None, pipeline)
+        if last_date is not None:
+            filter3.process_publisher("ALK", last_date, pipeline)
+    return last_date, engine
+
+def test_failed_window_leaves_issuer_not_current(tmp_path, monkeypatch):
+    # the window with the last trading days is the one that failed
+    month_ago = (datetime.now() - timedelta(days=30)).strftime("%d.%m.%Y")
+    last_date, engine = run_filters(tmp_path / "stock_data.db", monkeypatch,
+                                    [PAGE.format(date=month_ago), None])
+    assert last_date is None
+    assert len(engine.calls) == 1       # filter3 was not run for it
+    state = issuer_state(tmp_path / "stock_data.db", "ALK")
+    assert state is not None and state["row_count"] == 1
+    assert state["last_fetch"] is None
+    assert not is_current(state)
+
+def test_complete_fetch_marks_issuer(tmp_path, monkeypatch):
+    yesterday = (datetime.now() - timedelta(days=1)).strftime("%d.%m.%Y")
+    last_date, engine = run_filters(tmp_path / "stock_data.db", monkeypatch,
+                                    [PAGE.format(date=yesterday)])
+    assert last_date == datetime.now().strftime("%d.%m.%Y")
+    state = issuer_state(tmp_path / "stock_data.db", "ALK")
+    assert state["last_fetch"] is not None
+    assert is_current(state)
+
+def test_filter3_with_no_windows_does_not_mark(tmp_path, monkeypatch):
+    db_path = tmp_path / "stock_data.db"
+    engine = FakeEngine([None])
+    monkeypatch.setattr(filter3, "get_engine", lambda: engine)
+    issuer_state(db_path, "ALK")
+    with IngestPipeline(db_path, hooks=[], report_every=0) as pipeline:
+        filter3.process_publisher("ALK", datetime.now().strftime("%d.%m.%Y"), pipeline)
+    assert engine.calls == [[]]
+    assert issuer_state(db_path, "ALK") is None
@@ -0,0 +1,18 @@
+from filter1 import CodeParser
+
+PAGE = """<html><body><select id="Other"><option value="XYZ">x</option></select>
+<select id="Code" name="Code"><option value="">-</option><option value="ALK">ALK</option>
+<option value="RMDEN21">bond</option><option value="KMB" selected>KMB</option></select>
+<select><option value="TTK">after</option></select></body></html>"""
+
+def test_codes_arrive_as_the_page_is_fed():
+    parser = CodeParser()
+    seen = []
+    # 7 characters at a time: tags are split across chunks
+    for start in range(0, len(PAGE), 7):
+        parser.feed(PAGE[start:start + 7])
+        seen.append(list(parser.codes))
+    assert parser.codes == ["ALK", "KMB"]
+    assert parser.done
+    # ALK was there well before the dropdown ended
+    assert seen.index(["ALK"]) < seen.index(["ALK", "KMB"])
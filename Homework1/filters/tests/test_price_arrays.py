@@ -0,0 +1,32 @@
+import numpy as np
+
+import price_arrays
+from ingest_pipeline import IngestPipeline
+
+def bar(date, price):
+    return ("ALK", date, price, 10, price, price, price, 0.0, 1000.0, 1000.0)
+
+def ingest(db_path, rows):
+    with IngestPipeline(db_path, hooks=[price_arrays.on_ingest], report_every=0) as pipeline:
+        pipeline.put("ALK", rows)
+
+def test_updates_never_touch_mapped_generation(tmp_path, monkeypatch):
+    monkeypatch.setenv("PRICE_ARRAYS_DIR", str(tmp_path / "arrays"))
+    db_path = tmp_path / "stock_data.db"
+    ingest(db_path, [bar("2026-10-01", 1.0), bar("2026-10-02", 2.0)])
+    before = price_arrays.load(tmp_path / "arrays", "ALK")
+    mapped = {name: np.array(array) for name, array in before.items()}
+
+    ingest(db_path, [bar("2026-10-05", 5.0)])                    # append
+    ingest(db_path, [bar("2026-09-30", 0.5)])                    # before the stored bars
+    after = price_arrays.load(tmp_path / "arrays", "ALK")
+    assert after["close"].tolist() == [0.5, 1.0, 2.0, 5.0]
+    # the first mapping still reads what it mapped
+    for name, array in before.items():
+        assert np.array_equal(array, mapped[name])
+
+    directory = tmp_path / "arrays" / "ALK"
+    assert len(list(directory.glob("date.*.i4"))) == 3
+    assert price_arrays.prune(tmp_path / "arrays") == len(price_arrays.COLUMNS)
+    assert sorted(p.name for p in directory.glob("date.*.i4")) == ["date.2.i4", "date.3.i4"]
+    assert price_arrays.load(tmp_path / "arrays", "ALK")["close"].tolist() == [0.5, 1.0, 2.0, 5.0]
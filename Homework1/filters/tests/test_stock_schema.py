@@ -0,0 +1,52 @@
+import sqlite3
+
+import pytest
+
+from stock_schema import ensure_stock_table, is_legacy_layout, parse_mse_number
+
+# The all-TEXT table the old filter2 created (and the old filter3 appended to)
+LEGACY_STOCK_DATA = """
+    CREATE TABLE stock_data (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        publisher_code TEXT, date TEXT, price TEXT, max TEXT, min TEXT, avg TEXT,
+        percent_change TEXT, quantity TEXT, best_turnover TEXT, total_turnover TEXT,
+        UNIQUE(publisher_code, date) ON CONFLICT REPLACE
+    )
+"""
+
+@pytest.mark.parametrize("text, value", [
+    ("2.140,00", 2140.0),       # mse.mk
+    ("1.234.567,89", 1234567.89),
+    ("0,50", 0.5),
+    ("-1,23", -1.23),
+    ("21.400", 21400.0),        # mse.mk turnover, no decimals
+    ("2.14", 2.14),             # old filter3
+    ("5 000.00", 5000.0),
+    ("1 234 567.89", 1234567.89),
+    ("", None),
+    ("None", None),
+])
+def test_parse_mse_number(text, value):
+    assert parse_mse_number(text) == value
+
+def test_migrates_filter2_and_filter3_rows():
+    conn = sqlite3.connect(":memory:")
+    conn.execute(LEGACY_STOCK_DATA)
+    insert = """INSERT INTO stock_data (publisher_code, date, price, max, min, avg,
+                percent_change, quantity, best_turnover, total_turnover)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"""
+    # filter2 stored the page's text, filter3 its format_price() of it
+    conn.execute(insert, ("ALK", "14.10.2026", "2.140,00", "2.150,00", "2.100,00",
+                          "2.120,00", "0,50", "10", "21.400", "1.234.567,89"))
+    conn.execute(insert, ("ALK", "15.10.2026", "2.14", "5 000.00", "50.00",
+                          "1 234.50", "-1,23", "7", "21.40", "1 234 567.89"))
+    conn.commit()
+    assert is_legacy_layout(conn)
+
+    ensure_stock_table(conn)
+    assert not is_legacy_layout(conn)
+    rows = conn.execute("SELECT * FROM stock_data ORDER BY date").fetchall()
+    assert rows == [
+        ("ALK", "2026-10-14", 2140.0, 2150.0, 2100.0, 2120.0, 0.5, 10, 21400.0, 1234567.89),
+        ("ALK", "2026-10-15", 2.14, 5000.0, 50.0, 1234.5, -1.23, 7, 21.4, 1234567.89),
+    ]
@@ -0,0 +1,28 @@
+import pytest
+
+from table_parser import BACKENDS, parse_rows
+
+ROW = """<tr><td>16.10.2026</td><td>2.140,00</td><td>2.150,00</td><td>2.100,00</td>
+<td>2.120,00</td><td>0,50</td><td>10</td><td>21.400</td><td>21.400</td></tr>"""
+
+# The page styles the table before it: the first "resultsTable" is in the CSS
+PAGE = f"""<html><head><style>
+#resultsTable td {{ text-align: right; }}
+</style></head><body>
+<table class="layout"><tr><td>menu</td></tr></table>
+<table class="table" id="resultsTable"><thead><tr><th>Датум</th></tr></thead>
+<tbody>{ROW}</tbody></table>
+</body></html>"""
+
+def test_style_block_before_table():
+    assert parse_rows(PAGE, "tokenizer") == [
+        ("2026-10-16", 2140.0, 2150.0, 2100.0, 2120.0, 0.5, 10, 21400.0, 21400.0),
+    ]
+
+@pytest.mark.parametrize("backend", sorted(BACKENDS))
+def test_backends_agree(backend):
+    pytest.importorskip({"lxml": "lxml", "bs4": "bs4"}.get(backend, "re"))
+    assert parse_rows(PAGE, backend) == parse_rows(PAGE, "tokenizer")
+
+def test_no_table():
+    assert parse_rows("<style>#resultsTable {}</style><p>Нема податоци</p>", "tokenizer") == []
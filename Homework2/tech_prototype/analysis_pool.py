@@ -0,0 +1,216 @@
+"""
+Process pool for the CPU-bound analysis work of app.py.
+
+The pandas / indicator computation holds the GIL, so a few analyses running
+in Flask's request threads would stall every other endpoint. Instead they run
+in a pool of worker processes that have already imported technical_analysis
+(pandas, numpy, ta), so a request only pays for the computation itself.
+
+  - back-pressure: at most MAX_PENDING analyses queued or running; when full,
+    a request is rejected right away (SATURATION = "reject", the app answers
+    503) or waits for a free slot up to its timeout (SATURATION = "queue")
+  - timeout: a request gives up after TIMEOUT seconds (the app answers 504).
+    The worker gets the same deadline: an analysis still queued at the
+    deadline is skipped, and a running one is interrupted by SIGALRM (on
+    platforms without it, it runs to the end). The slot is released only
+    when the worker is done with it
+  - metrics: stats() reports queue wait (submitted -> started in a worker)
+    and compute time separately, plus rejections and timeouts. What a
+    worker records with metrics.py comes back with its result and is merged
+    into the app's metrics
+
+Configuration through the environment: ANALYSIS_WORKERS (0 = run in the
+request thread, as before), ANALYSIS_MAX_PENDING, ANALYSIS_TIMEOUT and
+ANALYSIS_SATURATION.
+"""
+import importlib
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import metrics
+import profiling
+
+WORKERS = int(os.environ.get("ANALYSIS_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+MAX_PENDING = int(os.environ.get("ANALYSIS_MAX_PENDING", WORKERS * 4))
+TIMEOUT = float(os.environ.get("ANALYSIS_TIMEOUT", 30))
+SATURATION = os.environ.get("ANALYSIS_SATURATION", "reject")   # or "queue"
+
+class PoolSaturated(Exception):
+    """Every analysis slot is taken (and the policy is to reject)."""
+
+def _warm():
+    import technical_analysis  # noqa: F401  (pandas, numpy, ta)
+    return os.getpid()
+
+def _resolve(name):
+    """'compute_batch_summaries' -> technical_analysis's, 'market.movers' -> market's."""
+    module, _, function = name.rpartition(".")
+    module = importlib.import_module(module or "technical_analysis")
+    return module, getattr(module, function)
+
+def _expired(signum, frame):
+    raise TimeoutError("Analysis interrupted at its deadline")
+
+def _call(name, db_path, submitted, args, kwargs, profile=False, deadline=None):
+    """Runs in a worker: <name>(*args, **kwargs) -> (result, trace).
+
+    trace: queue wait and compute time, the metrics spans of this call
+    (profiling.traced), its folded stacks if profiled, and every metric
+    recorded in the worker since the last call. Raises TimeoutError past
+    `deadline` (time.time() of the waiting request's timeout).
+    """
+    started = time.time()
+    if deadline is not None and started >= deadline:
+        raise TimeoutError("Analysis waited past its deadline")
+    module, function = _resolve(name)
+    module.STOCK_DB_PATH = db_path
+    # workers run calls in their main thread, where signals are delivered
+    alarm = deadline is not None and hasattr(signal, "setitimer")
+    if alarm:
+        signal.signal(signal.SIGALRM, _expired)
+        signal.setitimer(signal.ITIMER_REAL, deadline - started)
+    try:
+        result, trace = profiling.traced(function, args, kwargs, profile)
+    finally:
+        if alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+    trace.update(wait=started - submitted, compute=time.time() - started, metrics=metrics.take())
+    return result, trace
+
+class AnalysisPool:
+    def __init__(self, workers=WORKERS, max_pending=MAX_PENDING, timeout=TIMEOUT,
+                 saturation=SATURATION):
+        self.workers = workers
+        self.max_pending = max(1, max_pending)
+        self.timeout = timeout
+        self.saturation = saturation
+        self.executor = None
+        self.slots = threading.BoundedSemaphore(self.max_pending)
+        self.lock = threading.Lock()
+        self.counts = {"completed": 0, "failed": 0, "rejected": 0, "timeouts": 0}
+        self.wait_total = self.wait_max = 0.0
+        self.compute_total = self.compute_max = 0.0
+        self.pending = 0
+
+    def start(self):
+        """Start the workers and import the analysis modules in each of them."""
+        with self.lock:
+            if self.executor is not None or self.workers <= 0:
+                return self
+            # spawn, not fork: the app process holds open SQLite connections
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_warm,
+            )
+            warming = [self.executor.submit(_warm) for _ in range(self.workers)]
+        for future in warming:
+            future.result()
+        return self
+
+    def run(self, name, db_path, *args, **kwargs):
+        """technical_analysis.<name>(*args, **kwargs) in a worker ("module.name"
+        for a function of another module).
+
+        Returns (result, queue_wait, compute) in seconds. Raises PoolSaturated,
+        TimeoutError, or whatever the analysis raised.
+        """
+        result, trace = self.run_traced(name, db_path, args, kwargs)
+        return result, trace["wait"], trace["compute"]
+
+    def run_traced(self, name, db_path, args=(), kwargs=None, profile=False):
+        """run(), returning (result, trace) with trace = {"wait", "compute",
+        "stages", "profile"} (see _call); profile=True profiles the call in
+        the worker."""
+        kwargs = kwargs or {}
+        if self.workers <= 0:
+            # in the request thread: its spans and profile are the request's own
+            started = time.time()
+            result = _resolve(name)[1](*args, **kwargs)
+            return result, {"wait": 0.0, "compute": time.time() - started,
+                            "stages": [], "profile": None}
+        self.start()
+
+        deadline = time.monotonic() + self.timeout
+        wall_deadline = time.time() + self.timeout
+        blocking = self.saturation == "queue"
+        if not self.slots.acquire(blocking, self.timeout if blocking else None):
+            self._count("rejected" if not blocking else "timeouts")
+            if blocking:
+                raise TimeoutError(f"No analysis slot free within {self.timeout:.0f}s")
+            raise PoolSaturated(f"{self.max_pending} analyses already pending")
+        with self.lock:
+            self.pending += 1
+        try:
+            future = self.executor.submit(_call, name, str(db_path), time.time(), args, kwargs,
+                                          profile, wall_deadline)
+        except BaseException:
+            self._release(None)
+            raise
+        # the slot is freed when the worker finishes, even after a timeout
+        future.add_done_callback(self._release)
+
+        try:
+            result, trace = future.result(timeout=max(0.0, deadline - time.monotonic()))
+        except TimeoutError:
+            future.cancel()
+            self._count("timeouts")
+            raise TimeoutError(f"Analysis took longer than {self.timeout:.0f}s")
+        except Exception:
+            self._count("failed")
+            raise
+        metrics.merge(trace.pop("metrics"))
+        wait, compute = trace["wait"], trace["compute"]
+        with self.lock:
+            self.counts["completed"] += 1
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+            self.compute_total += compute
+            self.compute_max = max(self.compute_max, compute)
+        return result, trace
+
+    def _release(self, future):
+        with self.lock:
+            self.pending -= 1
+        self.slots.release()
+
+    def _count(self, name):
+        with self.lock:
+            self.counts[name] += 1
+
+    def stats(self):
+        with self.lock:
+            done = self.counts["completed"]
+            return dict(
+                self.counts,
+                workers=self.workers,
+                pending=self.pending,
+                max_pending=self.max_pending,
+                queue_wait_avg=self.wait_total / done if done else 0.0,
+                queue_wait_max=self.wait_max,
+                compute_avg=self.compute_total / done if done else 0.0,
+                compute_max=self.compute_max,
+            )
+
+    def metrics(self):
+        """stats() as a metrics.py snapshot for /api/metrics."""
+        stats = self.stats()
+        outcomes = ("completed", "failed", "rejected", "timeouts")
+        return {
+            "counters": {metrics.series("mse_analysis_pool_tasks_total", {"outcome": outcome}): stats[outcome]
+                         for outcome in outcomes},
+            "gauges": {
+                "mse_analysis_pool_pending": stats["pending"],
+                "mse_analysis_pool_queue_wait_seconds_max": stats["queue_wait_max"],
+            },
+        }
+
+    def shutdown(self):
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
@@ -1,12 +1,23 @@
 import os
 import sqlite3
-from flask import Flask, jsonify, request
+import time
+from flask import Flask, Response, g, jsonify, request
 from flask_cors import CORS
 from pathlib import Path
 from datetime import datetime
 
 # Import from technical_analysis.py
-from technical_analysis import compute_all_indicators_and_aggregate
+from technical_analysis import columnar_result
+from analysis_pool import AnalysisPool, PoolSaturated
+from response_cache import ResponseCache, data_version
+from db import reading, writing
+import metrics
+import profiling
+from price_history import (
+    COLUMNS, DOWNSAMPLERS, MIN_POINTS, export_chunks, export_rows, load_history,
+    load_history_columns, parse_date, parse_fields
+)
+from wire_format import JSON_ROWS, JSON_COLUMNS, encode, negotiate
 
 app = Flask(__name__)
 CORS(app)
@@ -14,6 +25,126 @@ CORS(app)
 PUBLISHERS_DB_PATH = Path(__file__).parent / "publishers.db"
 STOCK_DB_PATH = Path(__file__).parent / "stock_data.db"
 
+response_cache = ResponseCache()
+
+# CPU-bound analysis runs in worker processes (ANALYSIS_WORKERS=0: in-thread)
+analysis_pool = AnalysisPool()
+
+# The slowest requests with their per-stage times (profiling.py)
+slow_log = profiling.SlowLog()
+
+def run_analysis(name, *args, **kwargs):
+    """technical_analysis.<name>(*args) (or "market.<name>") through the
+    analysis pool; the queue wait and compute time are reported in the
+    Server-Timing header. A profiled request profiles the worker too."""
+    result, trace = analysis_pool.run_traced(name, STOCK_DB_PATH, args, kwargs,
+                                             profile="profiler" in g)
+    g.server_timing = f"queue;dur={trace['wait'] * 1000:.1f}, compute;dur={trace['compute'] * 1000:.1f}"
+    g.analysis_trace = trace
+    return result
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    if request.path.startswith("/api/debug/"):
+        return
+    metrics.start_trace()
+    if profiling.authorized(request.headers, request.args):
+        g.profiler = profiling.StackProfiler("app").start()
+
+@app.after_request
+def record_request_time(response):
+    seconds = time.perf_counter() - g.pop("request_started", time.perf_counter())
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    metrics.observe("mse_http_request_seconds", seconds, route=route, status=response.status_code)
+    if request.path.startswith("/api/debug/"):
+        return response
+
+    trace = g.pop("analysis_trace", {})
+    profile_id = None
+    profiler = g.pop("profiler", None)
+    if profiler is not None:
+        folded = profiler.stop()
+        folded.update(trace.get("profile") or {})
+        profile_id = profiling.save_profile(folded)
+        response.headers["X-Profile-Id"] = profile_id
+    stages = profiling.breakdown(metrics.stop_trace() + trace.get("stages", []))
+    if trace:
+        stages["pool.queue_wait"] = round(trace["wait"], 6)
+        stages["pool.compute"] = round(trace["compute"], 6)
+    slow_log.add(seconds, {
+        "route": route,
+        "publisher": request.args.get("publisher"),
+        "tf": request.args.get("tf"),
+        "status": response.status_code,
+        "seconds": round(seconds, 6),
+        "at": datetime.now().isoformat(timespec="seconds"),
+        "stages": stages,
+        "profile": profile_id,
+    })
+    return response
+
+@app.teardown_request
+def stop_request_trace(exc):
+    # after_request did not run (unhandled error): never leave a profiler behind
+    profiler = g.pop("profiler", None)
+    if profiler is not None:
+        profiler.stop()
+    metrics.stop_trace()
+
+@app.after_request
+def add_server_timing(response):
+    timing = g.pop("server_timing", None)
+    if timing:
+        response.headers["Server-Timing"] = timing
+    return response
+
+def pool_error(e):
+    """503 / 504 response for a saturated or timed-out analysis pool."""
+    if isinstance(e, PoolSaturated):
+        response = jsonify({"error": f"Analysis busy: {e}"})
+        response.headers["Retry-After"] = "1"
+        return response, 503
+    return jsonify({"error": str(e)}), 504
+
+def cached_response(key, build, mimetype=JSON_ROWS):
+    """
+    Serve build() -> (result dict or encoded bytes, status) through the
+    response cache. key = (endpoint, publisher, ...); entries are tied to the
+    publisher's data version, which the ingest bumps, so new rows are never
+    hidden by the cache. Answers 304 when the client's If-None-Match already
+    has this body.
+    """
+    with reading(STOCK_DB_PATH) as conn:
+        version = data_version(conn, key[1])
+
+    hit = None
+    if "profiler" not in g:     # a profiled request computes its response
+        hit = response_cache.get(key, version)
+        metrics.count("mse_response_cache_total", result="miss" if hit is None else "hit")
+    if hit is None:
+        result, status = build()
+        if status != 200:
+            return jsonify(result), status
+        if isinstance(result, bytes):
+            body = result
+        else:
+            with metrics.span("mse_serialize_seconds", endpoint=key[0]):
+                body = jsonify(result).get_data()
+        etag = response_cache.put(key, version, body)
+    else:
+        etag, body = hit
+
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(body, status=200, mimetype=mimetype)
+    response.set_etag(etag)
+    response.headers["Vary"] = "Accept"
+    # let the browser keep the body but revalidate it on every refresh
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
 def init_db():
     conn = sqlite3.connect(PUBLISHERS_DB_PATH)
     cursor = conn.cursor()
@@ -40,11 +171,8 @@ def init_db():
 @app.route("/api/publishers", methods=["GET"])
 def get_publishers():
     try:
-        conn = sqlite3.connect(PUBLISHERS_DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute("SELECT publisher_code FROM publishers")
-        rows = cursor.fetchall()
-        conn.close()
+        with reading(PUBLISHERS_DB_PATH) as conn:
+            rows = conn.execute("SELECT publisher_code FROM publishers").fetchall()
         pubs = [row[0] for row in rows]
         return jsonify({"publishers": pubs}), 200
     except Exception as e:
@@ -52,40 +180,119 @@ def get_publishers():
 
 @app.route("/api/stock_data", methods=["GET"])
 def get_stock_data():
+    """
+    Usage: /api/stock_data?publisher=ALK
+    Optional: from / to       date bounds (YYYY-MM-DD or DD.MM.YYYY)
+              limit / cursor  page size and next_cursor of the previous page
+              fields          e.g. fields=price,volume (date is always included)
+              points          downsample to about N points
+              downsample      lttb (default) or ohlc
+    Columnar encodings via Accept or ?format=columns|packed|arrow (wire_format.py)
+    """
     publisher = request.args.get("publisher", "").strip()
     if not publisher:
         return jsonify({"error": "Missing 'publisher' query param"}), 400
     try:
-        conn = sqlite3.connect(STOCK_DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT date, price, quantity, max, min, avg, percent_change, total_turnover
-            FROM stock_data
-            WHERE publisher_code = ?
-            ORDER BY date ASC
-        """, (publisher,))
-        rows = cursor.fetchall()
-        conn.close()
-
-        data_list = []
-        for row in rows:
-            data_list.append({
-                "date": row[0],
-                "price": row[1],
-                "volume": row[2],
-                "max": row[3],
-                "min": row[4],
-                "avg": row[5],
-                "percent_change": row[6],
-                "total_turnover": row[7]
-            })
-        return jsonify({
-            "publisher": publisher,
-            "records": data_list
-        }), 200
+        params = stock_data_params(request.args)
+        mimetype = negotiate(request.accept_mimetypes, request.args.get("format"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        key = ("stock_data", publisher, mimetype) + tuple(sorted(
+            (name, str(value)) for name, value in params.items()
+        ))
+        return cached_response(key, lambda: load_stock_data(publisher, params, mimetype), mimetype)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def stock_data_params(args):
+    """Validated keyword arguments for price_history.load_history()."""
+    params = {}
+    if args.get("from"):
+        params["date_from"] = parse_date(args["from"])
+    if args.get("to"):
+        params["date_to"] = parse_date(args["to"])
+    if args.get("cursor"):
+        params["cursor"] = parse_date(args["cursor"])
+    for name in ("limit", "points"):
+        if args.get(name):
+            try:
+                params[name] = int(args[name])
+            except ValueError:
+                raise ValueError(f"'{name}' must be an integer")
+            if params[name] < 1:
+                raise ValueError(f"'{name}' must be positive")
+    if params.get("points", MIN_POINTS) < MIN_POINTS:
+        raise ValueError(f"'points' must be at least {MIN_POINTS}")
+    if args.get("fields"):
+        params["fields"] = parse_fields(args["fields"])
+    if args.get("downsample"):
+        if args["downsample"] not in DOWNSAMPLERS:
+            raise ValueError(f"'downsample' must be one of {list(DOWNSAMPLERS)}")
+        params["downsample"] = args["downsample"]
+    return params
+
+def load_stock_data(publisher, params, mimetype=JSON_ROWS):
+    with reading(STOCK_DB_PATH) as conn:
+        if mimetype == JSON_ROWS:
+            return load_history(conn, publisher, **params), 200
+        meta, columns = load_history_columns(
+            conn, publisher, display_dates=(mimetype == JSON_COLUMNS), **params
+        )
+    with metrics.span("mse_serialize_seconds", endpoint="stock_data"):
+        return encode(mimetype, meta, columns, app.json.dumps), 200
+
+# ?format= of /api/stock_data/export -> mimetype
+EXPORT_FORMATS = {"ndjson": "application/x-ndjson", "json": "application/json"}
+
+@app.route("/api/stock_data/export", methods=["GET"])
+def export_stock_data():
+    """
+    Usage: /api/stock_data/export?publisher=ALK
+           /api/stock_data/export?publisher=ALK,KMB
+           /api/stock_data/export?publisher=all     every issuer (bulk dump)
+    Optional: from / to   date bounds (YYYY-MM-DD or DD.MM.YYYY)
+              fields      e.g. fields=price,volume (date is always included)
+              format      ndjson (default, one record per line) or json (one array)
+    Records are {"publisher", "date" (ISO), ...fields}, by issuer and date,
+    streamed as they are read from the database (price_history.export_rows),
+    so memory use does not grow with the size of the export. Not cached.
+    """
+    try:
+        publishers, fields, params, export_format = export_params(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    chunks = export_stream(STOCK_DB_PATH, publishers, fields, export_format == "json", **params)
+    return Response(chunks, mimetype=EXPORT_FORMATS[export_format])
+
+def export_params(args):
+    """(publishers or None for all, fields, date bounds, format) of an export.
+    Raises ValueError."""
+    publisher = args.get("publisher", "").strip()
+    if not publisher:
+        raise ValueError("Missing 'publisher' query param (a code, a list or 'all')")
+    publishers = None if publisher == "all" else [p.strip() for p in publisher.split(",") if p.strip()]
+    params = {}
+    if args.get("from"):
+        params["date_from"] = parse_date(args["from"])
+    if args.get("to"):
+        params["date_to"] = parse_date(args["to"])
+    fields = parse_fields(args["fields"]) if args.get("fields") else COLUMNS
+    export_format = args.get("format", "ndjson")
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"'format' must be one of {list(EXPORT_FORMATS)}")
+    return publishers, fields, params, export_format
+
+def export_stream(db_path, publishers, fields, array=False, **params):
+    """Response chunks of an export. The read connection (and its snapshot
+    of the data) is held until the last chunk has been sent."""
+    with reading(db_path) as conn:
+        def batches():
+            for rows in export_rows(conn, publishers, **params):
+                metrics.count("mse_export_rows_total", len(rows))
+                yield rows
+        yield from export_chunks(batches(), fields, array)
+
 @app.route("/api/users", methods=["POST"])
 def create_user():
     data = request.get_json()
@@ -100,15 +307,13 @@ def create_user():
         return jsonify({"error": "Missing name/email/message"}), 400
 
     try:
-        conn = sqlite3.connect(PUBLISHERS_DB_PATH)
-        cursor = conn.cursor()
         now_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        cursor.execute("""
-            INSERT INTO users (name, email, message, created_at)
-            VALUES (?, ?, ?, ?)
-        """, (name, email, message, now_str))
-        conn.commit()
-        conn.close()
+        with writing(PUBLISHERS_DB_PATH) as conn:
+            with conn:
+                conn.execute("""
+                    INSERT INTO users (name, email, message, created_at)
+                    VALUES (?, ?, ?, ?)
+                """, (name, email, message, now_str))
         return jsonify({"status": "ok", "msg": "User info saved"}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -117,6 +322,8 @@ def create_user():
 def get_technical_analysis():
     """
     Usage: /api/technical_analysis?publisher=INTP&tf=1D
+    tf: 1D, 1W, 1M or <N>D (N-day bars)
+    Columnar encodings via Accept or ?format=columns|packed|arrow (wire_format.py)
     """
     publisher = request.args.get("publisher", "").strip()
     tf = request.args.get("tf","1D").strip()
@@ -124,12 +331,190 @@ def get_technical_analysis():
         return jsonify({"error": "Missing 'publisher' query param"}), 400
 
     try:
+        mimetype = negotiate(request.accept_mimetypes, request.args.get("format"))
         # Now we pass 2 arguments to match technical_analysis.py
-        result = compute_all_indicators_and_aggregate(publisher, tf)
+        return cached_response(
+            ("technical_analysis", publisher, tf.upper(), mimetype),
+            lambda: (load_technical_analysis(publisher, tf, mimetype), 200),
+            mimetype
+        )
+    except (PoolSaturated, TimeoutError) as e:
+        return pool_error(e)
+    except ValueError as e:
+        # unknown timeframe / format
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/api/technical_analysis/batch", methods=["GET", "POST"])
+def get_technical_analysis_batch():
+    """
+    Usage: /api/technical_analysis/batch?publishers=ALK,KMB&tf=1D
+           /api/technical_analysis/batch?publishers=all
+           POST {"publishers": ["ALK", "KMB"], "tf": "1W"}
+    Returns the osc/ma/overall summaries of every issuer (no per-row records).
+    """
+    body = request.get_json(silent=True) or {}
+    publishers = body.get("publishers", request.args.get("publishers", "all"))
+    tf = body.get("tf", request.args.get("tf", "1D"))
+    if isinstance(publishers, str) and publishers.strip() != "all":
+        publishers = [p.strip() for p in publishers.split(",") if p.strip()]
+    elif isinstance(publishers, str):
+        publishers = "all"
+    if publishers != "all" and (not isinstance(publishers, list) or not publishers):
+        return jsonify({"error": "'publishers' must be a list of codes or 'all'"}), 400
+
+    try:
+        return jsonify(run_analysis("compute_batch_summaries", publishers, tf)), 200
+    except (PoolSaturated, TimeoutError) as e:
+        return pool_error(e)
+    except ValueError as e:
+        # unknown timeframe
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/api/market/correlation", methods=["GET"])
+def get_market_correlation():
+    """
+    Usage: /api/market/correlation?window=60
+    Optional: periods / step   number of matrices and trading days between them
+              publishers       e.g. publishers=ALK,KMB (default: every issuer)
+              min_coverage     fraction of the window an issuer must have traded
+    Correlation of daily returns across issuers (market.py).
+    """
+    return market_endpoint("market.correlation", ints=("window", "periods", "step"),
+                           fractions=("min_coverage",))
+
+@app.route("/api/market/relative_strength", methods=["GET"])
+def get_market_relative_strength():
+    """
+    Usage: /api/market/relative_strength?window=60
+    Optional: publishers, min_coverage, limit
+    Issuers ranked by their return against the equal-weight market.
+    """
+    return market_endpoint("market.relative_strength", ints=("window", "limit"),
+                           fractions=("min_coverage",))
+
+@app.route("/api/market/movers", methods=["GET"])
+def get_market_movers():
+    """
+    Usage: /api/market/movers?days=1&limit=10
+    Optional: publishers
+    Top gainers and losers over the last `days` trading days.
+    """
+    return market_endpoint("market.movers", ints=("days", "limit"))
+
+@app.route("/api/backtest", methods=["GET"])
+def get_backtest():
+    """
+    Usage: /api/backtest?publisher=ALK&tf=1D
+    Optional: cost   fraction of the traded value per position change (default 0.001)
+              mode   long (default) or long_short
+    Returns, drawdown and hit rate of every Buy/Sell/Hold rule over the
+    issuer's history (backtest.py).
+    """
+    publisher = request.args.get("publisher", "").strip()
+    if not publisher:
+        return jsonify({"error": "Missing 'publisher' query param"}), 400
+    params = {"mode": request.args.get("mode", "long")}
+    try:
+        if request.args.get("cost"):
+            try:
+                params["cost"] = float(request.args["cost"])
+            except ValueError:
+                raise ValueError("'cost' must be a number")
+            if not 0 <= params["cost"] < 1:
+                raise ValueError("'cost' must be between 0 and 1")
+        result = run_analysis("backtest.backtest_issuer", publisher,
+                              request.args.get("tf", "1D"), **params)
         return jsonify(result), 200
+    except (PoolSaturated, TimeoutError) as e:
+        return pool_error(e)
+    except ValueError as e:
+        # unknown timeframe / mode / bad cost
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route("/api/metrics", methods=["GET"])
+def get_metrics():
+    """
+    Prometheus text format (metrics.py): request latencies, analysis stages
+    and indicator families (the workers' included), serialization, cache
+    hits, the analysis pool, and the ingest metrics the filters keep next to
+    stock_data.db.
+    """
+    body = metrics.render(analysis_pool.metrics(), metrics.load(metrics.ingest_file(STOCK_DB_PATH)))
+    return Response(body, content_type=metrics.CONTENT_TYPE)
+
+@app.route("/api/debug/slow_requests", methods=["GET"])
+def get_slow_requests():
+    """
+    Usage: /api/debug/slow_requests   (header X-Profile-Token or ?profile=<token>)
+    The slowest requests since the start, with publisher / tf and per-stage
+    seconds (profiling.py).
+    """
+    if not profiling.authorized(request.headers, request.args):
+        return jsonify({"error": "Profiling is not enabled for this request"}), 403
+    return jsonify({"requests": slow_log.entries()}), 200
+
+@app.route("/api/debug/profiles/<profile_id>", methods=["GET"])
+def get_profile(profile_id):
+    """
+    Usage: /api/debug/profiles/<X-Profile-Id of a profiled request>
+    Folded stacks (microseconds of self time) for flamegraph.pl / speedscope.
+    """
+    if not profiling.authorized(request.headers, request.args):
+        return jsonify({"error": "Profiling is not enabled for this request"}), 403
+    folded = profiling.load_profile(profile_id)
+    if folded is None:
+        return jsonify({"error": f"No profile {profile_id}"}), 404
+    return Response(folded, content_type="text/plain; charset=utf-8")
+
+def market_endpoint(name, ints=(), fractions=()):
+    """Validate the query params and run market.<name> in the analysis pool."""
+    params = {}
+    try:
+        for param in ints:
+            if request.args.get(param):
+                try:
+                    params[param] = int(request.args[param])
+                except ValueError:
+                    raise ValueError(f"'{param}' must be an integer")
+                if params[param] < 1:
+                    raise ValueError(f"'{param}' must be positive")
+        for param in fractions:
+            if request.args.get(param):
+                try:
+                    params[param] = float(request.args[param])
+                except ValueError:
+                    raise ValueError(f"'{param}' must be a number")
+                if not 0 <= params[param] <= 1:
+                    raise ValueError(f"'{param}' must be between 0 and 1")
+        if request.args.get("publishers", "").strip():
+            params["publishers"] = [p.strip() for p in request.args["publishers"].split(",") if p.strip()]
+        return jsonify(run_analysis(name, **params)), 200
+    except (PoolSaturated, TimeoutError) as e:
+        return pool_error(e)
+    except ValueError as e:
+        # bad parameter, unknown issuer or not enough history
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def load_technical_analysis(publisher, tf, mimetype=JSON_ROWS):
+    result = run_analysis("compute_all_indicators_and_aggregate", publisher, tf)
+    if mimetype == JSON_ROWS:
+        return result
+    with metrics.span("mse_serialize_seconds", endpoint="technical_analysis"):
+        meta, columns = columnar_result(result)
+        return encode(mimetype, meta, columns, app.json.dumps)
+
 if __name__ == "__main__":
     init_db()
+    # the reloader's watcher process would start a second pool: only the
+    # serving process warms one up (otherwise the first analysis starts it)
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        analysis_pool.start()
     app.run(debug=True, port=5000)
@@ -0,0 +1,316 @@
+"""
+ASGI entry point for the dashboard API: /api/publishers, /api/stock_data
+(and its /export), /api/technical_analysis and /api/users of app.py with
+async handlers.
+
+    pip install starlette uvicorn
+    uvicorn asgi_app:app --port 5000
+
+A request waiting on SQLite, pandas or the analysis pool holds a coroutine
+rather than a server thread, so hundreds of open dashboard connections are
+cheap. The blocking work itself never runs on the event loop:
+
+  - queries, JSON encoding and the waits on the analysis pool run in one
+    bounded ThreadPoolExecutor (ASGI_THREADS threads); requests beyond that
+    wait in the loop, not in the accept backlog
+  - the analyses run in the worker processes of analysis_pool.py, as in app.py
+  - a /api/stock_data history of more than STREAM_ROWS rows (JSON rows) is
+    streamed, STREAM_CHUNK records at a time, so the client starts reading
+    while the rest is still being encoded. The streamed body is kept in the
+    response cache afterwards, so the next request gets it with an ETag
+
+Query params, status codes and bodies are the same as app.py's: it uses its
+helpers, database paths, response cache and analysis pool.
+benchmarks/load_test_asgi.py compares the two servers under load.
+"""
+import asyncio
+import contextlib
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import partial
+
+try:
+    from starlette.applications import Starlette
+    from starlette.middleware import Middleware
+    from starlette.middleware.cors import CORSMiddleware
+    from starlette.responses import Response, StreamingResponse
+    from starlette.routing import Route
+except ImportError as e:
+    raise ImportError("asgi_app.py needs starlette and uvicorn: pip install starlette uvicorn") from e
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.http import parse_accept_header
+
+import app as flask_app
+import db
+import metrics
+from analysis_pool import PoolSaturated
+from price_history import COLUMNS, select_rows, to_records
+from response_cache import data_version
+from wire_format import JSON_ROWS, negotiate
+
+ASGI_THREADS = int(os.environ.get("ASGI_THREADS", 32))
+STREAM_ROWS = 2000          # larger histories are streamed
+STREAM_CHUNK = 500          # records encoded per chunk
+
+executor = ThreadPoolExecutor(max_workers=ASGI_THREADS, thread_name_prefix="asgi")
+
+def blocking(function, *args, **kwargs):
+    """Await function(*args, **kwargs) run in the executor."""
+    return asyncio.get_running_loop().run_in_executor(executor, partial(function, *args, **kwargs))
+
+def dumps(obj):
+    """The bytes Flask's jsonify() sends for obj (sorted keys, compact)."""
+    return flask_app.app.json.dumps(obj, separators=(",", ":")).encode() + b"\n"
+
+def json_response(obj, status=200, headers=None):
+    return Response(dumps(obj), status_code=status, headers=headers, media_type=JSON_ROWS)
+
+def error(message, status, headers=None):
+    return json_response({"error": message}, status, headers)
+
+def pool_error(e):
+    if isinstance(e, PoolSaturated):
+        return error(f"Analysis busy: {e}", 503, {"Retry-After": "1"})
+    return error(str(e), 504)
+
+def accept(request):
+    return parse_accept_header(request.headers.get("accept"), MIMEAccept)
+
+def if_none_match(request, etag):
+    sent = request.headers.get("if-none-match", "")
+    return any(tag.strip().removeprefix("W/").strip('"') in (etag, "*") for tag in sent.split(","))
+
+def cache_lookup(key):
+    """(data version, (etag, body) or None) of a cached response."""
+    with db.reading(flask_app.STOCK_DB_PATH) as conn:
+        version = data_version(conn, key[1])
+    hit = flask_app.response_cache.get(key, version)
+    metrics.count("mse_response_cache_total", result="miss" if hit is None else "hit")
+    return version, hit
+
+def cached(request, etag, body, mimetype, headers=None):
+    """app.cached_response()'s answer for a cached body."""
+    headers = dict(headers or {}, ETag=f'"{etag}"', Vary="Accept")
+    headers["Cache-Control"] = "no-cache"
+    if if_none_match(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(body, headers=headers, media_type=mimetype)
+
+async def get_publishers(request):
+    def load():
+        with db.reading(flask_app.PUBLISHERS_DB_PATH) as conn:
+            return [row[0] for row in conn.execute("SELECT publisher_code FROM publishers")]
+    try:
+        return json_response({"publishers": await blocking(load)})
+    except Exception as e:
+        return error(str(e), 500)
+
+def load_history_rows(publisher, params):
+    """(meta, rows) of a JSON-rows request, and its fields."""
+    params = dict(params)
+    fields = params.pop("fields", COLUMNS)
+    with db.reading(flask_app.STOCK_DB_PATH) as conn:
+        meta, rows = select_rows(conn, publisher, **params)
+    return meta, rows, fields
+
+def encode_history(meta, rows, fields):
+    """load_history()'s payload for these rows, as jsonify() bytes."""
+    with metrics.span("mse_serialize_seconds", endpoint="stock_data"):
+        return dumps(dict(meta, records=to_records(rows, fields)))
+
+async def stream_history(key, version, meta, rows, fields):
+    """The bytes of encode_history(), STREAM_CHUNK records at a time; the
+    whole body goes into the response cache once it has been sent."""
+    # "records" sorts after every meta key, so the payload ends with it
+    head = dumps(dict(meta, records=[])).rstrip()[:-len("[]}")] + b"["
+    sent = [head]
+    yield head
+    for start in range(0, len(rows), STREAM_CHUNK):
+        part = rows[start:start + STREAM_CHUNK]
+        chunk = await blocking(lambda: dumps(to_records(part, fields)).rstrip()[1:-1])
+        if start:
+            chunk = b"," + chunk
+        sent.append(chunk)
+        yield chunk
+    sent.append(b"]}\n")
+    yield sent[-1]
+    flask_app.response_cache.put(key, version, b"".join(sent))
+
+async def get_stock_data(request):
+    """app.get_stock_data(); large JSON histories are streamed."""
+    args = request.query_params
+    publisher = args.get("publisher", "").strip()
+    if not publisher:
+        return error("Missing 'publisher' query param", 400)
+    try:
+        params = flask_app.stock_data_params(args)
+        mimetype = negotiate(accept(request), args.get("format"))
+    except ValueError as e:
+        return error(str(e), 400)
+    try:
+        key = ("stock_data", publisher, mimetype) + tuple(sorted(
+            (name, str(value)) for name, value in params.items()
+        ))
+        version, hit = await blocking(cache_lookup, key)
+        if hit is not None:
+            return cached(request, *hit, mimetype)
+        if mimetype != JSON_ROWS:
+            body, _ = await blocking(flask_app.load_stock_data, publisher, params, mimetype)
+        else:
+            meta, rows, fields = await blocking(load_history_rows, publisher, params)
+            if len(rows) > STREAM_ROWS:
+                return StreamingResponse(stream_history(key, version, meta, rows, fields),
+                                         media_type=mimetype, headers={"Vary": "Accept"})
+            body = await blocking(encode_history, meta, rows, fields)
+        etag = flask_app.response_cache.put(key, version, body)
+        return cached(request, etag, body, mimetype)
+    except Exception as e:
+        return error(str(e), 500)
+
+async def export_stock_data(request):
+    """app.export_stock_data(): the chunks are read and encoded in the executor."""
+    try:
+        publishers, fields, params, export_format = flask_app.export_params(request.query_params)
+    except ValueError as e:
+        return error(str(e), 400)
+    chunks = flask_app.export_stream(flask_app.STOCK_DB_PATH, publishers, fields,
+                                     export_format == "json", **params)
+
+    async def stream():
+        try:
+            while (chunk := await blocking(next, chunks, None)) is not None:
+                yield chunk
+        finally:
+            # a client that disconnects releases the read connection too
+            await blocking(chunks.close)
+    return StreamingResponse(stream(), media_type=flask_app.EXPORT_FORMATS[export_format])
+
+def analyse(publisher, tf, mimetype):
+    """(body, Server-Timing) of app.load_technical_analysis() for a request."""
+    result, trace = flask_app.analysis_pool.run_traced(
+        "compute_all_indicators_and_aggregate", flask_app.STOCK_DB_PATH, (publisher, tf)
+    )
+    timing = f"queue;dur={trace['wait'] * 1000:.1f}, compute;dur={trace['compute'] * 1000:.1f}"
+    with metrics.span("mse_serialize_seconds", endpoint="technical_analysis"):
+        if mimetype == JSON_ROWS:
+            return dumps(result), timing
+        meta, columns = flask_app.columnar_result(result)
+        return flask_app.encode(mimetype, meta, columns, flask_app.app.json.dumps), timing
+
+async def get_technical_analysis(request):
+    """app.get_technical_analysis()."""
+    args = request.query_params
+    publisher = args.get("publisher", "").strip()
+    tf = args.get("tf", "1D").strip()
+    if not publisher:
+        return error("Missing 'publisher' query param", 400)
+    try:
+        mimetype = negotiate(accept(request), args.get("format"))
+        key = ("technical_analysis", publisher, tf.upper(), mimetype)
+        version, hit = await blocking(cache_lookup, key)
+        if hit is not None:
+            return cached(request, *hit, mimetype)
+        body, timing = await blocking(analyse, publisher, tf, mimetype)
+        etag = flask_app.response_cache.put(key, version, body)
+        return cached(request, etag, body, mimetype, {"Server-Timing": timing})
+    except (PoolSaturated, TimeoutError) as e:
+        return pool_error(e)
+    except ValueError as e:
+        # unknown timeframe / format
+        return error(str(e), 400)
+    except Exception as e:
+        return error(str(e), 500)
+
+async def create_user(request):
+    """app.create_user()."""
+    try:
+        data = await request.json()
+    except ValueError:
+        data = None
+    if not data or not isinstance(data, dict):
+        return error("No JSON body provided", 400)
+
+    name = str(data.get("name", "")).strip()
+    email = str(data.get("email", "")).strip()
+    message = str(data.get("message", "")).strip()
+    if not name or not email or not message:
+        return error("Missing name/email/message", 400)
+
+    def save():
+        now_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with db.writing(flask_app.PUBLISHERS_DB_PATH) as conn:
+            with conn:
+                conn.execute("""
+                    INSERT INTO users (name, email, message, created_at)
+                    VALUES (?, ?, ?, ?)
+                """, (name, email, message, now_str))
+    try:
+        await blocking(save)
+        return json_response({"status": "ok", "msg": "User info saved"})
+    except Exception as e:
+        return error(str(e), 500)
+
+async def get_metrics(request):
+    """app.get_metrics()."""
+    def render():
+        return metrics.render(flask_app.analysis_pool.metrics(),
+                              metrics.load(metrics.ingest_file(flask_app.STOCK_DB_PATH)))
+    return Response(await blocking(render), headers={"Content-Type": metrics.CONTENT_TYPE})
+
+class RequestTimer:
+    """mse_http_request_seconds{route,status} of every request, as app.py
+    records them (a streamed response counts until its last chunk)."""
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+        try:
+            await self.app(scope, receive, send_status)
+        finally:
+            route = scope["path"] if scope["path"] in ROUTES else "unmatched"
+            metrics.observe("mse_http_request_seconds", time.perf_counter() - started,
+                            route=route, status=status)
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    flask_app.init_db()
+    await blocking(flask_app.analysis_pool.start)
+    try:
+        yield
+    finally:
+        flask_app.analysis_pool.shutdown()
+        db.close_all()
+
+ROUTES = {
+    "/api/publishers": (get_publishers, ["GET"]),
+    "/api/stock_data": (get_stock_data, ["GET"]),
+    "/api/stock_data/export": (export_stock_data, ["GET"]),
+    "/api/technical_analysis": (get_technical_analysis, ["GET"]),
+    "/api/users": (create_user, ["POST"]),
+    "/api/metrics": (get_metrics, ["GET"]),
+}
+
+app = Starlette(
+    routes=[Route(path, endpoint, methods=methods) for path, (endpoint, methods) in ROUTES.items()],
+    middleware=[
+        Middleware(RequestTimer),
+        Middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"]),
+    ],
+    lifespan=lifespan,
+)
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="127.0.0.1", port=5000)
@@ -0,0 +1,260 @@
+"""
+Vectorized backtests of the Buy/Sell/Hold rules of the analysis page.
+
+Every rule of the final row (RSI 30/70, Stoch 20/80, CCI +-100, Williams
+-20/-80, MACD line vs signal line, close vs SMA/EMA/WMA/ZLEMA/Bollinger mid,
+each short/medium/long) is evaluated on every bar at once from the
+indicator_kernel series, and so are the votes of the three summaries
+(oscSummary, maSummary, overallSummary over the `vote_term` signals: more
+Buys than Sells => Buy, as in build_summary).
+
+Positions: a Buy at a bar's close is held from the next bar on, a Sell
+closes it ("long") or turns it short ("long_short"), and Hold keeps whatever
+is open. Every unit of position change costs `cost` (a fraction of the
+traded value, 0.001 = 10 bp).
+
+Reported per rule, returns in percent: total and annual return, max
+drawdown, trades, hit rate (share of trades that made money after costs,
+an open trade counted as closed at the last bar), exposure (share of bars
+with a position) and Sharpe ratio; buy_and_hold is included for comparison.
+
+Run this file to sweep window sets over every issuer with a process pool:
+    python backtest.py [--workers N] [--cost 0.001] [--mode long|long_short] [--tf 1D] [codes...]
+"""
+import argparse
+import itertools
+import math
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+
+import numpy as np
+
+from db import reading
+from indicator_kernel import compute_indicators
+from signals import (
+    WINDOWS, MACD_WINDOWS, OSCILLATORS, MOVING_AVERAGES, OSCILLATOR_SIGNALS,
+    oscillator_votes, cross_votes
+)
+from timeframes import parse_timeframe
+
+STOCK_DB_PATH = Path(__file__).parent / "stock_data.db"
+
+COST = 0.001
+MODES = ("long", "long_short")
+
+# bars per year of each timeframe unit (N-day bars: 252 / N)
+BARS_PER_YEAR = {"D": 252, "W": 52, "M": 12}
+
+# window sets tried by sweep(); MACD keeps its (fast, slow, signal) windows
+SWEEP = {"short": (5, 7, 10), "medium": (14, 21), "long": (30, 50)}
+
+def bars_per_year(tf):
+    unit, count = parse_timeframe(tf)
+    return BARS_PER_YEAR[unit] / count if unit == "D" else BARS_PER_YEAR[unit]
+
+def rule_votes(close, high, low, windows=WINDOWS, macd_windows=MACD_WINDOWS, vote_term="medium"):
+    """{rule: int8 vote per bar} for every rule and the three summary votes."""
+    close = np.asarray(close, dtype=float)
+    series = compute_indicators(close, high, low, windows, macd_windows)
+    votes = {}
+    for term in windows:
+        for name in OSCILLATOR_SIGNALS:
+            votes[f"{name}_{term}"] = oscillator_votes(name, series[(name, term)])
+        if term in macd_windows:
+            votes[f"macd_{term}"] = cross_votes(series[("macd", term)], series[("macd_signal", term)])
+        # the MA rules compare against the MA rounded like the API shows it
+        for name in ("sma", "ema", "wma", "boll"):
+            votes[f"{name}_{term}"] = cross_votes(close, np.round(series[(name, term)], 2))
+        votes[f"zlema_{term}"] = votes[f"ema_{term}"]     # zlema = ema, as on the page
+
+    def vote(names):
+        total = sum(votes[f"{name}_{vote_term}"].astype(np.int16) for name in names
+                    if f"{name}_{vote_term}" in votes)
+        return np.sign(total).astype(np.int8)
+    votes["oscSummary"] = vote(OSCILLATORS)
+    votes["maSummary"] = vote(MOVING_AVERAGES)
+    votes["overallSummary"] = vote(OSCILLATORS + MOVING_AVERAGES)
+    return votes
+
+def positions(votes, mode="long"):
+    """(rules x bars) votes -> position held after each bar's close."""
+    bars = np.arange(votes.shape[1])
+    last = np.where(votes != 0, bars, -1)
+    np.maximum.accumulate(last, axis=1, out=last)
+    held = np.take_along_axis(votes, np.maximum(last, 0), axis=1) * (last >= 0)
+    return np.maximum(held, 0) if mode == "long" else held
+
+def simulate(held, close, cost=COST, per_year=252):
+    """Metrics of every row of `held` (rules x bars) over the close series."""
+    rules, n = held.shape
+    held = held.astype(float)
+    returns = np.zeros(n)
+    returns[1:] = close[1:] / close[:-1] - 1
+    before = np.hstack([np.zeros((rules, 1)), held[:, :-1]])
+    gross = before * returns
+    net = gross - cost * np.abs(held - before)
+
+    equity = np.cumprod(1 + net, axis=1)
+    drawdown = 1 - equity / np.maximum.accumulate(np.maximum(equity, 1.0), axis=1)
+    total = equity[:, -1] - 1
+    years = n / per_year
+    with np.errstate(invalid="ignore", divide="ignore"):
+        annual = np.where(equity[:, -1] > 0, np.power(np.maximum(equity[:, -1], 0), 1 / years) - 1, -1.0)
+        std = net.std(axis=1)
+        sharpe = np.where(std > 0, net.mean(axis=1) / std * math.sqrt(per_year), 0.0)
+
+    # trades: runs of the same non-zero position; P&L from their bars' returns
+    starts = (held != 0) & (held != before)
+    trades = starts.sum(axis=1)
+    ids = np.cumsum(starts, axis=1) - 1 + np.concatenate([[0], np.cumsum(trades)[:-1]])[:, None]
+    open_before = before != 0
+    logs = np.log(np.maximum(1 + gross, 1e-12))
+    pnl = np.bincount(np.hstack([np.zeros((rules, 1), dtype=int), ids[:, :-1]])[open_before],
+                      weights=logs[open_before], minlength=int(trades.sum()))
+    pnl += 2 * math.log1p(-cost)
+    wins = np.bincount(np.repeat(np.arange(rules), trades), weights=pnl > 0, minlength=rules)
+
+    return [{
+        "total_return": round(float(total[i]) * 100, 2),
+        "annual_return": round(float(annual[i]) * 100, 2),
+        "max_drawdown": round(float(drawdown[i].max()) * 100, 2),
+        "sharpe": round(float(sharpe[i]), 2),
+        "trades": int(trades[i]),
+        "hit_rate": round(float(wins[i] / trades[i]) * 100, 1) if trades[i] else None,
+        "exposure": round(float((held[i] != 0).mean()) * 100, 1),
+    } for i in range(rules)]
+
+def backtest(close, high, low, windows=WINDOWS, macd_windows=MACD_WINDOWS, cost=COST,
+             mode="long", tf="1D", vote_term="medium"):
+    """{rule: metrics} of every rule, the summary votes and buy_and_hold."""
+    if mode not in MODES:
+        raise ValueError(f"Unknown mode {mode!r} (choose from {list(MODES)})")
+    close = np.asarray(close, dtype=float)
+    votes = rule_votes(close, high, low, windows, macd_windows, vote_term)
+    names = list(votes)
+    held = positions(np.vstack([votes[name] for name in names]), mode)
+    held = np.vstack([held, np.ones(len(close), dtype=held.dtype)])
+    metrics = simulate(held, close, cost, bars_per_year(tf))
+    return dict(zip(names + ["buy_and_hold"], metrics))
+
+def backtest_issuer(publisher_code, tf="1D", cost=COST, mode="long"):
+    """backtest() of one issuer's history, in the shape of the API response."""
+    from technical_analysis import load_histories
+    tf = (tf or "1D").strip().upper()
+    parse_timeframe(tf)
+    with reading(STOCK_DB_PATH) as conn:
+        histories = load_histories(conn, [publisher_code], tf)
+    if publisher_code not in histories:
+        return {"publisher": publisher_code, "tf": tf, "msg": "No data found", "rules": {}}
+    dates, close, high, low = histories[publisher_code]
+    return {
+        "publisher": publisher_code,
+        "tf": tf,
+        "cost": cost,
+        "mode": mode,
+        "from": str(dates[0]),
+        "to": str(dates[-1]),
+        "bars": len(close),
+        "rules": backtest(close, high, low, cost=cost, mode=mode, tf=tf),
+    }
+
+def window_sets(sweep=SWEEP):
+    """Every combination of the sweep's windows with short < medium < long."""
+    return [dict(zip(sweep, combo)) for combo in itertools.product(*sweep.values())
+            if list(combo) == sorted(set(combo))]
+
+def rule_label(rule, windows, macd_windows=MACD_WINDOWS, vote_term="medium"):
+    """'rsi_medium' -> 'rsi(14)': the rule with the windows it depends on."""
+    if rule == "buy_and_hold":
+        return rule
+    if rule.endswith("Summary"):
+        return f"{rule}({windows[vote_term]})"
+    name, term = rule.rsplit("_", 1)
+    if name == "macd":
+        return f"macd({'/'.join(str(w) for w in macd_windows[term])})"
+    return f"{name}({windows[term]})"
+
+def _sweep_issuer(code, close, high, low, grid, cost, mode, tf):
+    """Runs in a worker: {rule label: metrics} of one issuer over every window set
+    (a rule whose windows repeat in several sets is counted once)."""
+    results = {}
+    for windows in grid:
+        for rule, metrics in backtest(close, high, low, windows, cost=cost, mode=mode, tf=tf).items():
+            results.setdefault(rule_label(rule, windows), metrics)
+    return code, results
+
+def sweep(histories, grid=None, cost=COST, mode="long", tf="1D", workers=None):
+    """
+    Backtest every window set of `grid` on every issuer of `histories`
+    ({code: (dates, close, high, low)}, see technical_analysis.load_histories),
+    one issuer per task in a process pool. Returns rows of (rule label,
+    issuers, mean annual return, mean max drawdown, mean hit rate), best
+    annual return first.
+    """
+    grid = grid or window_sets()
+    workers = workers or os.cpu_count() or 1
+    if not histories:
+        return []
+    run = partial(_sweep_issuer, grid=grid, cost=cost, mode=mode, tf=tf)
+    tasks = zip(*[(code, close, high, low) for code, (_, close, high, low) in histories.items()])
+    executor = None
+    if workers > 1:
+        executor = ProcessPoolExecutor(max_workers=workers,
+                                       mp_context=multiprocessing.get_context("spawn"))
+        results = executor.map(run, *tasks, chunksize=4)
+    else:
+        results = map(run, *tasks)
+    totals = {}
+    try:
+        for code, rules in results:
+            for label, m in rules.items():
+                entry = totals.setdefault(label, [0, 0.0, 0.0, 0.0, 0])
+                entry[0] += 1
+                entry[1] += m["annual_return"]
+                entry[2] += m["max_drawdown"]
+                if m["hit_rate"] is not None:
+                    entry[3] += m["hit_rate"]
+                    entry[4] += 1
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    rows = [(label, n, annual / n, drawdown / n, hits / with_trades if with_trades else None)
+            for label, (n, annual, drawdown, hits, with_trades) in totals.items()]
+    rows.sort(key=lambda row: -row[2])
+    return rows
+
+def main():
+    from technical_analysis import load_histories
+    parser = argparse.ArgumentParser(description="Sweep the signal rules over every issuer.")
+    parser.add_argument("codes", nargs="*", help="issuers (default: all)")
+    parser.add_argument("--db", default=str(STOCK_DB_PATH))
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--cost", type=float, default=COST)
+    parser.add_argument("--mode", choices=MODES, default="long")
+    parser.add_argument("--tf", default="1D")
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    with reading(args.db) as conn:
+        histories = load_histories(conn, args.codes or None, args.tf.upper())
+    loaded = time.perf_counter()
+    grid = window_sets()
+    rows = sweep(histories, grid, args.cost, args.mode, args.tf.upper(), args.workers)
+    done = time.perf_counter()
+
+    print(f"{len(histories)} issuers x {len(grid)} window sets, loaded in {loaded - start:.1f}s, "
+          f"backtested in {done - loaded:.1f}s ({args.workers} workers)")
+    print(f"{'rule':22s} {'issuers':>7s} {'annual %':>9s} {'max dd %':>9s} {'hit %':>6s}")
+    for label, n, annual, drawdown, hit in rows[:args.top]:
+        hit = f"{hit:6.1f}" if hit is not None else "     -"
+        print(f"{label:22s} {n:7d} {annual:9.2f} {drawdown:9.2f} {hit}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
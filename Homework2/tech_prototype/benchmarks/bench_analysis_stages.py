@@ -0,0 +1,145 @@
+"""
+Time the stages of compute_all_indicators_and_aggregate on long synthetic
+histories: load (SQLite -> DataFrame), parse (typing + date/close records),
+indicators (final row, vectorized kernel) and serialize (JSON body).
+
+Loading from the memory-mapped price arrays (price_arrays.py), which replaces
+both load and parse, is timed as well.
+
+The parse stage is also timed the old way (pd.to_numeric per column and an
+iterrows() loop building the records) for comparison.
+
+Usage:
+    python benchmarks/bench_analysis_stages.py                # 10k and 100k rows
+    python benchmarks/bench_analysis_stages.py 250000         # other sizes
+"""
+import json
+import math
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import pandas as pd
+
+import price_arrays
+import technical_analysis
+from technical_analysis import (
+    load_frame, load_array_frame, prepare_frame, history_records,
+    storeIndicatorsInFinalRowVector, summarize
+)
+
+SIZES = (10_000, 100_000)
+REPEAT = 5
+CODE = "SYN"
+
+def synthetic_db(path, rows, code=CODE):
+    """stock_data file with `rows` consecutive days of one issuer."""
+    conn = sqlite3.connect(path)
+    conn.execute('''
+        CREATE TABLE stock_data (
+            publisher_code TEXT NOT NULL, date TEXT NOT NULL, price REAL, max REAL,
+            min REAL, avg REAL, percent_change REAL, quantity INTEGER,
+            best_turnover REAL, total_turnover REAL,
+            PRIMARY KEY (publisher_code, date)
+        ) WITHOUT ROWID
+    ''')
+    rnd = random.Random(0)
+    day, price, data = date(2025, 1, 1) - timedelta(days=rows), 1000.0, []
+    for _ in range(rows):
+        day += timedelta(days=1)
+        change = rnd.uniform(-0.03, 0.03)
+        price *= 1 + change
+        qty = rnd.randint(1, 5000)
+        data.append((code, day.isoformat(), round(price, 2), round(price * 1.01, 2),
+                     round(price * 0.99, 2), round(price, 2), round(change * 100, 2),
+                     qty, round(qty * price, 2), round(qty * price, 2)))
+    conn.executemany("INSERT INTO stock_data VALUES (?,?,?,?,?,?,?,?,?,?)", data)
+    conn.commit()
+    conn.close()
+
+def legacy_parse(df):
+    """The preparation stage before it was vectorized."""
+    df = df.rename(columns={"price": "close", "quantity": "volume", "max": "high", "min": "low"})
+    df["date"] = pd.to_datetime(df["date"], format="%Y-%m-%d", errors="coerce")
+    for col in ["close", "high", "low", "volume"]:
+        df[col] = pd.to_numeric(df[col], errors="coerce")
+    df = df.dropna(subset=["date", "close"])
+    records = []
+    for i, row in df.iterrows():
+        if pd.isna(row["date"]): continue
+        records.append({
+            "date": str(row["date"].date()),
+            "close": None if math.isnan(row["close"]) else round(row["close"], 2),
+        })
+    return df, records
+
+def parse(df):
+    df = prepare_frame(df)
+    return df, history_records(df)
+
+def timed(fn, *args):
+    """(result of the last run, ms per run)."""
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        result = fn(*args)
+    return result, (time.perf_counter() - start) * 1000 / REPEAT
+
+def serialize(df, records):
+    last = records[-1]
+    osc, ma, overall = summarize(last)
+    body = {"publisher": CODE, "records": records, "msg": f"Found {len(records)} rows (tf=1D)",
+            "oscSummary": osc, "maSummary": ma, "overallSummary": overall}
+    return json.dumps(body, sort_keys=True)     # what jsonify does
+
+def run(rows, directory):
+    path = os.path.join(directory, f"stages_{rows}.db")
+    synthetic_db(path, rows)
+    technical_analysis.STOCK_DB_PATH = path
+    conn = sqlite3.connect(path)
+    price_arrays.update_issuer(conn, price_arrays.arrays_dir(path), CODE)
+    conn.close()
+
+    raw, load_ms = timed(load_frame, CODE, "1D")
+    (_, old_records), legacy_ms = timed(legacy_parse, raw)
+    (df, records), parse_ms = timed(parse, raw)
+    same = old_records == records
+
+    def from_arrays():
+        frame = load_array_frame(CODE)
+        return frame, history_records(frame)
+    (_, array_records), arrays_ms = timed(from_arrays)
+    same = same and array_records == records
+
+    def indicators():
+        final = [dict(records[-1])]
+        storeIndicatorsInFinalRowVector(df, final)
+        return final
+    final, indicators_ms = timed(indicators)
+    records[-1] = final[-1]
+    body, serialize_ms = timed(serialize, df, records)
+
+    print(f"{rows} rows")
+    print(f"  load        {load_ms:9.2f} ms")
+    print(f"  parse       {parse_ms:9.2f} ms   (iterrows: {legacy_ms:.2f} ms, "
+          f"{legacy_ms / parse_ms:.0f}x; records {'identical' if same else 'DIFFER'})")
+    print(f"  arrays      {arrays_ms:9.2f} ms   (load + parse from the mapped price arrays)")
+    print(f"  indicators  {indicators_ms:9.2f} ms")
+    print(f"  serialize   {serialize_ms:9.2f} ms   ({len(body) / 1024:.0f} KB)")
+    print(f"  total       {load_ms + parse_ms + indicators_ms + serialize_ms:9.2f} ms")
+    return same
+
+def main():
+    sizes = [int(a) for a in sys.argv[1:]] or SIZES
+    with tempfile.TemporaryDirectory() as directory:
+        ok = all([run(rows, directory) for rows in sizes])
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+"""
+Time the final-row indicator engines of technical_analysis.py and check the
+vectorized kernel against ta over the whole series.
+
+Usage:
+    python benchmarks/bench_indicator_kernel.py            # synthetic bars
+    python benchmarks/bench_indicator_kernel.py ALK        # one issuer from stock_data.db
+"""
+import math
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+
+import technical_analysis
+from check_streaming_indicators import BARS, TOLERANCE, synthetic_bars, issuer_bars, ta_series
+from indicator_kernel import compute_indicators
+
+REPEAT = 5
+ENGINES = {
+    "ta": lambda df, records: technical_analysis.storeIndicatorsInFinalRow(df, records, 7, 14, 30),
+    "streaming": technical_analysis.storeIndicatorsInFinalRowStreaming,
+    "vector": technical_analysis.storeIndicatorsInFinalRowVector,
+}
+
+def check(df):
+    """Largest relative difference per family between the kernel and ta."""
+    reference = ta_series(df)
+    series = compute_indicators(df["close"].to_numpy(), df["high"].to_numpy(), df["low"].to_numpy())
+    worst, bad = {}, 0
+    for key, expected in reference.items():
+        expected = expected.to_numpy()
+        got = series[key].copy()
+        if key[0] == "macd":
+            got[np.isnan(series[("macd_signal", key[1])])] = np.nan
+        both = ~np.isnan(expected) & ~np.isnan(got)
+        mismatched = int((np.isnan(expected) != np.isnan(got)).sum())
+        finite = both & np.isfinite(expected)
+        mismatched += int((expected[both & ~finite] != got[both & ~finite]).sum())
+        err = np.abs(expected[finite] - got[finite]) / np.maximum(1.0, np.abs(expected[finite]))
+        err = float(err.max()) if err.size else 0.0
+        worst[key[0]] = max(worst.get(key[0], 0.0), err if not mismatched else math.inf)
+        bad += mismatched + int((err > TOLERANCE))
+    return worst, bad
+
+def main():
+    df = issuer_bars(sys.argv[1]) if len(sys.argv) > 1 else synthetic_bars(BARS)
+    print(f"{len(df)} bars")
+
+    worst, bad = check(df)
+    for indicator, err in sorted(worst.items()):
+        print(f"  {indicator:10s} max rel. error {err:.2e}")
+
+    finals = {}
+    for name, engine in ENGINES.items():
+        start = time.perf_counter()
+        for _ in range(REPEAT):
+            records = [{}]
+            engine(df, records)
+        ms = (time.perf_counter() - start) * 1000 / REPEAT
+        finals[name] = records[-1]
+        print(f"{name:10s} {ms:8.2f} ms per request")
+    same = all(finals[name] == finals["ta"] for name in finals)
+    print("final rows identical" if same else "final rows DIFFER")
+    print("OK" if bad == 0 and same else f"{bad} values differ by more than {TOLERANCE}")
+    return 0 if bad == 0 and same else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,82 @@
+"""
+Bytes and encode time of the /api/stock_data encodings (wire_format.py)
+for one issuer's full history.
+
+Usage:
+    python benchmarks/bench_wire_format.py                    # synthetic 10-year history
+    python benchmarks/bench_wire_format.py stock_data.db ALK  # a stored issuer
+"""
+import gzip
+import json
+import random
+import sqlite3
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from price_history import load_history, load_history_columns
+from wire_format import JSON_COLUMNS, PACKED, ARROW, arrow_available, encode
+
+YEARS = 10
+REPEAT = 20
+
+def synthetic_db(years=YEARS, code="SYN"):
+    """In-memory stock_data with ~250 trading days per year."""
+    conn = sqlite3.connect(":memory:")
+    conn.execute('''
+        CREATE TABLE stock_data (
+            publisher_code TEXT NOT NULL, date TEXT NOT NULL, price REAL, max REAL,
+            min REAL, avg REAL, percent_change REAL, quantity INTEGER,
+            best_turnover REAL, total_turnover REAL,
+            PRIMARY KEY (publisher_code, date)
+        ) WITHOUT ROWID
+    ''')
+    rnd = random.Random(0)
+    day, price, rows = date(2015, 1, 1), 1000.0, []
+    while len(rows) < years * 250:
+        day += timedelta(days=1)
+        if day.weekday() >= 5:
+            continue
+        change = rnd.uniform(-0.03, 0.03)
+        price *= 1 + change
+        qty = rnd.randint(1, 5000)
+        rows.append((code, day.isoformat(), round(price, 2), round(price * 1.01, 2),
+                     round(price * 0.99, 2), round(price, 2), round(change * 100, 2),
+                     qty, round(qty * price, 2), round(qty * price, 2)))
+    conn.executemany("INSERT INTO stock_data VALUES (?,?,?,?,?,?,?,?,?,?)", rows)
+    return conn, code
+
+def timed(fn):
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        body = fn()
+    return body, (time.perf_counter() - start) * 1000 / REPEAT
+
+def main():
+    if len(sys.argv) > 2:
+        conn, code = sqlite3.connect(sys.argv[1]), sys.argv[2]
+    else:
+        conn, code = synthetic_db()
+
+    encodings = {
+        "json rows (current)": lambda: json.dumps(load_history(conn, code)).encode(),
+        "json columns": lambda: encode(JSON_COLUMNS, *load_history_columns(conn, code)),
+        "packed binary": lambda: encode(PACKED, *load_history_columns(conn, code, display_dates=False)),
+    }
+    if arrow_available():
+        encodings["arrow ipc"] = lambda: encode(ARROW, *load_history_columns(conn, code, display_dates=False))
+    else:
+        print("(pyarrow not installed: arrow ipc skipped)")
+
+    rows = conn.execute("SELECT COUNT(*) FROM stock_data WHERE publisher_code = ?", (code,)).fetchone()[0]
+    print(f"{code}: {rows} rows, query + encode, mean of {REPEAT} runs")
+    print(f"{'encoding':22s} {'bytes':>10s} {'gzip':>10s} {'ms':>8s}")
+    for name, fn in encodings.items():
+        body, ms = timed(fn)
+        print(f"{name:22s} {len(body):10d} {len(gzip.compress(body)):10d} {ms:8.2f}")
+
+if __name__ == "__main__":
+    main()
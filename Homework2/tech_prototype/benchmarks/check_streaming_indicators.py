@@ -0,0 +1,116 @@
+"""
+Compare the streaming indicator engine with the ta library, bar by bar.
+
+Usage:
+    python benchmarks/check_streaming_indicators.py            # synthetic bars (with gaps in high/low)
+    python benchmarks/check_streaming_indicators.py ALK        # one issuer from stock_data.db
+
+Prints the largest absolute difference per indicator family over the whole
+series, and the time per bar of both engines.
+"""
+import math
+import random
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import pandas as pd
+from ta.momentum import StochasticOscillator, RSIIndicator, WilliamsRIndicator
+from ta.trend import CCIIndicator, MACD, SMAIndicator, EMAIndicator, WMAIndicator
+from ta.volatility import BollingerBands
+
+from signals import WINDOWS, MACD_WINDOWS
+from streaming_indicators import IndicatorSet
+from technical_analysis import STOCK_DB_PATH
+
+BARS = 3000
+TOLERANCE = 1e-6
+
+def synthetic_bars(n, seed=0):
+    rnd = random.Random(seed)
+    price = 1000.0
+    rows = []
+    for i in range(n):
+        price *= 1 + rnd.uniform(-0.03, 0.03)
+        high = price * (1 + rnd.uniform(0, 0.02))
+        low = price * (1 - rnd.uniform(0, 0.02))
+        if rnd.random() < 0.02:     # days without a max/min on the MSE page
+            high = low = None
+        if rnd.random() < 0.01:     # flat stretch (zero range, zero diffs)
+            high = low = price
+        rows.append((price, high, low))
+    return pd.DataFrame(rows, columns=["close", "high", "low"], dtype=float)
+
+def issuer_bars(code):
+    conn = sqlite3.connect(STOCK_DB_PATH)
+    df = pd.read_sql_query('''
+        SELECT price AS close, max AS high, min AS low
+        FROM stock_data
+        WHERE publisher_code = ? AND price IS NOT NULL
+        ORDER BY date ASC
+    ''', conn, params=[code])
+    conn.close()
+    return df.astype(float)
+
+def ta_series(df):
+    """{(indicator, term): Series} computed the way technical_analysis.py does."""
+    close, high, low = df["close"], df["high"], df["low"]
+    out = {}
+    for term, window in WINDOWS.items():
+        out[("rsi", term)] = RSIIndicator(close, window=window).rsi()
+        out[("stoch", term)] = StochasticOscillator(high, low, close, window=window).stoch()
+        out[("cci", term)] = CCIIndicator(high, low, close, window=window).cci()
+        out[("williamsr", term)] = WilliamsRIndicator(high, low, close, lbp=window).williams_r()
+        out[("sma", term)] = SMAIndicator(close, window=window).sma_indicator()
+        out[("ema", term)] = EMAIndicator(close, window=window).ema_indicator()
+        out[("wma", term)] = WMAIndicator(close, window=window).wma()
+        out[("boll", term)] = BollingerBands(close, window=window).bollinger_mavg()
+        fast, slow, sign = MACD_WINDOWS[term]
+        macd = MACD(close, window_slow=slow, window_fast=fast, window_sign=sign)
+        # a MACD signal needs both lines, so the engine only reports it from then on
+        out[("macd", term)] = macd.macd().where(macd.macd_signal().notna())
+    return out
+
+def main():
+    df = issuer_bars(sys.argv[1]) if len(sys.argv) > 1 else synthetic_bars(BARS)
+    print(f"{len(df)} bars")
+
+    start = time.perf_counter()
+    reference = ta_series(df)
+    ta_seconds = time.perf_counter() - start
+
+    engine = IndicatorSet()
+    streamed = []
+    start = time.perf_counter()
+    for close, high, low in zip(df["close"].tolist(), df["high"].tolist(), df["low"].tolist()):
+        streamed.append(engine.update(close, high, low))
+    stream_seconds = time.perf_counter() - start
+
+    worst = {}
+    bad = 0
+    for key, series in reference.items():
+        for i, expected in enumerate(series.tolist()):
+            got = streamed[i].get(key, (math.nan, None))[0]
+            if math.isnan(expected) and math.isnan(got):
+                continue
+            if math.isinf(expected) and got == expected:
+                continue
+            diff = abs(expected - got) if not (math.isnan(expected) or math.isnan(got)) else math.inf
+            scale = max(1.0, abs(expected))
+            worst[key[0]] = max(worst.get(key[0], 0.0), diff / scale)
+            if diff / scale > TOLERANCE:
+                bad += 1
+
+    for indicator, err in sorted(worst.items()):
+        print(f"  {indicator:10s} max rel. error {err:.2e}")
+    per_bar = 1e6 / max(1, len(df))
+    print(f"ta:        {ta_seconds * per_bar:8.1f} us/bar (whole series, 30 objects)")
+    print(f"streaming: {stream_seconds * per_bar:8.1f} us/bar (one update per bar)")
+    print("OK" if bad == 0 else f"{bad} values differ by more than {TOLERANCE}")
+    return 1 if bad else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
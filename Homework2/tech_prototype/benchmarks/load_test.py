@@ -0,0 +1,106 @@
+"""
+Requests/second of the Flask app at 1, 8 and 32 concurrent clients, with a
+fresh sqlite3.connect per request (before) and with the pooled read-only
+connections of db.py (after).
+
+Usage:
+    python benchmarks/load_test.py                  # stock_data.db / publishers.db next to app.py
+    python benchmarks/load_test.py path/to/stock_data.db path/to/publishers.db [seconds]
+
+The response cache is switched off (it would answer everything from memory);
+pass --cache to measure with it.
+"""
+import logging
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import requests
+from werkzeug.serving import make_server
+
+import app as app_module
+import db
+import technical_analysis
+from response_cache import ResponseCache
+
+CLIENTS = (1, 8, 32)
+SECONDS = 5.0
+
+def endpoints(stock_db):
+    """{endpoint: [urls]}, cycling over up to 8 issuers."""
+    conn = sqlite3.connect(stock_db)
+    codes = [row[0] for row in conn.execute(
+        "SELECT DISTINCT publisher_code FROM stock_data LIMIT 8"
+    )]
+    conn.close()
+    return {
+        "publishers": ["/api/publishers"],
+        "stock_data": [f"/api/stock_data?publisher={code}" for code in codes],
+        "technical_analysis": [f"/api/technical_analysis?publisher={code}&tf=1D" for code in codes],
+    }
+
+def run_clients(base, urls, clients, seconds, latencies=None):
+    """(requests/second, errors); the seconds of every request are appended
+    to `latencies` if given."""
+    done = [0] * clients
+    errors = [0] * clients
+    stop = time.perf_counter() + seconds
+
+    def client(i):
+        session = requests.Session()
+        n = i
+        while time.perf_counter() < stop:
+            sent = time.perf_counter()
+            response = session.get(base + urls[n % len(urls)])
+            if latencies is not None:
+                latencies.append(time.perf_counter() - sent)
+            if response.status_code == 200:
+                done[i] += 1
+            else:
+                errors[i] += 1
+            n += 1
+        session.close()
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(done) / (time.perf_counter() - start), sum(errors)
+
+def main():
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    stock_db = Path(args[0]) if args else app_module.STOCK_DB_PATH
+    publishers_db = Path(args[1]) if len(args) > 1 else app_module.PUBLISHERS_DB_PATH
+    seconds = float(args[2]) if len(args) > 2 else SECONDS
+    app_module.STOCK_DB_PATH = technical_analysis.STOCK_DB_PATH = stock_db
+    app_module.PUBLISHERS_DB_PATH = publishers_db
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    if "--cache" not in sys.argv:
+        app_module.response_cache = ResponseCache(max_entries=0)
+    app_module.init_db()
+
+    server = make_server("127.0.0.1", 0, app_module.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+    print(f"{seconds:.0f}s per run")
+
+    for endpoint, urls in endpoints(stock_db).items():
+        print(f"/api/{endpoint}")
+        for label, pooling in (("before", False), ("after", True)):
+            db.POOLING = pooling
+            db.close_all()
+            rates = []
+            for clients in CLIENTS:
+                rate, errors = run_clients(base, urls, clients, seconds)
+                rates.append(f"{clients:3d} clients {rate:8.1f} req/s" + (f" ({errors} errors)" if errors else ""))
+            print(f"  {label:6s} " + " | ".join(rates))
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
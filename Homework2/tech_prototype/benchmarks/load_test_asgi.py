@@ -0,0 +1,124 @@
+"""
+The Flask app (app.py, threaded werkzeug server) against the ASGI entry point
+(asgi_app.py under uvicorn) at 1, 32 and 256 concurrent clients: requests per
+second, p50 / p95 latency and errors of /api/publishers, /api/stock_data and
+/api/technical_analysis.
+
+Usage:
+    python benchmarks/load_test_asgi.py                  # stock_data.db / publishers.db next to app.py
+    python benchmarks/load_test_asgi.py path/to/stock_data.db path/to/publishers.db [seconds]
+
+Each server runs in its own process (this file with --serve), so the client
+threads do not share its GIL. The response cache is switched off as in
+load_test.py; pass --cache to measure with it. Needs starlette and uvicorn.
+"""
+import logging
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import requests
+
+from load_test import endpoints, run_clients
+
+CLIENTS = (1, 32, 256)
+SECONDS = 5.0
+SERVERS = ("flask", "asgi")
+
+def serve(kind, stock_db, publishers_db, port, cache):
+    """Run one server in this process until it is killed."""
+    import app as app_module
+    import technical_analysis
+    from response_cache import ResponseCache
+
+    app_module.STOCK_DB_PATH = technical_analysis.STOCK_DB_PATH = Path(stock_db)
+    app_module.PUBLISHERS_DB_PATH = Path(publishers_db)
+    if not cache:
+        app_module.response_cache = ResponseCache(max_entries=0)
+    if kind == "flask":
+        from werkzeug.serving import make_server
+        logging.getLogger("werkzeug").setLevel(logging.ERROR)
+        app_module.init_db()
+        app_module.analysis_pool.start()
+        # terminate() -> SystemExit, so the analysis workers are shut down too
+        signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+        try:
+            make_server("127.0.0.1", port, app_module.app, threaded=True).serve_forever()
+        finally:
+            app_module.analysis_pool.shutdown()
+    else:
+        import uvicorn
+        import asgi_app
+        uvicorn.run(asgi_app.app, host="127.0.0.1", port=port, log_level="error",
+                    backlog=4096, timeout_keep_alive=30)
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_server(kind, stock_db, publishers_db, cache):
+    """(process, base url) once the server answers."""
+    port = free_port()
+    command = [sys.executable, __file__, "--serve", kind, str(stock_db), str(publishers_db), str(port)]
+    process = subprocess.Popen(command + (["--cache"] if cache else []))
+    base = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            requests.get(base + "/api/publishers", timeout=1)
+            return process, base
+        except requests.ConnectionError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"{kind} server did not start")
+
+def percentile(values, q):
+    return statistics.quantiles(values, n=100)[q - 1] if len(values) > 1 else (values or [0.0])[0]
+
+def main():
+    if "--serve" in sys.argv:
+        kind, stock_db, publishers_db, port = sys.argv[sys.argv.index("--serve") + 1:][:4]
+        return serve(kind, stock_db, publishers_db, int(port), "--cache" in sys.argv)
+
+    import app as app_module
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    stock_db = Path(args[0]) if args else app_module.STOCK_DB_PATH
+    publishers_db = Path(args[1]) if len(args) > 1 else app_module.PUBLISHERS_DB_PATH
+    seconds = float(args[2]) if len(args) > 2 else SECONDS
+    print(f"{seconds:.0f}s per run, clients {', '.join(map(str, CLIENTS))}")
+
+    urls = endpoints(stock_db)
+    results = {}
+    for kind in SERVERS:
+        process, base = start_server(kind, stock_db, publishers_db, "--cache" in sys.argv)
+        try:
+            for endpoint, paths in urls.items():
+                run_clients(base, paths, 1, 0.5)    # warm up
+                for clients in CLIENTS:
+                    latencies = []
+                    rate, errors = run_clients(base, paths, clients, seconds, latencies)
+                    results[endpoint, kind, clients] = (rate, percentile(latencies, 50),
+                                                       percentile(latencies, 95), errors)
+        finally:
+            process.terminate()
+            process.wait()
+
+    for endpoint in urls:
+        print(f"/api/{endpoint}")
+        for clients in CLIENTS:
+            cells = []
+            for kind in SERVERS:
+                rate, p50, p95, errors = results[endpoint, kind, clients]
+                cells.append(f"{kind} {rate:7.1f} req/s p50 {p50 * 1000:7.1f} ms p95 {p95 * 1000:7.1f} ms"
+                             + (f" ({errors} errors)" if errors else ""))
+            print(f"  {clients:3d} clients  " + " | ".join(cells))
+
+if __name__ == "__main__":
+    main()
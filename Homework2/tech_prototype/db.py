@@ -0,0 +1,144 @@
+"""
+Shared SQLite access for the Flask app.
+
+Connections are kept in small pools per database file instead of being
+opened and closed on every request:
+
+  - read connections are opened with mode=ro and PRAGMA query_only, with a
+    large page cache and memory-mapped I/O; the database is in WAL mode, so
+    they never wait for the ingest writer (and it never waits for them)
+  - write connections (users table, lazily built stores) wait on a busy
+    timeout instead of failing when the ingest holds the write lock
+
+Every pooled connection keeps its statement cache, so the endpoints' fixed
+queries are prepared once per connection rather than once per request.
+
+Usage:
+    with reading(STOCK_DB_PATH) as conn:
+        conn.execute(...)
+    with writing(PUBLISHERS_DB_PATH) as conn:
+        with conn:          # commit
+            conn.execute(...)
+"""
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+POOL_SIZE = 16                   # idle connections kept per database
+STATEMENT_CACHE = 256            # prepared statements kept per connection
+MMAP_SIZE = 256 * 1024 * 1024    # bytes of the file mapped into memory
+CACHE_SIZE = -32768              # 32 MB page cache per connection
+BUSY_TIMEOUT = 5.0               # seconds a writer waits for the lock
+
+# False = open and close a connection for every use (the old behaviour,
+# kept for benchmarks/load_test.py)
+POOLING = True
+
+def _open(path, readonly):
+    if readonly:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True,
+                               check_same_thread=False, cached_statements=STATEMENT_CACHE)
+        conn.execute("PRAGMA query_only=1")
+    else:
+        conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT,
+                               check_same_thread=False, cached_statements=STATEMENT_CACHE)
+        conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+    conn.execute(f"PRAGMA cache_size={CACHE_SIZE}")
+    return conn
+
+def ensure_wal(path):
+    """Switch a database to WAL once (the setting is stored in the file)."""
+    if not os.path.exists(path):
+        return False  # don't create an empty database as a side effect
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+    finally:
+        conn.close()
+    return True
+
+class ConnectionPool:
+    """LIFO pool of connections to one database file.
+
+    A connection is used by one thread at a time (check_same_thread is off
+    only so it can move between the server's request threads).
+    """
+    def __init__(self, path, readonly=True, size=POOL_SIZE):
+        self.path = str(path)
+        self.readonly = readonly
+        self.idle = queue.LifoQueue(maxsize=size)
+        self.wal_checked = False
+        self.lock = threading.Lock()
+
+    def _acquire(self):
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self.lock:
+            if not self.wal_checked:
+                self.wal_checked = ensure_wal(self.path)
+        return _open(self.path, self.readonly)
+
+    def _release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        try:
+            self.idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    @contextmanager
+    def connection(self):
+        if not POOLING:
+            conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT)
+            try:
+                yield conn
+            finally:
+                conn.close()
+            return
+        conn = self._acquire()
+        try:
+            yield conn
+        except sqlite3.Error:
+            # don't hand a connection in an unknown state to the next request
+            conn.close()
+            raise
+        except BaseException:
+            self._release(conn)
+            raise
+        else:
+            self._release(conn)
+
+    def close_all(self):
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def _pool(path, readonly):
+    key = (str(path), readonly)
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = ConnectionPool(path, readonly)
+        return _pools[key]
+
+def reading(path):
+    """Pooled read-only connection to `path` (a context manager)."""
+    return _pool(path, True).connection()
+
+def writing(path):
+    """Pooled read-write connection to `path` (a context manager)."""
+    return _pool(path, False).connection()
+
+def close_all():
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close_all()
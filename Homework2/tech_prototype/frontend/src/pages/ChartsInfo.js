@@ -102,9 +102,9 @@ const ChartsInfo = () => {
         if (res.data.records && res.data.records.length) {
           const enriched = res.data.records.map((r) => {
             const timestamp = parseTimestamp(r.date);
-            const priceVal = parseFloat((r.price || "0").replace(",", "")) || 0;
-            const volumeVal =
-              parseFloat((r.volume || "0").replace(",", "")) || 0;
+            // price/volume arrive as numbers (typed columns in stock_data)
+            const priceVal = Number(r.price) || 0;
+            const volumeVal = Number(r.volume) || 0;
             return {
               ...r,
               fullDate: r.date,
@@ -137,7 +137,7 @@ const ChartsInfo = () => {
     const prices = data.map((d) => d.priceVal);
     const volumes = data.map((d) => d.volumeVal);
     const turnovers = data.map(
-      (d) => parseFloat((d.total_turnover || "0").replace(",", "")) || 0
+      (d) => Number(d.total_turnover) || 0
     );
 
     const highestPrice = Math.max(...prices);
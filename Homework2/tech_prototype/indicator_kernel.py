@@ -0,0 +1,218 @@
+"""
+Vectorized indicator kernel: every indicator family for every window in one
+pass over the close/high/low arrays (NumPy only).
+
+  - SMA / Bollinger: one cumulative sum (and sum of squares) shared by all windows
+  - rolling high/low, WMA, CCI: sliding_window_view over the arrays
+  - EMA, RSI and MACD: all EMA series stacked into one matrix and advanced
+    together by a blocked recurrence (see ema_batch)
+
+The NaN / min_periods rules are the ones of the `ta` classes used in
+technical_analysis.py; benchmarks/bench_indicator_kernel.py checks the
+results against ta and times both.
+"""
+import math
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+import metrics
+from signals import WINDOWS, MACD_WINDOWS, OSCILLATOR_SIGNALS, macd_signal, ma_signal
+
+# Bars per block in ema_batch. The weights inside a block are powers of
+# (1 - alpha) up to EMA_BLOCK, which stay far from underflow for our windows.
+EMA_BLOCK = 64
+
+def _rolling(x, window, reduce):
+    """reduce() over every full window, NaN-padded to len(x) (pandas min_periods=window)."""
+    out = np.full(len(x), np.nan)
+    if len(x) >= window:
+        out[window - 1:] = reduce(sliding_window_view(x, window))
+    return out
+
+def _rolling_sums(x, windows):
+    """{window: (sum, centred sum of squares, centre)} from one cumulative sum.
+
+    The data is centred first so the cumulative sums stay small and the
+    differences keep their precision; windows holding a NaN come out NaN.
+    """
+    nans = np.isnan(x)
+    ref = float(np.nanmean(x)) if not nans.all() else 0.0
+    centred = np.where(nans, 0.0, x - ref)
+    cs = np.concatenate(([0.0], np.cumsum(centred)))
+    cs2 = np.concatenate(([0.0], np.cumsum(centred * centred)))
+    cnan = np.concatenate(([0], np.cumsum(nans)))
+
+    sums = {}
+    for window in windows:
+        total = np.full(len(x), np.nan)
+        total_sq = np.full(len(x), np.nan)
+        if len(x) >= window:
+            s = cs[window:] - cs[:-window]
+            s2 = cs2[window:] - cs2[:-window]
+            bad = (cnan[window:] - cnan[:-window]) > 0
+            # back from centred values: sum(x) = sum(c) + w*ref
+            total[window - 1:] = np.where(bad, np.nan, s + window * ref)
+            # keep the squares centred: only the variance is needed from them
+            total_sq[window - 1:] = np.where(bad, np.nan, s2)
+        sums[window] = (total, total_sq, ref)
+    return sums
+
+def ema_batch(X, alphas, starts, min_periods):
+    """ewm(alpha, adjust=False, min_periods) for every row of X at once.
+
+    Row i is seeded with X[i, starts[i]] and must hold no NaN from there on.
+    Inside a block of EMA_BLOCK bars the recurrence y' = y + a*(x - y) is a
+    matrix product with the lower-triangular weights a*(1-a)^(j-s); only the
+    last value is carried from block to block.
+    """
+    k, n = X.shape
+    alphas = np.asarray(alphas, dtype=float)
+    starts = np.asarray(starts)
+    out = np.full((k, n), np.nan)
+    if n == 0:
+        return out
+
+    # align every row on its own start, padding the tail with its last value
+    span = n - int(starts.min())
+    aligned = np.empty((k, span))
+    for i in range(k):
+        row = X[i, starts[i]:]
+        aligned[i, :len(row)] = row
+        aligned[i, len(row):] = row[-1] if len(row) else np.nan
+
+    decay = 1.0 - alphas
+    j = np.arange(EMA_BLOCK)
+    lag = j[:, None] - j[None, :]
+    weights = np.where(
+        lag >= 0,
+        alphas[:, None, None] * decay[:, None, None] ** np.maximum(lag, 0),
+        0.0
+    )                                                   # (k, B, B)
+    carry = decay[:, None] ** (j + 1)                   # (k, B)
+
+    result = np.empty((k, span))
+    prev = aligned[:, 0].copy()                         # seed: y_0 = x_0
+    for start in range(0, span, EMA_BLOCK):
+        block = aligned[:, start:start + EMA_BLOCK]
+        size = block.shape[1]
+        y = np.einsum("kjs,ks->kj", weights[:, :size, :size], block) + carry[:, :size] * prev[:, None]
+        result[:, start:start + size] = y
+        prev = y[:, -1]
+
+    for i in range(k):
+        first = starts[i] + min_periods[i] - 1
+        length = n - starts[i]
+        out[i, starts[i]:] = result[i, :length]
+        out[i, starts[i]:min(first, n)] = np.nan
+    return out
+
+def compute_indicators(close, high, low, windows=WINDOWS, macd_windows=MACD_WINDOWS):
+    """Full series of every indicator for every term, in one pass.
+
+    `close` must not contain NaN; `high` / `low` may (days without a max/min).
+    Returns {(indicator, term): ndarray} with the indicators of the analysis
+    page plus ("macd_signal", term), ("boll_upper", term), ("boll_lower", term).
+    """
+    close = np.asarray(close, dtype=float)
+    high = np.asarray(high, dtype=float)
+    low = np.asarray(low, dtype=float)
+    n = len(close)
+    out = {}
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # --- SMA / Bollinger from one cumulative sum ---
+        with metrics.span("mse_indicator_seconds", family="sma_boll"):
+            sums = _rolling_sums(close, set(windows.values()))
+            for term, window in windows.items():
+                total, total_sq, ref = sums[window]
+                mean = total / window
+                centred_mean = mean - ref
+                std = np.sqrt(np.maximum(total_sq / window - centred_mean * centred_mean, 0.0))
+                out[("sma", term)] = mean
+                out[("boll", term)] = mean
+                out[("boll_upper", term)] = mean + 2 * std
+                out[("boll_lower", term)] = mean - 2 * std
+
+        # --- rolling high/low, WMA, CCI over sliding windows ---
+        tp = (high + low + close) / 3.0
+        for term, window in windows.items():
+            with metrics.span("mse_indicator_seconds", family="stoch_williamsr"):
+                hh = _rolling(high, window, lambda v: v.max(axis=1))
+                ll = _rolling(low, window, lambda v: v.min(axis=1))
+                out[("stoch", term)] = 100 * (close - ll) / (hh - ll)
+                out[("williamsr", term)] = -100 * (hh - close) / (hh - ll)
+
+            with metrics.span("mse_indicator_seconds", family="wma"):
+                weights = np.arange(1, window + 1, dtype=float)
+                out[("wma", term)] = _rolling(close, window, lambda v: v @ weights / weights.sum())
+
+            def cci_part(v):
+                mean = v.mean(axis=1)
+                return mean, np.abs(v - mean[:, None]).mean(axis=1)
+            with metrics.span("mse_indicator_seconds", family="cci"):
+                tp_mean = np.full(n, np.nan)
+                mad = np.full(n, np.nan)
+                if n >= window:
+                    tp_mean[window - 1:], mad[window - 1:] = cci_part(sliding_window_view(tp, window))
+                out[("cci", term)] = (tp - tp_mean) / (0.015 * mad)
+
+        # --- EMA, RSI gains/losses and MACD fast/slow: one batched recurrence ---
+        with metrics.span("mse_indicator_seconds", family="ema_rsi_macd"):
+            diff = np.diff(close, prepend=close[:1])     # first diff = 0, like ta
+            gains, losses = np.maximum(diff, 0.0), np.maximum(-diff, 0.0)
+            rows, alphas, periods, keys = [], [], [], []
+            def add(key, x, alpha, window):
+                keys.append(key); rows.append(x); alphas.append(alpha); periods.append(window)
+            for term, window in windows.items():
+                add(("ema", term), close, 2.0 / (window + 1), window)
+                add(("rsi_up", term), gains, 1.0 / window, window)
+                add(("rsi_down", term), losses, 1.0 / window, window)
+            for term, (fast, slow, sign) in macd_windows.items():
+                add(("macd_fast", term), close, 2.0 / (fast + 1), fast)
+                add(("macd_slow", term), close, 2.0 / (slow + 1), slow)
+            emas = dict(zip(keys, ema_batch(np.vstack(rows), alphas, [0] * len(rows), periods)))
+
+            for term in windows:
+                out[("ema", term)] = emas[("ema", term)]
+                up, down = emas[("rsi_up", term)], emas[("rsi_down", term)]
+                out[("rsi", term)] = np.where(down == 0, 100.0, 100 - 100 / (1 + up / down))
+                out[("rsi", term)][np.isnan(up) | np.isnan(down)] = np.nan
+
+        # MACD signal lines start where their MACD line does (second batch)
+        with metrics.span("mse_indicator_seconds", family="macd_signal"):
+            macd_terms = list(macd_windows)
+            lines = [emas[("macd_fast", t)] - emas[("macd_slow", t)] for t in macd_terms]
+            for term, line in zip(macd_terms, lines):
+                out[("macd", term)] = line
+            if macd_terms and n:
+                starts = [min(macd_windows[t][1] - 1, n - 1) for t in macd_terms]
+                signs = [macd_windows[t][2] for t in macd_terms]
+                filled = np.vstack([np.nan_to_num(line) for line in lines])
+                signals = ema_batch(filled, [2.0 / (s + 1) for s in signs], starts, signs)
+                for i, term in enumerate(macd_terms):
+                    if macd_windows[term][1] > n:
+                        signals[i, :] = np.nan
+                    out[("macd_signal", term)] = signals[i]
+    return out
+
+def final_values(series, close):
+    """Last-bar {(indicator, term): (value, signal)} from compute_indicators(),
+    with the same signal rules as technical_analysis.py (zlema = ema)."""
+    last_close = float(close[-1])
+    values = {}
+    for (name, term), data in series.items():
+        value = float(data[-1]) if len(data) else math.nan
+        if math.isnan(value):
+            continue
+        if name in OSCILLATOR_SIGNALS:
+            values[(name, term)] = (value, OSCILLATOR_SIGNALS[name](value))
+        elif name in ("sma", "ema", "wma", "boll"):
+            values[(name, term)] = (value, ma_signal(last_close, round(value, 2)))
+            if name == "ema":
+                values[("zlema", term)] = values[(name, term)]
+        elif name == "macd":
+            sig = float(series[("macd_signal", term)][-1])
+            if not math.isnan(sig):
+                values[(name, term)] = (value, macd_signal(value, sig))
+    return values
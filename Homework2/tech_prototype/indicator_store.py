@@ -0,0 +1,177 @@
+"""
+Precomputed indicator store.
+
+The ingest writer calls on_ingest() after it commits new stock_data rows. For
+every touched issuer the stored streaming state (streaming_indicators.py) is
+carried forward over the NEW bars only, and one row per
+(issuer, date, indicator, term) is written to the `indicators` table.
+/api/technical_analysis then reads the final bar with one indexed lookup
+instead of recomputing 30 indicators over the whole history.
+
+Run this file directly to (re)build the store for every issuer.
+"""
+import json
+import math
+import sqlite3
+import sys
+from pathlib import Path
+
+from streaming_indicators import IndicatorSet, Streaming, record_fields
+
+STOCK_DB_PATH = Path(__file__).parent / "stock_data.db"
+
+# Keep this many bars of indicator history per issuer (None = keep everything)
+HISTORY_BARS = 260
+
+CREATE_INDICATORS = '''
+    CREATE TABLE IF NOT EXISTS indicators (
+        publisher_code TEXT NOT NULL,
+        date TEXT NOT NULL,
+        indicator TEXT NOT NULL,
+        term TEXT NOT NULL,
+        value REAL,
+        signal TEXT,
+        PRIMARY KEY (publisher_code, date, indicator, term)
+    ) WITHOUT ROWID
+'''
+
+CREATE_INDICATOR_STATE = '''
+    CREATE TABLE IF NOT EXISTS indicator_state (
+        publisher_code TEXT PRIMARY KEY,
+        last_date TEXT,
+        state TEXT
+    )
+'''
+
+def ensure_tables(conn):
+    conn.execute(CREATE_INDICATORS)
+    conn.execute(CREATE_INDICATOR_STATE)
+
+def update_issuer(conn, publisher_code, since=None):
+    """Extend the store for one issuer with the bars after its stored state.
+
+    `since` is the oldest date the caller just (re)wrote; if that is not
+    after the stored state the issuer is rebuilt from its first bar.
+    Returns the number of new bars processed.
+    """
+    ensure_tables(conn)
+    found = conn.execute(
+        "SELECT last_date, state FROM indicator_state WHERE publisher_code = ?",
+        (publisher_code,)
+    ).fetchone()
+    engine = None
+    if found and (since is None or since > found[0]):
+        try:
+            engine = Streaming.load(json.loads(found[1]))
+        except (ValueError, KeyError, TypeError):
+            engine = None   # state from an older layout: rebuild
+    if engine is None:
+        conn.execute("DELETE FROM indicators WHERE publisher_code = ?", (publisher_code,))
+        found = None
+        engine = IndicatorSet()
+    last_date = found[0] if found else ""
+
+    bars = conn.execute('''
+        SELECT date, price, max, min
+        FROM stock_data
+        WHERE publisher_code = ? AND date > ? AND price IS NOT NULL
+        ORDER BY date ASC
+    ''', (publisher_code, last_date)).fetchall()
+    if not bars:
+        return 0
+
+    keep_from = max(0, len(bars) - HISTORY_BARS) if HISTORY_BARS else 0
+    rows = []
+    for i, (date, close, high, low) in enumerate(bars):
+        values = engine.update(close, high, low)
+        if i < keep_from:
+            continue
+        for (indicator, term), (value, signal) in values.items():
+            rows.append((publisher_code, date, indicator, term,
+                         None if math.isnan(value) else value, signal))
+
+    conn.executemany('''
+        INSERT OR REPLACE INTO indicators (publisher_code, date, indicator, term, value, signal)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', rows)
+    new_last = bars[-1][0]
+    conn.execute('''
+        INSERT OR REPLACE INTO indicator_state (publisher_code, last_date, state)
+        VALUES (?, ?, ?)
+    ''', (publisher_code, new_last, json.dumps(engine.dump())))
+
+    if HISTORY_BARS:
+        cutoff = conn.execute('''
+            SELECT date FROM stock_data
+            WHERE publisher_code = ? AND date <= ? AND price IS NOT NULL
+            ORDER BY date DESC LIMIT 1 OFFSET ?
+        ''', (publisher_code, new_last, HISTORY_BARS - 1)).fetchone()
+        if cutoff:
+            conn.execute(
+                "DELETE FROM indicators WHERE publisher_code = ? AND date < ?",
+                (publisher_code, cutoff[0])
+            )
+    return len(bars)
+
+def on_ingest(conn, touched):
+    """Ingest hook: `touched` maps publisher_code -> oldest date just written."""
+    with conn:
+        for publisher_code, since in touched.items():
+            update_issuer(conn, publisher_code, since)
+
+def load_final_row(conn, publisher_code, date):
+    """Indicator fields for the bar at `date`, shaped like the API's final record.
+
+    Returns None if the store has not reached that bar yet.
+    """
+    try:
+        found = conn.execute(
+            "SELECT last_date FROM indicator_state WHERE publisher_code = ?",
+            (publisher_code,)
+        ).fetchone()
+    except sqlite3.OperationalError:
+        return None  # store not built yet
+    if not found or found[0] != date:
+        return None
+
+    cursor = conn.execute('''
+        SELECT indicator, term, value, signal
+        FROM indicators
+        WHERE publisher_code = ? AND date = ?
+    ''', (publisher_code, date))
+    return record_fields({
+        (indicator, term): (value, signal)
+        for indicator, term, value, signal in cursor.fetchall()
+    })
+
+def load_final_rows(conn, last_dates):
+    """load_final_row for many issuers at once: {publisher_code: last bar date}
+    -> {publisher_code: fields} for the issuers the store has reached."""
+    try:
+        cursor = conn.execute('''
+            SELECT s.publisher_code, s.last_date, i.indicator, i.term, i.value, i.signal
+            FROM indicator_state s
+            JOIN indicators i ON i.publisher_code = s.publisher_code AND i.date = s.last_date
+        ''')
+    except sqlite3.OperationalError:
+        return {}  # store not built yet
+    values = {}
+    for code, date, indicator, term, value, signal in cursor:
+        if last_dates.get(code) == date:
+            values.setdefault(code, {})[(indicator, term)] = (value, signal)
+    return {code: record_fields(found) for code, found in values.items()}
+
+def rebuild_all(db_path=STOCK_DB_PATH):
+    conn = sqlite3.connect(db_path)
+    with conn:
+        ensure_tables(conn)
+        conn.execute("DELETE FROM indicators")
+        conn.execute("DELETE FROM indicator_state")
+        codes = [row[0] for row in conn.execute("SELECT DISTINCT publisher_code FROM stock_data")]
+        for code in codes:
+            bars = update_issuer(conn, code)
+            print(f"{code}: {bars} bars")
+    conn.close()
+
+if __name__ == "__main__":
+    rebuild_all(Path(sys.argv[1]) if len(sys.argv) > 1 else STOCK_DB_PATH)
@@ -0,0 +1,275 @@
+"""
+Cross-issuer analytics over every issuer in stock_data at once.
+
+MarketMatrix aligns the daily closes of all issuers on one calendar, the
+union of their trading days, as a dense (days x issuers) matrix with NaN
+where an issuer did not trade. For returns, an issuer's price is carried
+forward over the days it did not trade: its return is 0 on those days and
+the whole move lands on its next trade. Before its first trade it has no
+price at all.
+
+The matrix is built with one query and kept per process (each analysis
+worker has its own). Every call first compares the issuers' data versions
+(response_cache.data_version, bumped at ingest) with the ones the matrix
+was built from and reloads only the issuers that changed. New trading days
+are merged into the calendar by reindexing the matrix, so a market-wide
+query never reloads the histories of the other issuers.
+
+On top of it, vectorized over the issuers:
+  - correlation(): Pearson correlation matrices of daily returns over a
+    rolling window, at the last `periods` window ends `step` days apart
+  - relative_strength(): return over a window against the equal-weight
+    market return, ranked across the market
+  - movers(): top gainers and losers over the last N trading days
+"""
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+from db import reading
+
+STOCK_DB_PATH = Path(__file__).parent / "stock_data.db"
+
+# Rebuild from scratch after this many seconds even if no version changed
+# (catches rows written without the ingest hooks)
+MAX_AGE = 6 * 3600
+
+def _versions(conn):
+    try:
+        return dict(conn.execute("SELECT publisher_code, version FROM data_version"))
+    except sqlite3.OperationalError:
+        return {}   # no ingest has run since the table was introduced
+
+def _load(conn, publishers=None):
+    """{code: (days, closes)} from one query over stock_data (None = every issuer)."""
+    query = "SELECT publisher_code, date, price FROM stock_data WHERE price IS NOT NULL"
+    params = []
+    if publishers is not None:
+        query += f" AND publisher_code IN ({','.join('?' * len(publishers))})"
+        params = list(publishers)
+    rows = conn.execute(query + " ORDER BY publisher_code, date", params).fetchall()
+    if not rows:
+        return {}
+    codes, dates, close = zip(*rows)
+    days = np.array(dates, dtype="datetime64[D]")
+    close = np.array(close, dtype=float)
+    # issuers are contiguous: split at every change of publisher_code
+    starts = [0] + [i for i in range(1, len(codes)) if codes[i] != codes[i - 1]] + [len(codes)]
+    return {codes[a]: (days[a:b], close[a:b]) for a, b in zip(starts, starts[1:])}
+
+class Snapshot:
+    """Immutable view of the aligned market used by one computation."""
+    def __init__(self, days, codes, close):
+        self.days = days
+        self.codes = codes
+        self.close = close
+        self.traded = ~np.isnan(close)
+        # carry every price forward over the days without a trade
+        rows = np.where(self.traded, np.arange(len(days))[:, None], 0)
+        np.maximum.accumulate(rows, axis=0, out=rows)
+        self.prices = np.take_along_axis(close, rows, axis=0)
+
+    def columns(self, publishers=None):
+        """Column indexes of `publishers` (None = all); unknown codes raise ValueError."""
+        if publishers is None:
+            return list(range(len(self.codes)))
+        index = {code: i for i, code in enumerate(self.codes)}
+        unknown = [code for code in publishers if code not in index]
+        if unknown:
+            raise ValueError(f"No price data for {unknown}")
+        return [index[code] for code in publishers]
+
+    def returns(self):
+        """Daily returns (days - 1 x issuers); NaN before an issuer's first trade."""
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return self.prices[1:] / self.prices[:-1] - 1
+
+class MarketMatrix:
+    def __init__(self):
+        self.days = np.empty(0, dtype="datetime64[D]")
+        self.codes = []
+        self.close = np.empty((0, 0))
+        self.versions = None
+        self.built_at = 0.0
+        self.snapshot = None
+        self.lock = threading.Lock()
+
+    def refresh(self, conn):
+        """Bring the matrix up to date; returns the current Snapshot."""
+        with self.lock:
+            versions = _versions(conn)
+            if self.versions is None or time.time() - self.built_at > MAX_AGE:
+                self.days = np.empty(0, dtype="datetime64[D]")
+                self.codes, self.close = [], np.empty((0, 0))
+                self._merge(_load(conn))
+                self.built_at = time.time()
+            else:
+                changed = [code for code, version in versions.items()
+                           if self.versions.get(code, 0) != version]
+                if not changed and self.snapshot is not None:
+                    return self.snapshot
+                loaded = _load(conn, changed) if changed else {}
+                empty = (np.empty(0, dtype="datetime64[D]"), np.empty(0))
+                self._merge({code: loaded.get(code, empty) for code in changed})
+            self.versions = versions
+            self.snapshot = Snapshot(self.days, list(self.codes), self.close)
+            return self.snapshot
+
+    def _merge(self, histories):
+        """Write the full histories of some issuers into the matrix."""
+        if not histories:
+            return
+        days = np.unique(np.concatenate([self.days] + [d for d, _ in histories.values()]))
+        if len(days) != len(self.days):
+            # new trading days: move the existing rows to their new positions
+            close = np.full((len(days), len(self.codes)), np.nan)
+            close[np.searchsorted(days, self.days)] = self.close
+            self.days, self.close = days, close
+        else:
+            self.close = self.close.copy()     # snapshots keep the old array
+        new = sorted(code for code in histories if code not in self.codes)
+        if new:
+            self.close = np.hstack([self.close, np.full((len(self.days), len(new)), np.nan)])
+            self.codes = self.codes + new
+        index = {code: i for i, code in enumerate(self.codes)}
+        for code, (d, c) in histories.items():
+            column = index[code]
+            self.close[:, column] = np.nan
+            self.close[np.searchsorted(self.days, d), column] = c
+
+_matrix = MarketMatrix()
+
+def snapshot():
+    with reading(STOCK_DB_PATH) as conn:
+        return _matrix.refresh(conn)
+
+def _iso(day):
+    return str(np.datetime64(day, "D"))
+
+def _json_matrix(matrix, digits=4):
+    """2-D array -> nested lists, NaN -> None."""
+    return [[None if v != v else v for v in row] for row in np.round(matrix, digits).tolist()]
+
+def correlation(window=60, periods=1, step=5, publishers=None, min_coverage=0.8):
+    """
+    Correlation matrices of daily returns over `window` trading days, ending
+    at the last day and every `step` days before it (`periods` matrices,
+    oldest first). An issuer takes part in a window only if it was listed for
+    all of it and traded on at least `min_coverage` of its days; otherwise
+    its row and column are None. With publishers=None the issuers that never
+    qualify are left out.
+    """
+    market = snapshot()
+    columns = market.columns(publishers)
+    returns = market.returns()[:, columns]
+    traded = market.traded[1:, columns]
+    if len(returns) < window:
+        raise ValueError(f"Only {len(returns)} days of returns, fewer than window={window}")
+
+    ends = np.arange(len(returns) - 1, window - 2, -step)[:periods][::-1]
+    rows = ends[:, None] - np.arange(window)[::-1]      # (periods, window)
+    x = returns[rows]                                   # (periods, window, issuers)
+    eligible = (~np.isnan(x).any(axis=1)
+                & (traded[rows].mean(axis=1) >= min_coverage))
+    x = np.where(eligible[:, None, :], x, 0.0)
+    x = x - x.mean(axis=1, keepdims=True)
+    std = np.sqrt((x * x).mean(axis=1))
+    eligible &= std > 0
+    z = x / np.where(eligible, std, 1.0)[:, None, :]
+    matrices = np.einsum("kwi,kwj->kij", z, z) / window
+    matrices[~(eligible[:, :, None] & eligible[:, None, :])] = np.nan
+
+    keep = np.arange(len(columns)) if publishers is not None else np.flatnonzero(eligible.any(axis=0))
+    return {
+        "window": window,
+        "step": step,
+        "publishers": [market.codes[columns[i]] for i in keep],
+        "dates": [_iso(market.days[end + 1]) for end in ends],
+        "matrices": [_json_matrix(m[np.ix_(keep, keep)]) for m in matrices],
+    }
+
+def relative_strength(window=60, publishers=None, min_coverage=0.5, limit=None):
+    """
+    Every issuer's return over the last `window` trading days against the
+    equal-weight market (the mean return of the issuers that traded, day by
+    day, compounded), ranked from strongest to weakest. Issuers listed for
+    less than the window or trading on fewer than `min_coverage` of its days
+    are left out. Returns are in percent.
+    """
+    market = snapshot()
+    if len(market.days) <= window:
+        raise ValueError(f"Only {len(market.days)} trading days, need more than window={window}")
+    returns = market.returns()[-window:]
+    traded = market.traded[-window:]
+    with np.errstate(invalid="ignore"):
+        daily = np.where(traded, returns, np.nan)
+        counts = np.sum(~np.isnan(daily), axis=1)
+        market_daily = np.where(counts > 0, np.nansum(daily, axis=1) / np.maximum(counts, 1), 0.0)
+    market_return = float(np.prod(1 + market_daily) - 1)
+
+    columns = np.array(market.columns(publishers), dtype=int)
+    prices = market.prices
+    own = prices[-1, columns] / prices[-1 - window, columns] - 1
+    coverage = traded[:, columns].mean(axis=0)
+    valid = ~np.isnan(own) & (coverage >= min_coverage)
+    columns, own, coverage = columns[valid], own[valid], coverage[valid]
+    strength = (1 + own) / (1 + market_return) - 1
+
+    order = np.argsort(-strength, kind="stable")
+    n = len(order)
+    results = []
+    for rank, i in enumerate(order[:limit] if limit else order, start=1):
+        results.append({
+            "publisher": market.codes[columns[i]],
+            "return": round(float(own[i]) * 100, 2),
+            "relative_strength": round(float(strength[i]) * 100, 2),
+            "rank": rank,
+            "percentile": round(100.0 * (n - rank) / (n - 1), 1) if n > 1 else 100.0,
+            "coverage": round(float(coverage[i]), 2),
+        })
+    return {
+        "window": window,
+        "date": _iso(market.days[-1]),
+        "from": _iso(market.days[-1 - window]),
+        "market_return": round(market_return * 100, 2),
+        "ranked": n,
+        "results": results,
+    }
+
+def movers(days=1, limit=10, publishers=None):
+    """
+    Top `limit` gainers and losers by return over the last `days` trading
+    days (in percent), among the issuers that traded at least once in that
+    span and were listed before it.
+    """
+    market = snapshot()
+    if len(market.days) <= days:
+        raise ValueError(f"Only {len(market.days)} trading days, need more than days={days}")
+    columns = np.array(market.columns(publishers), dtype=int)
+    prices = market.prices[:, columns]
+    change = prices[-1] / prices[-1 - days] - 1
+    active = market.traded[-days:, columns].any(axis=0) & ~np.isnan(change)
+    last_trade = np.maximum.accumulate(
+        np.where(market.traded[:, columns], np.arange(len(market.days))[:, None], 0), axis=0
+    )[-1]
+
+    def entry(i):
+        return {
+            "publisher": market.codes[columns[i]],
+            "change": round(float(change[i]) * 100, 2),
+            "close": round(float(prices[-1, i]), 2),
+            "last_trade": _iso(market.days[last_trade[i]]),
+        }
+
+    candidates = np.flatnonzero(active)
+    ranked = candidates[np.argsort(-change[candidates], kind="stable")]
+    return {
+        "days": days,
+        "date": _iso(market.days[-1]),
+        "from": _iso(market.days[-1 - days]),
+        "gainers": [entry(i) for i in ranked[:limit] if change[i] > 0],
+        "losers": [entry(i) for i in ranked[::-1][:limit] if change[i] < 0],
+    }
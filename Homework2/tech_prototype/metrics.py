@@ -0,0 +1,256 @@
+"""
+Low-overhead instrumentation: latency histograms, counters and gauges,
+served by /api/metrics in the Prometheus text format.
+
+    with metrics.span("mse_analysis_seconds", stage="load"):
+        ...
+    metrics.count("mse_ingest_rows_total", len(rows))
+
+A series is the metric name plus its labels, e.g.
+mse_analysis_seconds{stage="load"}; histograms share the fixed BUCKETS.
+Everything is kept in one process-wide Registry. Other processes hand over
+what they recorded as a snapshot (a JSON-able dict):
+  - the analysis workers return take() with every result, and the app
+    merges it (analysis_pool.py)
+  - the ingest (filters) adds its take() to a JSON file next to
+    stock_data.db when an IngestPipeline closes (flush()), and /api/metrics
+    reads that file, so the ingest counters survive between runs
+
+METRICS=0 in the environment (or metrics.ENABLED = False) switches it off:
+span() then returns one shared no-op context manager and count() / observe()
+return right away, so the instrumented code pays one global lookup per call.
+"""
+import bisect
+import contextlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+ENABLED = os.environ.get("METRICS", "1") != "0"
+
+# Upper bounds in seconds (+Inf is implicit)
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+HELP = {
+    "mse_http_request_seconds": "Time to answer an API request, by route and status.",
+    "mse_analysis_seconds": "Stages of one technical analysis (load, prepare, records, indicators, summaries).",
+    "mse_indicator_seconds": "Indicator computation of the final row, by indicator family.",
+    "mse_indicator_store_total": "Final-row lookups in the precomputed indicator store, by result.",
+    "mse_serialize_seconds": "JSON / columnar encoding of a response body, by endpoint.",
+    "mse_response_cache_total": "Response cache lookups, by result (hit / miss).",
+    "mse_export_rows_total": "stock_data rows streamed by /api/stock_data/export.",
+    "mse_analysis_pool_tasks_total": "Analyses handed to the worker pool, by outcome.",
+    "mse_analysis_pool_pending": "Analyses queued or running in the worker pool.",
+    "mse_analysis_pool_queue_wait_seconds_max": "Longest wait of an analysis for a worker.",
+    "mse_fetch_seconds": "One HTTP request to the MSE site, by status.",
+    "mse_fetch_retries_total": "MSE requests retried after a 5xx or a timeout.",
+    "mse_fetch_failures_total": "MSE requests that failed after every retry.",
+    "mse_page_parse_seconds": "Parsing one resultsTable page into typed rows (euro numbers included).",
+    "mse_ingest_write_seconds": "One ingest write transaction.",
+    "mse_ingest_hook_seconds": "One post-commit ingest hook, by hook.",
+    "mse_ingest_rows_total": "stock_data rows written by the ingest.",
+}
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def series(name, labels=None):
+    """'name{a="x",b="y"}' (labels sorted), or just the name."""
+    if not labels:
+        return name
+    pairs = ",".join(
+        f'{key}="{_escape(value)}"' for key, value in sorted(labels.items())
+    )
+    return f"{name}{{{pairs}}}"
+
+def _split(key):
+    """'name{labels}' -> ('name', 'labels')."""
+    name, _, labels = key.partition("{")
+    return name, labels[:-1]
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}    # series -> [count per bucket..., +Inf count, sum]
+
+    def count(self, key, amount=1):
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def set(self, key, value):
+        with self.lock:
+            self.gauges[key] = value
+
+    def observe(self, key, seconds):
+        index = bisect.bisect_left(BUCKETS, seconds)
+        with self.lock:
+            values = self.histograms.get(key)
+            if values is None:
+                values = self.histograms[key] = [0] * (len(BUCKETS) + 1) + [0.0]
+            values[index] += 1
+            values[-1] += seconds
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "counters": dict(self.counters),
+                "gauges": dict(self.gauges),
+                "histograms": {key: list(values) for key, values in self.histograms.items()},
+            }
+
+    def take(self):
+        """snapshot() and start over (what another process hands over)."""
+        with self.lock:
+            taken = {"counters": self.counters, "gauges": self.gauges, "histograms": self.histograms}
+            self.counters, self.gauges, self.histograms = {}, {}, {}
+        return taken
+
+    def merge(self, snapshot):
+        """Add a snapshot: counters and histograms add up, gauges are replaced."""
+        if not snapshot:
+            return
+        with self.lock:
+            for key, amount in snapshot.get("counters", {}).items():
+                self.counters[key] = self.counters.get(key, 0) + amount
+            self.gauges.update(snapshot.get("gauges", {}))
+            for key, values in snapshot.get("histograms", {}).items():
+                mine = self.histograms.get(key)
+                if mine is None or len(mine) != len(values):
+                    self.histograms[key] = list(values)
+                else:
+                    self.histograms[key] = [a + b for a, b in zip(mine, values)]
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        snapshot = self.snapshot()
+        families = {}
+        for kind in ("counters", "gauges", "histograms"):
+            for key, value in snapshot[kind].items():
+                name, labels = _split(key)
+                families.setdefault(name, (kind, []))[1].append((labels, value))
+
+        lines = []
+        for name in sorted(families):
+            kind, entries = families[name]
+            if name in HELP:
+                lines.append(f"# HELP {name} {HELP[name]}")
+            lines.append(f"# TYPE {name} {kind[:-1] if kind != 'histograms' else 'histogram'}")
+            for labels, value in sorted(entries):
+                if kind != "histograms":
+                    lines.append(f"{name}{{{labels}}} {value}" if labels else f"{name} {value}")
+                    continue
+                prefix = labels + "," if labels else ""
+                cumulative = 0
+                for bound, n in zip(BUCKETS + ("+Inf",), value[:-1]):
+                    cumulative += n
+                    lines.append(f'{name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+                suffix = f"{{{labels}}}" if labels else ""
+                lines.append(f"{name}_sum{suffix} {value[-1]:.6f}")
+                lines.append(f"{name}_count{suffix} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+_registry = Registry()
+
+class _Span:
+    __slots__ = ("key", "start")
+
+    def __init__(self, key):
+        self.key = key
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.start
+        _registry.observe(self.key, seconds)
+        trace = getattr(_local, "trace", None)
+        if trace is not None:
+            trace.append((self.key, seconds))
+
+_NOOP = contextlib.nullcontext()
+_keys = {}
+_local = threading.local()
+
+def _key(name, labels):
+    # building the series string costs more than the measurement, so cache it
+    cache_key = (name, tuple(labels.items())) if labels else name
+    key = _keys.get(cache_key)
+    if key is None:
+        key = _keys[cache_key] = series(name, labels)
+    return key
+
+def span(name, **labels):
+    """Context manager adding its wall time to the histogram `name`."""
+    if not ENABLED:
+        return _NOOP
+    return _Span(_key(name, labels))
+
+def observe(name, seconds, **labels):
+    if ENABLED:
+        _registry.observe(_key(name, labels), seconds)
+
+def count(name, amount=1, **labels):
+    if ENABLED:
+        _registry.count(_key(name, labels), amount)
+
+def gauge(name, value, **labels):
+    if ENABLED:
+        _registry.set(_key(name, labels), value)
+
+def start_trace():
+    """Also list this thread's spans, as (series, seconds), until stop_trace()
+    (the per-request breakdown of profiling.py)."""
+    _local.trace = []
+
+def stop_trace():
+    trace = getattr(_local, "trace", None)
+    _local.trace = None
+    return trace or []
+
+def take():
+    return _registry.take() if ENABLED else None
+
+def merge(snapshot):
+    if ENABLED:
+        _registry.merge(snapshot)
+
+def ingest_file(db_path):
+    """Where the ingest keeps its metrics: $METRICS_INGEST_FILE or
+    <stock_data>.metrics.json next to the database."""
+    configured = os.environ.get("METRICS_INGEST_FILE")
+    return Path(configured) if configured else Path(db_path).with_suffix(".metrics.json")
+
+def load(path):
+    """Snapshot stored by flush(), or None."""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+def flush(path):
+    """Add what this process recorded since the last flush to the snapshot in `path`."""
+    if not ENABLED:
+        return
+    stored = Registry()
+    stored.merge(load(path))
+    stored.merge(_registry.take())
+    tmp = Path(f"{path}.tmp")
+    with open(tmp, "w") as f:
+        json.dump(stored.snapshot(), f)
+    os.replace(tmp, path)
+
+def render(*snapshots):
+    """This process's metrics plus other snapshots, in the Prometheus text format."""
+    combined = Registry()
+    combined.merge(_registry.snapshot())
+    for snapshot in snapshots:
+        combined.merge(snapshot)
+    return combined.render()
@@ -0,0 +1,225 @@
+"""
+Memory-mapped daily price arrays: a read-optimized copy of stock_data.
+
+Every issuer has a directory <stock_data>.arrays/<code>/ (or under
+$PRICE_ARRAYS_DIR) holding one fixed-width little-endian file per column:
+
+    date.<g>.i4      int32 days since 1970-01-01
+    close.<g>.f8     price
+    high.<g>.f8      max
+    low.<g>.f8       min
+    volume.<g>.f8    quantity
+
+and meta.json, {"rows": n, "generation": g}. /api/technical_analysis maps
+the first n values of each file with numpy.memmap, so the data is neither
+copied nor parsed per request. Every worker process maps the same files and
+shares the OS page cache.
+
+Writes (on_ingest is an ingest hook, like timeframes.on_ingest) never touch
+a file a reader may have mapped: every update writes the issuer as a new
+generation (the stored bars before the first changed one are copied from the
+current files, the rest is read from stock_data) and then replaces meta.json,
+which switches readers over atomically. The old generations are left where
+they are, as another process may still map them (and on Windows a mapped
+file cannot be deleted); prune() removes them later.
+
+Run this file directly to (re)build the arrays for every issuer, or with
+--prune to delete the generations that are no longer current.
+"""
+import json
+import logging
+import os
+import sqlite3
+import sys
+from pathlib import Path
+
+import numpy as np
+
+STOCK_DB_PATH = Path(__file__).parent / "stock_data.db"
+KEEP_GENERATIONS = 2    # current + previous, which a slow reader may still map
+
+log = logging.getLogger(__name__)
+
+# column -> file dtype, in the order of the stock_data query below
+COLUMNS = {
+    "date": np.dtype("<i4"),
+    "close": np.dtype("<f8"),
+    "high": np.dtype("<f8"),
+    "low": np.dtype("<f8"),
+    "volume": np.dtype("<f8"),
+}
+QUERY = '''
+    SELECT date, price, max, min, quantity
+    FROM stock_data
+    WHERE publisher_code = ? AND date >= ?
+    ORDER BY date ASC
+'''
+
+def arrays_dir(db_path):
+    """Directory of the arrays that belong to the stock_data database `db_path`."""
+    configured = os.environ.get("PRICE_ARRAYS_DIR")
+    return Path(configured) if configured else Path(db_path).with_suffix(".arrays")
+
+def db_file(conn):
+    """Path of the main database of `conn`."""
+    for _, name, path in conn.execute("PRAGMA database_list"):
+        if name == "main":
+            return path
+
+def to_days(iso):
+    return int(np.datetime64(iso, "D").astype(np.int64))
+
+def _column_file(directory, name, generation):
+    return directory / f"{name}.{generation}.{COLUMNS[name].str[1:]}"
+
+def _read_meta(directory):
+    try:
+        with open(directory / "meta.json") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+def _write_meta(directory, rows, generation):
+    tmp = directory / "meta.json.tmp"
+    with open(tmp, "w") as f:
+        json.dump({"rows": rows, "generation": generation}, f)
+    os.replace(tmp, directory / "meta.json")
+
+def _encode(rows):
+    """stock_data rows -> {column: array} (NULL prices and volumes become NaN)."""
+    if not rows:
+        return {name: np.empty(0, dtype) for name, dtype in COLUMNS.items()}
+    values = list(zip(*rows))
+    columns = {"date": np.array(values[0], dtype="datetime64[D]").astype(COLUMNS["date"])}
+    for name, column in zip(list(COLUMNS)[1:], values[1:]):
+        columns[name] = np.array(column, dtype=float).astype(COLUMNS[name], copy=False)
+    return columns
+
+def _map(directory, name, meta):
+    if meta["rows"] == 0:
+        return np.empty(0, COLUMNS[name])
+    return np.memmap(_column_file(directory, name, meta["generation"]),
+                     dtype=COLUMNS[name], mode="r", shape=(meta["rows"],))
+
+def _write_generation(directory, columns, generation):
+    """Write `columns` as `generation`, then switch meta.json over to it."""
+    directory.mkdir(parents=True, exist_ok=True)
+    for name, array in columns.items():
+        with open(_column_file(directory, name, generation), "wb") as f:
+            f.write(array.tobytes())
+    _write_meta(directory, len(columns["date"]), generation)
+    return len(columns["date"])
+
+def _rewrite(conn, directory, publisher_code, generation):
+    """Write the issuer's whole history as `generation`."""
+    rows = conn.execute(QUERY, (publisher_code, "")).fetchall()
+    return _write_generation(directory, _encode(rows), generation)
+
+def update_issuer(conn, root, publisher_code, since=None):
+    """Bring one issuer's arrays up to date with stock_data.
+
+    `since` is the oldest date the caller just (re)wrote (None = only bars
+    after the stored ones). Returns the number of bars written.
+    """
+    directory = Path(root) / publisher_code
+    meta = _read_meta(directory)
+    if meta is None:
+        return _rewrite(conn, directory, publisher_code, 1)
+
+    stored = {name: _map(directory, name, meta) for name in COLUMNS}
+    dates = stored["date"]
+    if since is None:
+        if not len(dates):
+            return _rewrite(conn, directory, publisher_code, meta["generation"] + 1)
+        start = int(dates[-1]) + 1
+    else:
+        start = to_days(since)
+    position = int(np.searchsorted(dates, start))
+    since = str(np.datetime64(start, "D"))
+    written = _encode(conn.execute(QUERY, (publisher_code, since)).fetchall())
+    if not len(written["date"]) and position == len(dates):
+        return 0
+    # the bars before `position` are unchanged: copy them from the current files
+    columns = {name: np.concatenate([stored[name][:position], written[name]]) for name in COLUMNS}
+    del stored, dates
+    _write_generation(directory, columns, meta["generation"] + 1)
+    return len(written["date"])
+
+def prune(root, keep=KEEP_GENERATIONS):
+    """Delete all but the newest `keep` generations of every issuer.
+
+    Run it when no reader is likely to map an old generation any more
+    (python price_arrays.py --prune); a file that is still mapped and
+    cannot be deleted (Windows) is left for the next prune. Returns the
+    number of files deleted.
+    """
+    root = Path(root)
+    deleted = 0
+    for directory in root.iterdir() if root.is_dir() else ():
+        meta = _read_meta(directory) if directory.is_dir() else None
+        if meta is None:
+            continue
+        oldest = meta["generation"] - keep + 1
+        for path in directory.iterdir():
+            generation = path.name.split(".")[1] if path.name.count(".") == 2 else ""
+            # kept, current, or being written and not switched to yet
+            if not generation.isdigit() or int(generation) >= oldest:
+                continue
+            try:
+                path.unlink()
+                deleted += 1
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                log.warning("Could not delete %s: %s", path, e)
+    return deleted
+
+def load(root, publisher_code):
+    """{column: read-only array} of one issuer, or None if nothing is stored."""
+    directory = Path(root) / publisher_code
+    for _ in range(3):
+        meta = _read_meta(directory)
+        if meta is None:
+            return None
+        try:
+            return {name: _map(directory, name, meta) for name in COLUMNS}
+        except (FileNotFoundError, ValueError):
+            continue    # a rewrite switched generations while we were mapping
+    return None
+
+def load_current(conn, publisher_code, root=None):
+    """load(), but None unless the arrays reach the last stock_data bar (so
+    a store that missed an ingest is never served)."""
+    arrays = load(root or arrays_dir(db_file(conn)), publisher_code)
+    if arrays is None or not len(arrays["date"]):
+        return None
+    latest = conn.execute(
+        "SELECT MAX(date) FROM stock_data WHERE publisher_code = ?", (publisher_code,)
+    ).fetchone()[0]
+    if latest is None or to_days(latest) != int(arrays["date"][-1]):
+        return None
+    return arrays
+
+def on_ingest(conn, touched):
+    """Ingest hook: `touched` maps publisher_code -> oldest date just written."""
+    root = arrays_dir(db_file(conn))
+    for publisher_code, since in touched.items():
+        update_issuer(conn, root, publisher_code, since)
+
+def rebuild_all(db_path=STOCK_DB_PATH):
+    conn = sqlite3.connect(db_path)
+    root = arrays_dir(db_path)
+    codes = [row[0] for row in conn.execute("SELECT DISTINCT publisher_code FROM stock_data")]
+    for code in codes:
+        meta = _read_meta(root / code)
+        bars = _rewrite(conn, root / code, code, meta["generation"] + 1 if meta else 1)
+        print(f"{code}: {bars} bars")
+    conn.close()
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if a != "--prune"]
+    db_path = Path(args[0]) if args else STOCK_DB_PATH
+    if "--prune" in sys.argv:
+        print(f"{prune(arrays_dir(db_path))} old array files deleted")
+    else:
+        rebuild_all(db_path)
@@ -0,0 +1,255 @@
+"""
+Price history queries behind /api/stock_data.
+
+Rows are selected by (publisher_code, date) range, which is the primary key
+of the WITHOUT ROWID stock_data table, so a window of an issuer's history is
+one index range scan no matter how long the full history is.
+
+On top of the range:
+  - keyset pagination: `limit` rows after `cursor` (the last ISO date of the
+    previous page); the response's next_cursor continues from there
+  - `fields`: only the requested record fields are returned
+  - `points` + `downsample`: reduce the selected rows to about N points, with
+    LTTB (keeps the shape of the price line) or OHLC bucketing (keeps each
+    bucket's last price, max/min extremes and volume/turnover sums); at
+    least MIN_POINTS, the first and last row plus one in between
+
+The export (export_rows / export_chunks) is separate: it walks one issuer,
+several or the whole table in primary key order with fetchmany(), so only
+one batch of rows is in memory however much is exported.
+"""
+import json
+from datetime import datetime
+
+MIN_POINTS = 3      # smallest `points` LTTB can sample to
+
+# API field -> stock_data column, in the order of the query
+FIELDS = {
+    "date": "date",
+    "price": "price",
+    "volume": "quantity",
+    "max": "max",
+    "min": "min",
+    "avg": "avg",
+    "percent_change": "percent_change",
+    "total_turnover": "total_turnover",
+}
+COLUMNS = list(FIELDS)
+
+DOWNSAMPLERS = ("lttb", "ohlc")
+
+EXPORT_BATCH = 1000     # rows fetched, encoded and sent at a time by the export
+
+def parse_date(value):
+    """'YYYY-MM-DD' or 'DD.MM.YYYY' -> ISO 'YYYY-MM-DD'. Raises ValueError."""
+    value = value.strip()
+    for fmt in ("%Y-%m-%d", "%d.%m.%Y"):
+        try:
+            return datetime.strptime(value, fmt).strftime("%Y-%m-%d")
+        except ValueError:
+            pass
+    raise ValueError(f"Invalid date {value!r} (use YYYY-MM-DD or DD.MM.YYYY)")
+
+def parse_fields(value):
+    """'price,volume' -> ['date', 'price', 'volume'] (date is always returned)."""
+    if not value:
+        return COLUMNS
+    fields = [f.strip() for f in value.split(",") if f.strip()]
+    unknown = [f for f in fields if f not in FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields {unknown} (choose from {COLUMNS})")
+    return ["date"] + [f for f in COLUMNS if f in fields and f != "date"]
+
+def query_rows(conn, publisher, date_from=None, date_to=None, cursor=None, limit=None):
+    """stock_data rows (all FIELDS columns, ISO date) in date order."""
+    sql = f"SELECT {', '.join(FIELDS.values())} FROM stock_data WHERE publisher_code = ?"
+    params = [publisher]
+    if date_from:
+        sql += " AND date >= ?"
+        params.append(date_from)
+    if date_to:
+        sql += " AND date <= ?"
+        params.append(date_to)
+    if cursor:
+        sql += " AND date > ?"
+        params.append(cursor)
+    sql += " ORDER BY date ASC"
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(limit)
+    return conn.execute(sql, params).fetchall()
+
+def lttb(rows, threshold, y=1):
+    """Largest-Triangle-Three-Buckets over rows[i][y] (x = row position).
+
+    Keeps the first and last row and, from every bucket in between, the row
+    that forms the largest triangle with its neighbours. Rows without a value
+    are skipped.
+    """
+    rows = [row for row in rows if row[y] is not None]
+    if threshold >= len(rows) or threshold < MIN_POINTS:
+        return rows
+    sampled = [rows[0]]
+    every = (len(rows) - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        # average point of the next bucket
+        next_start, next_end = end, min(int((i + 2) * every) + 1, len(rows))
+        avg_x = (next_start + next_end - 1) / 2
+        avg_y = sum(rows[j][y] for j in range(next_start, next_end)) / (next_end - next_start)
+
+        ax, ay = a, rows[a][y]
+        best, best_area = start, -1.0
+        for j in range(start, end):
+            area = abs((ax - avg_x) * (rows[j][y] - ay) - (ax - j) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+        sampled.append(rows[best])
+        a = best
+    sampled.append(rows[-1])
+    return sampled
+
+def ohlc_buckets(rows, buckets):
+    """Merge consecutive rows into about `buckets` rows.
+
+    Each bucket is dated by its first day and keeps the last price, the
+    max of max / min of min, the sums of volume and turnover, the mean avg and
+    the price change over the bucket.
+    """
+    if buckets >= len(rows) or buckets < 1:
+        return rows
+    size = len(rows) / buckets
+    merged = []
+    prev_close = None
+    for i in range(buckets):
+        part = rows[int(i * size):int((i + 1) * size)]
+        if not part:
+            continue
+        prices = [r[1] for r in part if r[1] is not None]
+        highs = [r[3] for r in part if r[3] is not None]
+        lows = [r[4] for r in part if r[4] is not None]
+        avgs = [r[5] for r in part if r[5] is not None]
+        close = prices[-1] if prices else None
+        if prev_close is not None and close is not None:
+            # no percentage change from a zero price
+            change = round((close / prev_close - 1) * 100, 2) if prev_close else None
+        else:
+            change = part[0][6]
+        merged.append((
+            part[0][0],
+            close,
+            sum(r[2] or 0 for r in part),
+            max(highs) if highs else None,
+            min(lows) if lows else None,
+            sum(avgs) / len(avgs) if avgs else None,
+            change,
+            sum(r[7] or 0 for r in part),
+        ))
+        if close is not None:
+            prev_close = close
+    return merged
+
+def display_date(iso):
+    """'YYYY-MM-DD' -> 'DD.MM.YYYY' (what the frontend parses)."""
+    return f"{iso[8:10]}.{iso[5:7]}.{iso[0:4]}"
+
+def to_records(rows, fields=COLUMNS):
+    """Rows -> record dicts with the requested fields."""
+    index = [COLUMNS.index(f) for f in fields]
+    records = []
+    for row in rows:
+        record = {f: row[i] for f, i in zip(fields, index)}
+        record["date"] = display_date(record["date"])
+        records.append(record)
+    return records
+
+def to_columns(rows, fields=COLUMNS, display_dates=True):
+    """Rows -> {field: [values]} (parallel arrays), transposed in one zip()."""
+    transposed = list(zip(*rows)) if rows else [()] * len(COLUMNS)
+    columns = {f: list(transposed[COLUMNS.index(f)]) for f in fields}
+    if display_dates:
+        columns["date"] = [display_date(d) for d in columns["date"]]
+    return columns
+
+def select_rows(conn, publisher, date_from=None, date_to=None, cursor=None,
+                limit=None, points=None, downsample="lttb"):
+    """(meta, rows) of one request. Pagination applies to the stored rows,
+    downsampling to the page that was selected."""
+    rows = query_rows(conn, publisher, date_from, date_to, cursor,
+                      None if limit is None else limit + 1)
+    meta = {"publisher": publisher}
+    if limit is not None:
+        more = len(rows) > limit
+        rows = rows[:limit]
+        meta["next_cursor"] = rows[-1][0] if more and rows else None
+    if points:
+        rows = lttb(rows, points) if downsample == "lttb" else ohlc_buckets(rows, points)
+    return meta, rows
+
+def load_history(conn, publisher, fields=COLUMNS, **params):
+    """The /api/stock_data payload as rows of records."""
+    result, rows = select_rows(conn, publisher, **params)
+    result["records"] = to_records(rows, fields)
+    return result
+
+def load_history_columns(conn, publisher, fields=COLUMNS, display_dates=True, **params):
+    """(meta, {field: [values]}) for the columnar encodings (wire_format.py)."""
+    meta, rows = select_rows(conn, publisher, **params)
+    return meta, to_columns(rows, fields, display_dates)
+
+def export_rows(conn, publishers=None, date_from=None, date_to=None, batch=EXPORT_BATCH):
+    """Lists of up to `batch` (publisher_code, *FIELDS columns) rows, by issuer
+    and date; publishers=None exports every issuer.
+
+    The ORDER BY is the primary key order, so SQLite reads the rows straight
+    off the table without sorting them, and the cursor hands them over
+    fetchmany() batch by fetchmany() batch.
+    """
+    sql = f"SELECT publisher_code, {', '.join(FIELDS.values())} FROM stock_data"
+    where, params = [], []
+    if publishers:
+        where.append(f"publisher_code IN ({', '.join('?' * len(publishers))})")
+        params.extend(publishers)
+    if date_from:
+        where.append("date >= ?")
+        params.append(date_from)
+    if date_to:
+        where.append("date <= ?")
+        params.append(date_to)
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    cursor = conn.execute(sql + " ORDER BY publisher_code, date", params)
+    try:
+        while True:
+            rows = cursor.fetchmany(batch)
+            if not rows:
+                return
+            yield rows
+    finally:
+        cursor.close()
+
+def export_chunks(batches, fields=COLUMNS, array=False):
+    """Bytes of export_rows() batches, one chunk per batch: NDJSON (one
+    {"publisher", "date" (ISO), ...fields} object per line) or, with array,
+    the same objects as one JSON array."""
+    names = ["publisher"] + fields
+    index = [0] + [COLUMNS.index(f) + 1 for f in fields]
+    dumps = json.JSONEncoder(separators=(",", ":")).encode
+    separator = b"," if array else b"\n"
+    started = False
+    if array:
+        yield b"["
+    for rows in batches:
+        chunk = separator.join(
+            dumps({name: row[i] for name, i in zip(names, index)}).encode() for row in rows
+        )
+        if array and started:
+            chunk = b"," + chunk
+        elif not array:
+            chunk += b"\n"
+        started = True
+        yield chunk
+    if array:
+        yield b"]\n"
@@ -0,0 +1,173 @@
+"""
+On-demand profiling of single API requests, and a log of the slowest ones.
+
+Profiling a request is opt-in and off unless PROFILE_TOKEN is set in the
+environment. A request sending that token (header X-Profile-Token or
+?profile=<token>) then runs under StackProfiler, a deterministic profiler
+that records the full call stack of every Python and C function call, in
+the app thread and, for analyses, in the worker process too. The response
+is the usual one (the response cache is bypassed) plus an X-Profile-Id
+header; GET /api/debug/profiles/<id> returns the profile as folded stacks:
+
+    app;get_technical_analysis;cached_response;jsonify;... 1520
+    worker;compute_all_indicators_and_aggregate;history_records;... 830
+
+one line per stack with its self time in microseconds, the input format of
+flamegraph.pl, speedscope and most flame graph viewers. Tracing every call
+makes the profiled request several times slower than usual; the stacks show
+where the time goes relative to each other (pandas parsing vs indicators vs
+JSON encoding), not the unprofiled wall time.
+
+Independently, SlowLog keeps the SLOW_REQUESTS slowest requests with their
+publisher / tf and the per-stage times of metrics.py's spans (cache,
+analysis stages, indicator families, serialization, queue wait), served by
+/api/debug/slow_requests (also behind the token).
+"""
+import heapq
+import hmac
+import itertools
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+
+import metrics
+
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN")     # unset: no profiling
+PROFILE_DIR = Path(os.environ.get("PROFILE_DIR", Path(tempfile.gettempdir()) / "mse_profiles"))
+MAX_PROFILES = 50                                   # oldest files are deleted
+SLOW_REQUESTS = int(os.environ.get("SLOW_REQUESTS", 20))
+
+def authorized(headers, args):
+    """True if profiling is configured and the request carries the token."""
+    if not PROFILE_TOKEN:
+        return False
+    sent = headers.get("X-Profile-Token") or args.get("profile") or ""
+    return hmac.compare_digest(sent.encode(), PROFILE_TOKEN.encode())
+
+def _frame_name(code):
+    return f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})"
+
+def _c_name(function):
+    module = getattr(function, "__module__", None) or type(getattr(function, "__self__", None)).__name__
+    return f"{module}.{getattr(function, '__qualname__', function.__name__)}"
+
+class StackProfiler:
+    """Deterministic profiler of the current thread with full stacks.
+
+    Every call is pushed with its stack path; on return its self time (its
+    time minus its callees') is added to that path. Frames that were already
+    running when start() was called are not part of any stack.
+    """
+    def __init__(self, root):
+        self.root = (root,)
+        self.stacks = {}        # path tuple -> self seconds
+        self.frames = []        # [path, started, seconds in callees]
+        self.names = {}         # code object -> display name
+
+    def _event(self, frame, event, arg):
+        now = time.perf_counter()
+        if event == "call" or event == "c_call":
+            if event == "call":
+                name = self.names.get(frame.f_code)
+                if name is None:
+                    name = self.names[frame.f_code] = _frame_name(frame.f_code)
+            else:
+                name = _c_name(arg)     # bound methods are new objects every call
+            parent = self.frames[-1][0] if self.frames else self.root
+            self.frames.append([parent + (name,), now, 0.0])
+        elif self.frames:       # return, c_return, c_exception
+            path, started, callees = self.frames.pop()
+            elapsed = now - started
+            self.stacks[path] = self.stacks.get(path, 0.0) + elapsed - callees
+            if self.frames:
+                self.frames[-1][2] += elapsed
+
+    def start(self):
+        sys.setprofile(self._event)
+        return self
+
+    def stop(self):
+        sys.setprofile(None)
+        # calls still open (the caller of stop() and up) end here
+        now = time.perf_counter()
+        while self.frames:
+            path, started, callees = self.frames.pop()
+            self.stacks[path] = self.stacks.get(path, 0.0) + now - started - callees
+            if self.frames:
+                self.frames[-1][2] += now - started
+        return self.folded()
+
+    def folded(self):
+        """{'a;b;c': microseconds of self time}."""
+        return {";".join(path): round(seconds * 1e6) for path, seconds in self.stacks.items()
+                if seconds > 0}
+
+def traced(function, args, kwargs, profile=False):
+    """function(*args, **kwargs) -> (result, {"stages", "profile"}): the
+    metrics spans it went through and, with profile, its folded stacks."""
+    profiler = StackProfiler("worker").start() if profile else None
+    metrics.start_trace()
+    try:
+        result = function(*args, **kwargs)
+    finally:
+        stages = metrics.stop_trace()
+        folded = profiler.stop() if profiler else None
+    return result, {"stages": stages, "profile": folded}
+
+_LABELS = re.compile(r'="([^"]*)"')
+
+def breakdown(stages):
+    """[(series, seconds), ...] -> {"analysis.load": seconds, ...}, summed per span."""
+    totals = {}
+    for key, seconds in stages:
+        name, _, labels = key.partition("{")
+        name = name.removeprefix("mse_").removesuffix("_seconds")
+        stage = ".".join([name] + _LABELS.findall(labels))
+        totals[stage] = totals.get(stage, 0.0) + seconds
+    return {stage: round(seconds, 6) for stage, seconds in totals.items()}
+
+def save_profile(folded):
+    """Store folded stacks under a new id; returns the id."""
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    profile_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    lines = sorted(f"{stack} {us}" for stack, us in folded.items())
+    (PROFILE_DIR / f"{profile_id}.folded").write_text("\n".join(lines) + "\n")
+    old = sorted(PROFILE_DIR.glob("*.folded"))[:-MAX_PROFILES]
+    for path in old:
+        path.unlink(missing_ok=True)
+    return profile_id
+
+def load_profile(profile_id):
+    """Folded stacks text of a stored profile, or None."""
+    if not re.fullmatch(r"[\w-]+", profile_id):
+        return None
+    try:
+        return (PROFILE_DIR / f"{profile_id}.folded").read_text()
+    except FileNotFoundError:
+        return None
+
+class SlowLog:
+    """The `size` slowest requests seen, slowest first."""
+    def __init__(self, size=SLOW_REQUESTS):
+        self.size = size
+        self.heap = []          # min-heap of (seconds, seq, entry)
+        self.seq = itertools.count()
+        self.lock = threading.Lock()
+
+    def add(self, seconds, entry):
+        if self.size <= 0:
+            return
+        with self.lock:
+            if len(self.heap) < self.size:
+                heapq.heappush(self.heap, (seconds, next(self.seq), entry))
+            elif seconds > self.heap[0][0]:
+                heapq.heapreplace(self.heap, (seconds, next(self.seq), entry))
+
+    def entries(self):
+        with self.lock:
+            return [entry for _, _, entry in sorted(self.heap, key=lambda item: -item[0])]
@@ -0,0 +1,198 @@
+"""
+Response cache for the read endpoints of app.py.
+
+Responses are cached as the serialized JSON bytes, keyed by
+(endpoint, publisher, tf) and tagged with the issuer's data version. The
+version lives in stock_data.db (`data_version` table) and is bumped by the
+ingest writer after it commits new rows for an issuer (on_ingest is an ingest
+hook, like indicator_store.on_ingest). A request first reads the version, which
+is one indexed lookup; a cached entry with an older version is a miss. This
+works even though the filters run in another process than the app.
+
+The in-process cache is an LRU bounded by entry count, total bytes and a TTL.
+With RESPONSE_CACHE_DB set (a path), entries are also kept in a small SQLite
+file, so several app workers on one machine share what any of them computed.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+MAX_ENTRIES = 512
+MAX_BYTES = 64 * 1024 * 1024     # 64 MB of response bodies
+TTL = 6 * 3600                   # seconds; the data changes about once a day
+
+# Optional shared store for multi-worker deployments (path to a SQLite file)
+SHARED_CACHE_DB = os.environ.get("RESPONSE_CACHE_DB")
+
+CREATE_DATA_VERSION = '''
+    CREATE TABLE IF NOT EXISTS data_version (
+        publisher_code TEXT PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 0
+    )
+'''
+
+CREATE_RESPONSES = '''
+    CREATE TABLE IF NOT EXISTS responses (
+        key TEXT PRIMARY KEY,
+        publisher_code TEXT NOT NULL,
+        version INTEGER NOT NULL,
+        etag TEXT NOT NULL,
+        body BLOB NOT NULL,
+        expires REAL NOT NULL
+    )
+'''
+
+def on_ingest(conn, touched):
+    """Ingest hook: bump the data version of every issuer that got new rows."""
+    with conn:
+        conn.execute(CREATE_DATA_VERSION)
+        conn.executemany('''
+            INSERT INTO data_version (publisher_code, version) VALUES (?, 1)
+            ON CONFLICT(publisher_code) DO UPDATE SET version = version + 1
+        ''', [(code,) for code in touched])
+
+def data_version(conn, publisher_code):
+    """Current data version of an issuer (0 before its first ingest)."""
+    try:
+        found = conn.execute(
+            "SELECT version FROM data_version WHERE publisher_code = ?", (publisher_code,)
+        ).fetchone()
+    except sqlite3.OperationalError:
+        return 0   # no ingest has run since the table was introduced
+    return found[0] if found else 0
+
+def make_etag(body):
+    """Strong ETag value (unquoted, as werkzeug's set_etag expects it)."""
+    return hashlib.blake2b(body, digest_size=12).hexdigest()
+
+class SharedStore:
+    """Response bodies in a local SQLite file, shared by the app's workers."""
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=1.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            conn.execute(CREATE_RESPONSES)
+            self.local.conn = conn
+        return conn
+
+    def get(self, key, version):
+        try:
+            found = self._conn().execute(
+                "SELECT etag, body, expires FROM responses WHERE key = ? AND version = ?",
+                (key, version)
+            ).fetchone()
+        except sqlite3.Error:
+            return None   # the shared store is only an optimisation
+        if found is None or found[2] < time.time():
+            return None
+        return found[0], bytes(found[1]), found[2]
+
+    def put(self, key, publisher_code, version, etag, body, expires):
+        try:
+            with self._conn() as conn:
+                conn.execute('''
+                    INSERT OR REPLACE INTO responses (key, publisher_code, version, etag, body, expires)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (key, publisher_code, version, etag, body, expires))
+        except sqlite3.Error:
+            pass
+
+    def invalidate(self, publisher_code):
+        try:
+            with self._conn() as conn:
+                conn.execute("DELETE FROM responses WHERE publisher_code = ?", (publisher_code,))
+        except sqlite3.Error:
+            pass
+
+class ResponseCache:
+    """Thread-safe LRU of (version, etag, body, expires) entries.
+
+    Keys are tuples whose second item is the publisher code, so all entries of
+    one issuer can be dropped with invalidate(publisher_code).
+    """
+    def __init__(self, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES, ttl=TTL,
+                 shared_db=SHARED_CACHE_DB):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.shared = SharedStore(shared_db) if shared_db else None
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key_text(key):
+        return "|".join(str(part) for part in key)
+
+    def get(self, key, version):
+        """(etag, body) of a fresh entry for this data version, or None."""
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                if entry[0] == version and entry[3] > now:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1], entry[2]
+                self._drop(key)
+        if self.shared is not None:
+            found = self.shared.get(self._key_text(key), version)
+            if found is not None:
+                etag, body, expires = found
+                self._store(key, (version, etag, body, expires))
+                with self.lock:
+                    self.hits += 1
+                return etag, body
+        with self.lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, version, body):
+        """Cache `body` (bytes) for this data version. Returns its ETag."""
+        etag = make_etag(body)
+        expires = time.time() + self.ttl
+        self._store(key, (version, etag, body, expires))
+        if self.shared is not None:
+            self.shared.put(self._key_text(key), key[1], version, etag, body, expires)
+        return etag
+
+    def invalidate(self, publisher_code):
+        """Drop every entry of one issuer (e.g. after an in-process ingest)."""
+        with self.lock:
+            for key in [k for k in self.entries if k[1] == publisher_code]:
+                self._drop(key)
+        if self.shared is not None:
+            self.shared.invalidate(publisher_code)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def _store(self, key, entry):
+        body = entry[2]
+        if len(body) > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                self._drop(key)
+            self.entries[key] = entry
+            self.size += len(body)
+            while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+                oldest = next(iter(self.entries))
+                self._drop(oldest)
+
+    def _drop(self, key):
+        entry = self.entries.pop(key)
+        self.size -= len(entry[2])
@@ -0,0 +1,67 @@
+"""
+Windows and Buy/Sell/Hold rules shared by technical_analysis.py and the
+precomputed indicator store, so both always agree on the signals.
+
+The *_votes functions apply the same rules to whole series at once (for
+backtest.py): +1 for Buy, -1 for Sell, 0 for Hold or a missing value.
+"""
+import numpy as np
+
+# short / medium / long window for every indicator family
+WINDOWS = {"short": 7, "medium": 14, "long": 30}
+
+# MACD (fast, slow, signal) per term
+MACD_WINDOWS = {"short": (6, 13, 5), "medium": (12, 26, 9), "long": (24, 52, 18)}
+
+OSCILLATORS = ["rsi", "stoch", "cci", "williamsr", "macd"]
+MOVING_AVERAGES = ["sma", "ema", "wma", "zlema", "boll"]
+
+# (Sell above, Buy below) of the oscillator rules
+THRESHOLDS = {"rsi": (70, 30), "stoch": (80, 20), "cci": (100, -100), "williamsr": (-20, -80)}
+
+def _zone_signal(value, sell, buy):
+    if value > sell: return "Sell"
+    elif value < buy: return "Buy"
+    else: return "Hold"
+
+def rsi_signal(value):
+    return _zone_signal(value, *THRESHOLDS["rsi"])
+
+def stoch_signal(value):
+    return _zone_signal(value, *THRESHOLDS["stoch"])
+
+def cci_signal(value):
+    return _zone_signal(value, *THRESHOLDS["cci"])
+
+def williams_signal(value):
+    return _zone_signal(value, *THRESHOLDS["williamsr"])
+
+def macd_signal(macd_val, macdsig_val):
+    if macd_val > macdsig_val: return "Buy"
+    elif macd_val < macdsig_val: return "Sell"
+    else: return "Hold"
+
+def ma_signal(close_val, ma_val):
+    """Close above the (rounded) moving average => Buy."""
+    if close_val > ma_val: return "Buy"
+    elif close_val < ma_val: return "Sell"
+    else: return "Hold"
+
+OSCILLATOR_SIGNALS = {
+    "rsi": rsi_signal,
+    "stoch": stoch_signal,
+    "cci": cci_signal,
+    "williamsr": williams_signal,
+}
+
+def oscillator_votes(name, values):
+    """OSCILLATOR_SIGNALS[name] over an array of indicator values."""
+    sell, buy = THRESHOLDS[name]
+    values = np.asarray(values, dtype=float)
+    return np.where(values > sell, -1, np.where(values < buy, 1, 0)).astype(np.int8)
+
+def cross_votes(values, reference):
+    """macd_signal / ma_signal over arrays: Buy where values > reference."""
+    values = np.asarray(values, dtype=float)
+    reference = np.asarray(reference, dtype=float)
+    return np.where(values > reference, 1, np.where(values < reference, -1, 0)).astype(np.int8)
@@ -0,0 +1,333 @@
+"""
+Streaming indicator engine: stateful objects that take one bar at a time.
+
+Every update is O(1) (ring buffers with running sums, monotonic deques for
+rolling max/min), except CCI whose mean absolute deviation is O(window).
+The definitions follow the `ta` classes used in technical_analysis.py,
+including their min_periods / NaN rules, so results agree with the ta path
+(see benchmarks/check_streaming_indicators.py).
+
+State can be dumped to plain JSON and loaded back, which is how the
+indicator store carries it from one ingest run to the next.
+"""
+import math
+from collections import deque
+
+from signals import (
+    WINDOWS, MACD_WINDOWS, OSCILLATORS, MOVING_AVERAGES, OSCILLATOR_SIGNALS,
+    macd_signal, ma_signal
+)
+
+NAN = float("nan")
+
+# Running sums are re-added from the ring buffer every this many windows,
+# so floating point drift never accumulates over a long history.
+RESUM_EVERY = 8
+
+def _div(a, b):
+    # pandas semantics: x/0 -> +-inf, 0/0 -> nan
+    if b == 0:
+        return NAN if a == 0 or math.isnan(a) else math.copysign(math.inf, a)
+    return a / b
+
+def _isnan(value):
+    return value is None or math.isnan(value)
+
+_REGISTRY = {}
+
+class Streaming:
+    """Base class: JSON dump/load of the object's attributes (deques and
+    nested streaming objects included)."""
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        _REGISTRY[cls.__name__] = cls
+
+    def dump(self):
+        return {"type": type(self).__name__,
+                "fields": {k: _dump(v) for k, v in vars(self).items()}}
+
+    @staticmethod
+    def load(data):
+        obj = _REGISTRY[data["type"]].__new__(_REGISTRY[data["type"]])
+        for k, v in data["fields"].items():
+            setattr(obj, k, _load(v))
+        return obj
+
+def _dump(value):
+    if isinstance(value, Streaming):
+        return value.dump()
+    if isinstance(value, deque):
+        return {"deque": [_dump(v) for v in value]}
+    if isinstance(value, dict):
+        return {"dict": {k: _dump(v) for k, v in value.items()}}
+    if isinstance(value, (list, tuple)):
+        return [_dump(v) for v in value]
+    return value
+
+def _load(value):
+    if isinstance(value, dict) and "type" in value:
+        return Streaming.load(value)
+    if isinstance(value, dict) and "deque" in value:
+        return deque(tuple(v) if isinstance(v, list) else v for v in value["deque"])
+    if isinstance(value, dict) and "dict" in value:
+        return {k: _load(v) for k, v in value["dict"].items()}
+    return value
+
+class RingSum(Streaming):
+    """Last `window` values with a running sum (and sum of squares)."""
+    def __init__(self, window):
+        self.window = window
+        self.values = deque()
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.nans = 0
+        self.steps = 0
+
+    def add(self, value):
+        self.values.append(value)
+        if _isnan(value):
+            self.nans += 1
+        else:
+            self.total += value
+            self.total_sq += value * value
+        if len(self.values) > self.window:
+            old = self.values.popleft()
+            if _isnan(old):
+                self.nans -= 1
+            else:
+                self.total -= old
+                self.total_sq -= old * old
+        self.steps += 1
+        if self.steps % (self.window * RESUM_EVERY) == 0:
+            clean = [v for v in self.values if not _isnan(v)]
+            self.total = math.fsum(clean)
+            self.total_sq = math.fsum(v * v for v in clean)
+
+    def full(self):
+        """Window complete and NaN-free (pandas min_periods=window)."""
+        return len(self.values) == self.window and self.nans == 0
+
+class RollingExtreme(Streaming):
+    """Rolling max (or min) over `window` values with a monotonic deque."""
+    def __init__(self, window, is_max=True):
+        self.window = window
+        self.is_max = is_max
+        self.index = -1
+        self.candidates = deque()   # (index, value), values monotonic
+        self.nan_at = deque()       # indices of NaNs still inside the window
+
+    def add(self, value):
+        self.index += 1
+        start = self.index - self.window + 1
+        if _isnan(value):
+            self.nan_at.append(self.index)
+        else:
+            while self.candidates and (
+                self.candidates[-1][1] <= value if self.is_max else self.candidates[-1][1] >= value
+            ):
+                self.candidates.pop()
+            self.candidates.append((self.index, value))
+        while self.candidates and self.candidates[0][0] < start:
+            self.candidates.popleft()
+        while self.nan_at and self.nan_at[0] < start:
+            self.nan_at.popleft()
+
+    def value(self):
+        if self.index + 1 < self.window or self.nan_at or not self.candidates:
+            return NAN
+        return self.candidates[0][1]
+
+class SMA(Streaming):
+    def __init__(self, window):
+        self.ring = RingSum(window)
+
+    def update(self, close):
+        self.ring.add(close)
+        return self.ring.total / self.ring.window if self.ring.full() else NAN
+
+class EMA(Streaming):
+    """ewm(span=window, adjust=False, min_periods=window), seeded with the first value."""
+    def __init__(self, window, alpha=None):
+        self.window = window
+        self.alpha = alpha if alpha is not None else 2.0 / (window + 1)
+        self.value = None
+        self.count = 0
+
+    def update(self, x):
+        self.value = x if self.value is None else self.value + self.alpha * (x - self.value)
+        self.count += 1
+        return self.value if self.count >= self.window else NAN
+
+class WMA(Streaming):
+    """Linearly weighted MA (weights 1..window, newest heaviest) in O(1):
+    numerator' = numerator - sum + window * x, once the window is full."""
+    def __init__(self, window):
+        self.ring = RingSum(window)
+        self.numerator = 0.0
+
+    def update(self, close):
+        window = self.ring.window
+        if len(self.ring.values) == window:
+            self.numerator += window * close - self.ring.total
+        else:
+            self.numerator += (len(self.ring.values) + 1) * close
+        self.ring.add(close)
+        if self.ring.steps % (window * RESUM_EVERY) == 0:
+            self.numerator = math.fsum(v * w for v, w in zip(self.ring.values, range(1, window + 1)))
+        if not self.ring.full():
+            return NAN
+        return self.numerator / (window * (window + 1) / 2)
+
+class RSI(Streaming):
+    """Wilder RSI as ta computes it (ewm alpha=1/window, first diff = 0)."""
+    def __init__(self, window):
+        self.up = EMA(window, alpha=1.0 / window)
+        self.down = EMA(window, alpha=1.0 / window)
+        self.prev_close = None
+
+    def update(self, close):
+        diff = 0.0 if self.prev_close is None else close - self.prev_close
+        self.prev_close = close
+        up = self.up.update(max(diff, 0.0))
+        down = self.down.update(max(-diff, 0.0))
+        if math.isnan(up) or math.isnan(down):
+            return NAN
+        return 100.0 if down == 0 else 100 - 100 / (1 + up / down)
+
+class Stochastic(Streaming):
+    """%K = 100 * (close - lowest low) / (highest high - lowest low)."""
+    def __init__(self, window):
+        self.highs = RollingExtreme(window, is_max=True)
+        self.lows = RollingExtreme(window, is_max=False)
+
+    def update(self, close, high, low):
+        self.highs.add(high)
+        self.lows.add(low)
+        hh, ll = self.highs.value(), self.lows.value()
+        if math.isnan(hh) or math.isnan(ll):
+            return NAN
+        return _div(100 * (close - ll), hh - ll)
+
+class WilliamsR(Stochastic):
+    """%R = -100 * (highest high - close) / (highest high - lowest low)."""
+    def update(self, close, high, low):
+        self.highs.add(high)
+        self.lows.add(low)
+        hh, ll = self.highs.value(), self.lows.value()
+        if math.isnan(hh) or math.isnan(ll):
+            return NAN
+        return _div(-100 * (hh - close), hh - ll)
+
+class CCI(Streaming):
+    """(tp - SMA(tp)) / (0.015 * mean absolute deviation). The deviation is
+    taken around the current mean, so this one is O(window) per bar."""
+    def __init__(self, window, constant=0.015):
+        self.ring = RingSum(window)
+        self.constant = constant
+
+    def update(self, close, high, low):
+        tp = NAN if _isnan(high) or _isnan(low) else (high + low + close) / 3.0
+        self.ring.add(tp)
+        if not self.ring.full():
+            return NAN
+        window = self.ring.window
+        mean = self.ring.total / window
+        mad = sum(abs(v - mean) for v in self.ring.values) / window
+        return _div(tp - mean, self.constant * mad)
+
+class MACD(Streaming):
+    """MACD line = EMA(fast) - EMA(slow); signal = EMA(sign) of the MACD line."""
+    def __init__(self, fast, slow, sign):
+        self.fast = EMA(fast)
+        self.slow = EMA(slow)
+        self.signal = EMA(sign)
+
+    def update(self, close):
+        fast = self.fast.update(close)
+        slow = self.slow.update(close)
+        if math.isnan(fast) or math.isnan(slow):
+            return NAN, NAN
+        macd = fast - slow
+        return macd, self.signal.update(macd)
+
+class Bollinger(Streaming):
+    """Middle band = SMA; upper/lower = SMA +- ndev * population std."""
+    def __init__(self, window, ndev=2):
+        self.ring = RingSum(window)
+        self.ndev = ndev
+
+    def update(self, close):
+        self.ring.add(close)
+        if not self.ring.full():
+            return NAN, NAN, NAN
+        window = self.ring.window
+        mid = self.ring.total / window
+        std = math.sqrt(max(0.0, self.ring.total_sq / window - mid * mid))
+        return mid, mid + self.ndev * std, mid - self.ndev * std
+
+class IndicatorSet(Streaming):
+    """All 30 indicators of the analysis page (10 families x short/medium/long).
+
+    update(close, high, low) returns {(indicator, term): (value, signal)} for
+    the values that are defined on this bar, with the same signal rules as
+    technical_analysis.py.
+    """
+    def __init__(self):
+        self.closes = {}
+        for term, window in WINDOWS.items():
+            self.closes[f"sma_{term}"] = SMA(window)
+            self.closes[f"ema_{term}"] = EMA(window)
+            self.closes[f"wma_{term}"] = WMA(window)
+            self.closes[f"rsi_{term}"] = RSI(window)
+            self.closes[f"boll_{term}"] = Bollinger(window)
+        self.ranges = {}
+        for term, window in WINDOWS.items():
+            self.ranges[f"stoch_{term}"] = Stochastic(window)
+            self.ranges[f"williamsr_{term}"] = WilliamsR(window)
+            self.ranges[f"cci_{term}"] = CCI(window)
+        self.macds = {term: MACD(*params) for term, params in MACD_WINDOWS.items()}
+
+    def update(self, close, high, low):
+        close = float(close)
+        high = NAN if high is None else float(high)
+        low = NAN if low is None else float(low)
+
+        raw = {}
+        for key, indicator in self.closes.items():
+            value = indicator.update(close)
+            if isinstance(indicator, Bollinger):
+                value = value[0]
+            raw[key] = value
+        for key, indicator in self.ranges.items():
+            raw[key] = indicator.update(close, high, low)
+
+        values = {}
+        for key, value in raw.items():
+            if math.isnan(value):
+                continue
+            name, term = key.rsplit("_", 1)
+            if name in OSCILLATOR_SIGNALS:
+                values[(name, term)] = (value, OSCILLATOR_SIGNALS[name](value))
+            else:
+                values[(name, term)] = (value, ma_signal(close, round(value, 2)))
+                if name == "ema":
+                    # ZLEMA is served as the EMA, like technical_analysis does
+                    values[("zlema", term)] = values[(name, term)]
+        for term, macd in self.macds.items():
+            macd_val, macdsig_val = macd.update(close)
+            if not (math.isnan(macd_val) or math.isnan(macdsig_val)):
+                values[("macd", term)] = (macd_val, macd_signal(macd_val, macdsig_val))
+        return values
+
+def record_fields(values):
+    """{(indicator, term): (value, signal)} -> the API's final-record fields
+    ("rsi_short", "rsi_short_sig", ...), rounded like technical_analysis.py."""
+    fields = {}
+    for indicator in OSCILLATORS + MOVING_AVERAGES:
+        for term in WINDOWS:
+            value, signal = values.get((indicator, term), (None, None))
+            if value is not None and math.isnan(value):
+                value = None
+            fields[f"{indicator}_{term}"] = (round(value, 2) if value is not None else None) or ""
+            fields[f"{indicator}_{term}_sig"] = signal or ""
+    return fields
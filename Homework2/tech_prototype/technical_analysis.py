@@ -1,5 +1,5 @@
-import sqlite3
 import pandas as pd
+import numpy as np
 import math
 from pathlib import Path
 
@@ -10,15 +10,28 @@ from ta.momentum import StochasticOscillator, RSIIndicator, WilliamsRIndicator
 from ta.trend import CCIIndicator, MACD, SMAIndicator, EMAIndicator
 from ta.volatility import BollingerBands
 
+from indicator_store import load_final_row, load_final_rows
+from streaming_indicators import IndicatorSet, record_fields
+from indicator_kernel import compute_indicators, final_values
+from timeframes import load_bars, parse_timeframe
+import metrics
+import price_arrays
+from db import reading
+from signals import (
+    WINDOWS, MACD_WINDOWS, rsi_signal, stoch_signal, cci_signal,
+    williams_signal, macd_signal, ma_signal
+)
+
 STOCK_DB_PATH = Path(__file__).parent / "stock_data.db"
 
-def parse_euro_number(val_str):
-    """Convert '2.140,00' -> '2140,00' -> '2140.00' -> float."""
-    if val_str in ("", "None", "nan"):
-        return None
-    step1 = val_str.replace(".", "")  # remove thousands
-    step2 = step1.replace(",", ".")
-    return step2
+# How the final-row indicators are computed when the precomputed store is behind:
+# "vector" runs indicator_kernel.py (all windows in one NumPy pass),
+# "streaming" runs streaming_indicators.py, "ta" uses the ta library (reference)
+INDICATOR_ENGINE = "vector"
+
+# Daily bars are read from the memory-mapped arrays of price_arrays.py when
+# they reach the last stock_data row (False = always query stock_data)
+PRICE_ARRAYS = True
 
 def compute_tv_style_signal(buy_count, sell_count):
     """If buys > sells => 'Buy', else 'Sell' or 'Neutral'."""
@@ -39,43 +52,29 @@ def compute_all_indicators_and_aggregate(publisher_code, tf="1D"):
     Then the aggregator counts them for maSummary + overallSummary.
     """
 
-    # 1) Query the DB
-    conn = sqlite3.connect(STOCK_DB_PATH)
-    query = """
-        SELECT date, price, quantity, max, min
-        FROM stock_data
-        WHERE publisher_code = ?
-        ORDER BY date ASC
-    """
-    df = pd.read_sql_query(query, conn, params=[publisher_code])
-    conn.close()
-
-    if df.empty:
-        return {
-            "publisher": publisher_code,
-            "records": [],
-            "msg": "No data found",
-            "oscSummary": {},
-            "maSummary": {},
-            "overallSummary": {}
-        }
-
-    # 2) rename columns
-    df.rename(columns={
-        "price": "close",
-        "quantity": "volume",
-        "max": "high",
-        "min": "low"
-    }, inplace=True)
-
-    df["date"] = pd.to_datetime(df["date"], format="%d.%m.%Y", errors="coerce")
-    df.sort_values("date", inplace=True, ignore_index=True)
-
-    for col in ["close","high","low","volume"]:
-        df[col] = df[col].astype(str).apply(parse_euro_number)
-        df[col] = pd.to_numeric(df[col], errors="coerce")
-
-    df.dropna(subset=["date","close"], inplace=True)
+    # 1) Load the bars: the mapped price arrays, else the stock_data rows
+    # (or the cached bars for other timeframes)
+    tf = (tf or "1D").strip().upper()
+    parse_timeframe(tf)
+    with metrics.span("mse_analysis_seconds", stage="load"):
+        df = load_array_frame(publisher_code) if tf == "1D" and PRICE_ARRAYS else None
+        prepared = df is not None
+        if not prepared:
+            df = load_frame(publisher_code, tf)
+    if not prepared:
+        if df.empty:
+            return {
+                "publisher": publisher_code,
+                "records": [],
+                "msg": "No data found",
+                "oscSummary": {},
+                "maSummary": {},
+                "overallSummary": {}
+            }
+
+        # 2) Type and clean the columns, then the date/close records
+        with metrics.span("mse_analysis_seconds", stage="prepare"):
+            df = prepare_frame(df)
     if df.empty:
         return {
             "publisher": publisher_code,
@@ -86,34 +85,31 @@ def compute_all_indicators_and_aggregate(publisher_code, tf="1D"):
             "overallSummary": {}
         }
 
-    # (Optional) if tf=="1W"/"1M", do a resample. We'll skip for clarity.
-
-    # We'll define short=7, medium=14, long=30 for everything
-    short_win = 7
-    medium_win= 14
-    long_win  = 30
-
-    records = []
-    for i, row in df.iterrows():
-        if pd.isna(row["date"]): continue
-        rec = {
-            "date": str(row["date"].date()),
-            "close": None if math.isnan(row["close"]) else round(row["close"],2),
-        }
-        records.append(rec)
-
-    if not records:
-        return {
-            "publisher": publisher_code,
-            "records": [],
-            "msg": "No valid data after cleaning.",
-            "oscSummary": {},
-            "maSummary": {},
-            "overallSummary": {}
-        }
-
-    # 3) We'll define "storeIndicatorsInFinalRow" at the end, which calculates short/medium/long for each indicator, then sets them in records[-1].
-    storeIndicatorsInFinalRow(df, records, short_win, medium_win, long_win)
+    # We'll define short=7, medium=14, long=30 for everything (see signals.py)
+    short_win = WINDOWS["short"]
+    medium_win= WINDOWS["medium"]
+    long_win  = WINDOWS["long"]
+
+    with metrics.span("mse_analysis_seconds", stage="records"):
+        records = history_records(df)
+
+    # 3) Indicators for the final row: read them from the precomputed store
+    # (indicator_store.py, kept up to date at ingest, daily bars only) when it
+    # has reached the last bar, otherwise compute them here.
+    with metrics.span("mse_analysis_seconds", stage="indicators"):
+        stored = None
+        if tf == "1D":
+            with reading(STOCK_DB_PATH) as conn:
+                stored = load_final_row(conn, publisher_code, records[-1]["date"])
+            metrics.count("mse_indicator_store_total", result="miss" if stored is None else "hit")
+        if stored is not None:
+            records[-1].update(stored)
+        elif INDICATOR_ENGINE == "vector":
+            storeIndicatorsInFinalRowVector(df, records)
+        elif INDICATOR_ENGINE == "streaming":
+            storeIndicatorsInFinalRowStreaming(df, records)
+        else:
+            storeIndicatorsInFinalRow(df, records, short_win, medium_win, long_win)
 
     # 4) Summaries
     # We want to incorporate 5 oscillators + 5 MAs into overallSummary.
@@ -135,6 +131,183 @@ def compute_all_indicators_and_aggregate(publisher_code, tf="1D"):
 
     last = records[final_idx]
 
+    with metrics.span("mse_analysis_seconds", stage="summaries"):
+        oscSummary, maSummary, overallSummary = summarize(last)
+
+    msg = f"Found {len(records)} rows (tf={tf})"
+    return {
+        "publisher": publisher_code,
+        "records": records,
+        "msg": msg,
+        "oscSummary": oscSummary,
+        "maSummary": maSummary,
+        "overallSummary": overallSummary
+    }
+
+def load_frame(publisher_code, tf="1D"):
+    """
+    The issuer's bars as a DataFrame (date, price, quantity, max, min) in date
+    order. Daily bars are the typed stock_data rows (ISO date, REAL prices,
+    INTEGER quantity); other timeframes read their bars (timeframes.py,
+    read-only), dated by the first day of each period.
+    """
+    if tf == "1D":
+        query = """
+            SELECT date, price, quantity, max, min
+            FROM stock_data
+            WHERE publisher_code = ?
+            ORDER BY date ASC
+        """
+        with reading(STOCK_DB_PATH) as conn:
+            return pd.read_sql_query(query, conn, params=[publisher_code])
+    with reading(STOCK_DB_PATH) as conn:
+        return pd.DataFrame(load_bars(conn, publisher_code, tf),
+                            columns=["date", "price", "quantity", "max", "min"])
+
+def load_array_frame(publisher_code):
+    """
+    Prepared frame (see prepare_frame) over the issuer's memory-mapped price
+    arrays, or None if they are missing or behind stock_data. The price
+    columns are views of the mapped files: nothing is copied or parsed unless
+    some bars have no close.
+    """
+    with reading(STOCK_DB_PATH) as conn:
+        arrays = price_arrays.load_current(conn, publisher_code,
+                                           price_arrays.arrays_dir(STOCK_DB_PATH))
+    if arrays is None:
+        return None
+    valid = ~np.isnan(arrays["close"])
+    if not valid.all():
+        arrays = {name: array[valid] for name, array in arrays.items()}
+    return pd.DataFrame({
+        "date": arrays["date"].astype("datetime64[D]"),
+        "close": arrays["close"],
+        "volume": arrays["volume"],
+        "high": arrays["high"],
+        "low": arrays["low"],
+    }, copy=False)
+
+def prepare_frame(df):
+    """
+    Rename to close/volume/high/low, type the columns and drop bars without a
+    date or close. Values were parsed once at ingest, so this is one
+    vectorized conversion per column (no per-cell Python calls), and ORDER BY
+    date already sorts by time.
+    """
+    df = df.rename(columns={
+        "price": "close",
+        "quantity": "volume",
+        "max": "high",
+        "min": "low"
+    })
+    df["date"] = pd.to_datetime(df["date"], format="%Y-%m-%d", errors="coerce")
+    for col in ["close","high","low","volume"]:
+        if df[col].dtype.kind not in "fi":
+            df[col] = pd.to_numeric(df[col], errors="coerce")
+    return df.dropna(subset=["date","close"])
+
+def history_records(df):
+    """
+    [{"date": "YYYY-MM-DD", "close": 123.45}, ...] of a prepared frame, built
+    from the column arrays: dates formatted and closes rounded in NumPy, then
+    zipped into the record dicts.
+    """
+    dates = df["date"].to_numpy(dtype="datetime64[D]").astype(str).tolist()
+    close = np.round(df["close"].to_numpy(dtype=float), 2).tolist()
+    return [{"date": d, "close": c} for d, c in zip(dates, close)]
+
+def load_histories(conn, publishers=None, tf="1D"):
+    """
+    {publisher: (dates, close, high, low)} for many issuers. Daily bars come
+    from ONE query over stock_data (ordered by its primary key); other
+    timeframes from timeframes.load_bars (read-only).
+    """
+    if tf != "1D":
+        if publishers is None:
+            publishers = [r[0] for r in conn.execute("SELECT DISTINCT publisher_code FROM stock_data")]
+        histories = {}
+        for code in publishers:
+            bars = [b for b in load_bars(conn, code, tf) if b[1] is not None]
+            if bars:
+                dates, close, _, high, low = zip(*bars)
+                histories[code] = (list(dates), np.array(close, dtype=float),
+                                   np.array(high, dtype=float), np.array(low, dtype=float))
+        return histories
+
+    query = """
+        SELECT publisher_code, date, price, max, min
+        FROM stock_data
+        WHERE price IS NOT NULL
+    """
+    params = []
+    if publishers is not None:
+        query += f" AND publisher_code IN ({','.join('?' * len(publishers))})"
+        params = list(publishers)
+    rows = conn.execute(query + " ORDER BY publisher_code, date", params).fetchall()
+    if not rows:
+        return {}
+    codes, dates, close, high, low = zip(*rows)
+    close = np.array(close, dtype=float)
+    high = np.array(high, dtype=float)
+    low = np.array(low, dtype=float)
+    # issuers are contiguous: split at every change of publisher_code
+    starts = [0] + [i for i in range(1, len(codes)) if codes[i] != codes[i - 1]] + [len(codes)]
+    return {
+        codes[a]: (dates[a:b], close[a:b], high[a:b], low[a:b])
+        for a, b in zip(starts, starts[1:])
+    }
+
+def score_history(dates, close, high, low, stored=None):
+    """Summaries of one issuer's history (stored = its precomputed final row, if any)."""
+    fields = stored
+    if fields is None:
+        fields = record_fields(final_values(compute_indicators(close, high, low), close))
+    oscSummary, maSummary, overallSummary = summarize(fields)
+    return {
+        "date": str(dates[-1]),
+        "close": round(float(close[-1]), 2),
+        "oscSummary": oscSummary,
+        "maSummary": maSummary,
+        "overallSummary": overallSummary
+    }
+
+def compute_batch_summaries(publishers="all", tf="1D"):
+    """
+    oscSummary / maSummary / overallSummary for many issuers in one call:
+    publishers is a list of codes or "all" (every issuer in stock_data).
+    The histories are loaded with one query and every issuer is scored with
+    the vectorized kernel, or read from the precomputed store when it is
+    current. Issuers without data are listed with an empty summary.
+    """
+    tf = (tf or "1D").strip().upper()
+    parse_timeframe(tf)
+    wanted = None if publishers == "all" else list(dict.fromkeys(publishers))
+
+    with reading(STOCK_DB_PATH) as conn:
+        histories = load_histories(conn, wanted, tf)
+        # the indicator store holds daily final rows only
+        stored = (load_final_rows(conn, {code: h[0][-1] for code, h in histories.items()})
+                  if tf == "1D" else {})
+
+    results = []
+    for code in (wanted if wanted is not None else sorted(histories)):
+        if code not in histories:
+            results.append({"publisher": code, "msg": "No data found",
+                            "oscSummary": {}, "maSummary": {}, "overallSummary": {}})
+            continue
+        scored = score_history(*histories[code], stored=stored.get(code))
+        results.append(dict({"publisher": code}, **scored))
+    return {
+        "tf": tf,
+        "msg": f"Scored {len(histories)} issuers (tf={tf})",
+        "results": results
+    }
+
+def summarize(last):
+    """
+    (oscSummary, maSummary, overallSummary) from the indicator fields of a
+    final record.
+    """
     # gather the 5 oscillator signals from the "medium" timeframe
     # (rsi_medium_sig, stoch_medium_sig, cci_medium_sig, williamsr_medium_sig, macd_medium_sig)
     oscSignals = [
@@ -161,15 +334,22 @@ def compute_all_indicators_and_aggregate(publisher_code, tf="1D"):
     overallSignals = oscSignals + maSignals
     overallSummary = build_summary(overallSignals)
 
-    msg = f"Found {len(records)} rows (tf={tf})"
-    return {
-        "publisher": publisher_code,
-        "records": records,
-        "msg": msg,
-        "oscSummary": oscSummary,
-        "maSummary": maSummary,
-        "overallSummary": overallSummary
+    return oscSummary, maSummary, overallSummary
+
+def columnar_result(result):
+    """
+    (meta, columns) of a compute_all_indicators_and_aggregate result for the
+    columnar encodings (wire_format.py): the date/close history as parallel
+    arrays, the final row's indicator fields and the summaries in meta.
+    """
+    records = result["records"]
+    meta = {k: v for k, v in result.items() if k != "records"}
+    meta["final"] = {k: v for k, v in records[-1].items() if k not in ("date", "close")} if records else {}
+    columns = {
+        "date": [r["date"] for r in records],
+        "close": [r["close"] for r in records],
     }
+    return meta, columns
 
 def build_summary(signal_list):
     buy_count = signal_list.count("Buy")
@@ -184,6 +364,28 @@ def build_summary(signal_list):
     }
 
 
+def storeIndicatorsInFinalRowVector(df, records):
+    """
+    Same fields as storeIndicatorsInFinalRow, from the vectorized kernel
+    (every family and window in one pass over the arrays).
+    """
+    if len(records)==0 or df.empty: return
+    close = df["close"].to_numpy(dtype=float)
+    series = compute_indicators(close, df["high"].to_numpy(dtype=float), df["low"].to_numpy(dtype=float))
+    records[-1].update(record_fields(final_values(series, close)))
+
+def storeIndicatorsInFinalRowStreaming(df, records):
+    """
+    Same fields as storeIndicatorsInFinalRow, but from the streaming engine
+    (one O(1) update per bar instead of a ta object per indicator/window).
+    """
+    if len(records)==0 or df.empty: return
+    engine = IndicatorSet()
+    values = {}
+    for close, high, low in zip(df["close"].tolist(), df["high"].tolist(), df["low"].tolist()):
+        values = engine.update(close, high, low)
+    records[-1].update(record_fields(values))
+
 def storeIndicatorsInFinalRow(df, records, short_win, medium_win, long_win):
     """
     Compute short/medium/long for 5 oscillators + 5 MAs:
@@ -201,11 +403,7 @@ def storeIndicatorsInFinalRow(df, records, short_win, medium_win, long_win):
         rsi_series = RSIIndicator(df["close"], window=window, fillna=False).rsi()
         rsi_val = rsi_series.iloc[-1]
         if math.isnan(rsi_val): return None,None
-        # thresholds
-        if rsi_val>70: s="Sell"
-        elif rsi_val<30: s="Buy"
-        else: s="Hold"
-        return round(rsi_val,2), s
+        return round(rsi_val,2), rsi_signal(rsi_val)
 
     def stoch_calc(window):
         stoch = StochasticOscillator(
@@ -214,10 +412,7 @@ def storeIndicatorsInFinalRow(df, records, short_win, medium_win, long_win):
         )
         k_val = stoch.stoch().iloc[-1]
         if math.isnan(k_val): return None,None
-        if k_val>80: s="Sell"
-        elif k_val<20: s="Buy"
-        else: s="Hold"
-        return round(k_val,2), s
+        return round(k_val,2), stoch_signal(k_val)
 
     def cci_calc(window):
         cci = CCIIndicator(
@@ -226,10 +421,7 @@ def storeIndicatorsInFinalRow(df, records, short_win, medium_win, long_win):
         )
         cci_val = cci.cci().iloc[-1]
         if math.isnan(cci_val): return None,None
-        if cci_val>100: s="Sell"
-        elif cci_val<-100: s="Buy"
-        else: s="Hold"
-        return round(cci_val,2), s
+        return round(cci_val,2), cci_signal(cci_val)
 
     def williams_calc(lbp):
         wr = WilliamsRIndicator(
@@ -238,10 +430,7 @@ def storeIndicatorsInFinalRow(df, records, short_win, medium_win, long_win):
         )
         wv = wr.williams_r().iloc[-1]
         if math.isnan(wv): return None,None
-        if wv>-20: s="Sell"
-        elif wv<-80: s="Buy"
-        else: s="Hold"
-        return round(wv,2), s
+        return round(wv,2), williams_signal(wv)
 
     def macd_calc(fast, slow, sign):
         macd_obj = MACD(close=df["close"], window_slow=slow, window_fast=fast, window_sign=sign, fillna=False)
@@ -249,35 +438,37 @@ def storeIndicatorsInFinalRow(df, records, short_win, medium_win, long_win):
         macdsig_val = macd_obj.macd_signal().iloc[-1]
         if math.isnan(macd_val) or math.isnan(macdsig_val):
             return None,None,None
-        if macd_val>macdsig_val: s="Buy"
-        elif macd_val<macdsig_val: s="Sell"
-        else: s="Hold"
-        return round(macd_val,2), round(macdsig_val,2), s
+        return round(macd_val,2), round(macdsig_val,2), macd_signal(macd_val, macdsig_val)
 
     # We'll define MACD short=(fast=6, slow=13, sign=5), medium=(12,26,9), long=(24,52,18)
     # You can adapt as you like.
 
     # RSI short
-    rsiS_val, rsiS_sig = rsi_calc(short_win)
-    rsiM_val, rsiM_sig = rsi_calc(medium_win)
-    rsiL_val, rsiL_sig = rsi_calc(long_win)
-
-    stochS_val, stochS_sig = stoch_calc(short_win)
-    stochM_val, stochM_sig = stoch_calc(medium_win)
-    stochL_val, stochL_sig = stoch_calc(long_win)
-
-    cciS_val, cciS_sig = cci_calc(short_win)
-    cciM_val, cciM_sig = cci_calc(medium_win)
-    cciL_val, cciL_sig = cci_calc(long_win)
-
-    wS_val, wS_sig = williams_calc(short_win)
-    wM_val, wM_sig = williams_calc(medium_win)
-    wL_val, wL_sig = williams_calc(long_win)
+    with metrics.span("mse_indicator_seconds", family="rsi"):
+        rsiS_val, rsiS_sig = rsi_calc(short_win)
+        rsiM_val, rsiM_sig = rsi_calc(medium_win)
+        rsiL_val, rsiL_sig = rsi_calc(long_win)
+
+    with metrics.span("mse_indicator_seconds", family="stoch"):
+        stochS_val, stochS_sig = stoch_calc(short_win)
+        stochM_val, stochM_sig = stoch_calc(medium_win)
+        stochL_val, stochL_sig = stoch_calc(long_win)
+
+    with metrics.span("mse_indicator_seconds", family="cci"):
+        cciS_val, cciS_sig = cci_calc(short_win)
+        cciM_val, cciM_sig = cci_calc(medium_win)
+        cciL_val, cciL_sig = cci_calc(long_win)
+
+    with metrics.span("mse_indicator_seconds", family="williamsr"):
+        wS_val, wS_sig = williams_calc(short_win)
+        wM_val, wM_sig = williams_calc(medium_win)
+        wL_val, wL_sig = williams_calc(long_win)
 
     # MACD
-    macdS_val, macdS_sigVal, macdS_sig = macd_calc(6,13,5)
-    macdM_val, macdM_sigVal, macdM_sig = macd_calc(12,26,9)
-    macdL_val, macdL_sigVal, macdL_sig = macd_calc(24,52,18)
+    with metrics.span("mse_indicator_seconds", family="macd"):
+        macdS_val, macdS_sigVal, macdS_sig = macd_calc(*MACD_WINDOWS["short"])
+        macdM_val, macdM_sigVal, macdM_sig = macd_calc(*MACD_WINDOWS["medium"])
+        macdL_val, macdL_sigVal, macdL_sig = macd_calc(*MACD_WINDOWS["long"])
 
     # ------------- MOVING AVERAGES -------------
     # 5 MAs: SMA, EMA, WMA, ZLEMA, BollMid
@@ -285,9 +476,7 @@ def storeIndicatorsInFinalRow(df, records, short_win, medium_win, long_win):
         if ma_val is None: return None
         close_val = df["close"].iloc[-1]
         if math.isnan(close_val) or math.isnan(ma_val): return None
-        if close_val> ma_val: return "Buy"
-        elif close_val< ma_val: return "Sell"
-        else: return "Hold"
+        return ma_signal(close_val, ma_val)
 
     def sma_calc(window):
         sma = SMAIndicator(df["close"], window=window, fillna=False).sma_indicator().iloc[-1]
@@ -324,13 +513,19 @@ def storeIndicatorsInFinalRow(df, records, short_win, medium_win, long_win):
         if math.isnan(mid): return None
         return round(mid,2)
 
-    # short:
-    smaS_val = sma_calc(short_win)
-    emaS_val = ema_calc(short_win)
-    wmaS_val = wma_calc(short_win)
-    zlemaS_val= zlema_calc(short_win)
-    bollS_val= boll_calc(short_win)
+    # one span per family over its three windows
+    with metrics.span("mse_indicator_seconds", family="sma"):
+        smaS_val, smaM_val, smaL_val = (sma_calc(w) for w in (short_win, medium_win, long_win))
+    with metrics.span("mse_indicator_seconds", family="ema"):
+        emaS_val, emaM_val, emaL_val = (ema_calc(w) for w in (short_win, medium_win, long_win))
+    with metrics.span("mse_indicator_seconds", family="wma"):
+        wmaS_val, wmaM_val, wmaL_val = (wma_calc(w) for w in (short_win, medium_win, long_win))
+    with metrics.span("mse_indicator_seconds", family="zlema"):
+        zlemaS_val, zlemaM_val, zlemaL_val = (zlema_calc(w) for w in (short_win, medium_win, long_win))
+    with metrics.span("mse_indicator_seconds", family="boll"):
+        bollS_val, bollM_val, bollL_val = (boll_calc(w) for w in (short_win, medium_win, long_win))
 
+    # short:
     smaS_sig = compare_ma(smaS_val)
     emaS_sig = compare_ma(emaS_val)
     wmaS_sig = compare_ma(wmaS_val)
@@ -338,12 +533,6 @@ def storeIndicatorsInFinalRow(df, records, short_win, medium_win, long_win):
     bollS_sig= compare_ma(bollS_val)
 
     # medium
-    smaM_val = sma_calc(medium_win)
-    emaM_val = ema_calc(medium_win)
-    wmaM_val = wma_calc(medium_win)
-    zlemaM_val= zlema_calc(medium_win)
-    bollM_val= boll_calc(medium_win)
-
     smaM_sig = compare_ma(smaM_val)
     emaM_sig = compare_ma(emaM_val)
     wmaM_sig = compare_ma(wmaM_val)
@@ -351,12 +540,6 @@ def storeIndicatorsInFinalRow(df, records, short_win, medium_win, long_win):
     bollM_sig= compare_ma(bollM_val)
 
     # long
-    smaL_val = sma_calc(long_win)
-    emaL_val = ema_calc(long_win)
-    wmaL_val = wma_calc(long_win)
-    zlemaL_val= zlema_calc(long_win)
-    bollL_val= boll_calc(long_win)
-
     smaL_sig = compare_ma(smaL_val)
     emaL_sig = compare_ma(emaL_val)
     wmaL_sig = compare_ma(wmaL_val)
@@ -0,0 +1,211 @@
+"""
+Weekly / monthly / N-day bars built from the daily stock_data rows.
+
+Bars are stored per issuer and timeframe in the `bars` table. When new daily
+rows arrive only the periods they fall into are rebuilt (on_ingest is an
+ingest hook, like indicator_store.on_ingest), so /api/technical_analysis?tf=1W
+reads a few hundred weekly bars instead of resampling the daily history.
+Only the ingest writes bars: load_bars() is read-only and fills in whatever
+the table is missing from the daily rows, in memory.
+
+Timeframes: "1D" (the daily rows themselves), "1W" (weeks from Monday),
+"1M" (calendar months) and "<N>D" for N-day buckets counted from
+1970-01-05 (a Monday), e.g. "5D" or "10D", up to MAX_N_DAYS. Only
+STORED_TIMEFRAMES are kept in the table; other N-day bars are aggregated from
+the daily rows on each request, so request parameters never add series to
+the database (or work to the ingest).
+"""
+import re
+import sqlite3
+import sys
+from datetime import date, timedelta
+from pathlib import Path
+
+STOCK_DB_PATH = Path(__file__).parent / "stock_data.db"
+
+# Built for every issuer at ingest; other N-day periods are never stored
+CACHED_TIMEFRAMES = ("1W", "1M")
+STORED_N_DAYS = ("2D", "3D", "5D", "10D")
+STORED_TIMEFRAMES = CACHED_TIMEFRAMES + STORED_N_DAYS
+MAX_N_DAYS = 365
+
+N_DAY_EPOCH = date(1970, 1, 5)
+
+CREATE_BARS = '''
+    CREATE TABLE IF NOT EXISTS bars (
+        publisher_code TEXT NOT NULL,
+        tf TEXT NOT NULL,
+        period_start TEXT NOT NULL,
+        last_date TEXT NOT NULL,
+        open REAL,
+        close REAL,
+        high REAL,
+        low REAL,
+        volume INTEGER,
+        total_turnover REAL,
+        PRIMARY KEY (publisher_code, tf, period_start)
+    ) WITHOUT ROWID
+'''
+
+def ensure_bars(conn):
+    conn.execute(CREATE_BARS)
+
+def parse_timeframe(tf):
+    """'1W' -> ('W', 1), '1M' -> ('M', 1), '5D' -> ('D', 5). Raises ValueError."""
+    match = re.fullmatch(r"(\d+)([DWM])", (tf or "").strip().upper())
+    if not match or int(match.group(1)) < 1:
+        raise ValueError(f"Unknown timeframe {tf!r} (use 1D, 1W, 1M or <N>D)")
+    unit, count = match.group(2), int(match.group(1))
+    if unit != "D" and count != 1:
+        raise ValueError(f"Unknown timeframe {tf!r} (only 1W and 1M are supported)")
+    if count > MAX_N_DAYS:
+        raise ValueError(f"Unknown timeframe {tf!r} (at most {MAX_N_DAYS}D)")
+    return unit, count
+
+def period_start(day, tf):
+    """First calendar day of the period of `tf` that contains `day` (a date)."""
+    unit, count = parse_timeframe(tf)
+    if unit == "W":
+        return day - timedelta(days=day.weekday())
+    if unit == "M":
+        return day.replace(day=1)
+    offset = (day - N_DAY_EPOCH).days // count * count
+    return N_DAY_EPOCH + timedelta(days=offset)
+
+def aggregate(rows, tf):
+    """Daily (date, price, max, min, quantity, total_turnover) rows, sorted by
+    date -> bars (period_start, last_date, open, close, high, low, volume, turnover).
+
+    open/close are the first/last price of the period, high/low the extremes of
+    the daily max/min (NULL only if no day in the period has one).
+    """
+    bars = []
+    current = None
+    for day, price, high, low, quantity, turnover in rows:
+        start = period_start(date.fromisoformat(day), tf).isoformat()
+        if current is None or current[0] != start:
+            if current is not None:
+                bars.append(tuple(current))
+            current = [start, day, price, price, high, low, quantity or 0, turnover or 0.0]
+            continue
+        current[1] = day
+        current[3] = price
+        if high is not None:
+            current[4] = high if current[4] is None else max(current[4], high)
+        if low is not None:
+            current[5] = low if current[5] is None else min(current[5], low)
+        current[6] += quantity or 0
+        current[7] += turnover or 0.0
+    if current is not None:
+        bars.append(tuple(current))
+    return bars
+
+def daily_rows(conn, publisher_code, start=""):
+    """The rows aggregate() takes, from `start` (ISO date) on."""
+    return conn.execute('''
+        SELECT date, price, max, min, quantity, total_turnover
+        FROM stock_data
+        WHERE publisher_code = ? AND date >= ? AND price IS NOT NULL
+        ORDER BY date ASC
+    ''', (publisher_code, start)).fetchall()
+
+def update_bars(conn, publisher_code, tf, since=None):
+    """Rebuild the `tf` bars of one issuer from the period containing `since`
+    (ISO date; None = from the stored bars' last day, or everything).
+    Returns the number of bars written."""
+    ensure_bars(conn)
+    if since is None:
+        found = conn.execute(
+            "SELECT MAX(last_date) FROM bars WHERE publisher_code = ? AND tf = ?",
+            (publisher_code, tf)
+        ).fetchone()
+        since = found[0]
+    start = period_start(date.fromisoformat(since), tf).isoformat() if since else ""
+
+    bars = aggregate(daily_rows(conn, publisher_code, start), tf)
+
+    conn.execute(
+        "DELETE FROM bars WHERE publisher_code = ? AND tf = ? AND period_start >= ?",
+        (publisher_code, tf, start)
+    )
+    conn.executemany('''
+        INSERT INTO bars (publisher_code, tf, period_start, last_date, open, close,
+                          high, low, volume, total_turnover)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', [(publisher_code, tf) + bar for bar in bars])
+    return len(bars)
+
+def on_ingest(conn, touched):
+    """Ingest hook: `touched` maps publisher_code -> oldest date just written.
+
+    Series outside STORED_TIMEFRAMES (left by older versions, which stored
+    every requested timeframe) are dropped.
+    """
+    stored = ", ".join("?" * len(STORED_TIMEFRAMES))
+    with conn:
+        ensure_bars(conn)
+        for publisher_code, since in touched.items():
+            conn.execute(
+                f"DELETE FROM bars WHERE publisher_code = ? AND tf NOT IN ({stored})",
+                (publisher_code,) + STORED_TIMEFRAMES
+            )
+            cached = {row[0] for row in conn.execute(
+                "SELECT DISTINCT tf FROM bars WHERE publisher_code = ?", (publisher_code,)
+            )}
+            for tf in STORED_TIMEFRAMES:
+                update_bars(conn, publisher_code, tf, since if tf in cached else None)
+
+def aggregate_daily(conn, publisher_code, tf, start=""):
+    """Bars of `tf` from `start` (a period start) on, in load_bars() columns,
+    aggregated from the daily rows without storing them."""
+    return [(b[0], b[3], b[6], b[4], b[5])
+            for b in aggregate(daily_rows(conn, publisher_code, start), tf)]
+
+def load_bars(conn, publisher_code, tf):
+    """[(period_start, close, volume, high, low), ...] for `tf`, oldest first
+    (the column order of technical_analysis's daily query).
+
+    Read-only: STORED_TIMEFRAMES come from the bars table, and if the table is
+    behind the daily data (an ingest without the hooks) the periods from its
+    last one on are aggregated from the daily rows. Other timeframes, and
+    issuers without stored bars, are aggregated from the daily rows entirely.
+    """
+    parse_timeframe(tf)
+    if tf not in STORED_TIMEFRAMES:
+        return aggregate_daily(conn, publisher_code, tf)
+    try:
+        latest, stored = conn.execute('''
+            SELECT (SELECT MAX(date) FROM stock_data
+                    WHERE publisher_code = ? AND price IS NOT NULL),
+                   (SELECT MAX(last_date) FROM bars WHERE publisher_code = ? AND tf = ?)
+        ''', (publisher_code, publisher_code, tf)).fetchone()
+    except sqlite3.OperationalError:
+        return aggregate_daily(conn, publisher_code, tf)    # no bars table yet
+    if stored is None:
+        return aggregate_daily(conn, publisher_code, tf)
+    sql = '''
+        SELECT period_start, close, volume, high, low
+        FROM bars
+        WHERE publisher_code = ? AND tf = ?
+    '''
+    if latest == stored:
+        return conn.execute(sql + " ORDER BY period_start ASC", (publisher_code, tf)).fetchall()
+    # behind: the last stored period may be incomplete, rebuild it with what follows
+    start = period_start(date.fromisoformat(stored), tf).isoformat()
+    bars = conn.execute(sql + " AND period_start < ? ORDER BY period_start ASC",
+                        (publisher_code, tf, start)).fetchall()
+    return bars + aggregate_daily(conn, publisher_code, tf, start)
+
+def rebuild_all(db_path=STOCK_DB_PATH):
+    conn = sqlite3.connect(db_path)
+    with conn:
+        ensure_bars(conn)
+        conn.execute("DELETE FROM bars")
+        codes = [row[0] for row in conn.execute("SELECT DISTINCT publisher_code FROM stock_data")]
+        for code in codes:
+            counts = {tf: update_bars(conn, code, tf) for tf in STORED_TIMEFRAMES}
+            print(f"{code}: {counts}")
+    conn.close()
+
+if __name__ == "__main__":
+    rebuild_all(Path(sys.argv[1]) if len(sys.argv) > 1 else STOCK_DB_PATH)
@@ -0,0 +1,111 @@
+"""
+Response encodings for the price-history endpoints.
+
+Clients pick one with the Accept header (or ?format= for quick testing):
+
+  application/json                      rows, [{"date": ..., "price": ...}, ...] (default)
+  application/vnd.mse.columns+json      parallel arrays, {"date": [...], "price": [...]}
+  application/vnd.mse.packed            binary columns, see pack()
+  application/vnd.apache.arrow.stream   Arrow IPC stream (needs pyarrow)
+
+The columnar encodings are built straight from the query's column lists, so
+no per-row dict is allocated.
+"""
+import json
+import struct
+
+import numpy as np
+
+JSON_ROWS = "application/json"
+JSON_COLUMNS = "application/vnd.mse.columns+json"
+PACKED = "application/vnd.mse.packed"
+ARROW = "application/vnd.apache.arrow.stream"
+
+FORMATS = {"rows": JSON_ROWS, "columns": JSON_COLUMNS, "packed": PACKED, "arrow": ARROW}
+
+# Column types: dates travel as int32 days since 1970-01-01 in the binary
+# encodings; NULL prices become NaN, NULL volumes 0
+DTYPES = {"date": "date", "volume": "int64"}
+
+def arrow_available():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+def negotiate(accept_mimetypes, format_param=None):
+    """The mimetype to answer with. Raises ValueError for an unknown ?format=."""
+    if format_param:
+        if format_param not in FORMATS:
+            raise ValueError(f"Unknown format {format_param!r} (choose from {list(FORMATS)})")
+        mimetype = FORMATS[format_param]
+        if mimetype == ARROW and not arrow_available():
+            raise ValueError("format=arrow needs pyarrow on the server")
+        return mimetype
+    offered = [JSON_ROWS, JSON_COLUMNS, PACKED] + ([ARROW] if arrow_available() else [])
+    return accept_mimetypes.best_match(offered, default=JSON_ROWS) or JSON_ROWS
+
+def dtype_of(name):
+    return DTYPES.get(name, "float64")
+
+def _array(name, values):
+    dtype = dtype_of(name)
+    if dtype == "date":
+        return np.array(values, dtype="datetime64[D]").astype(np.int32)
+    if dtype == "int64":
+        return np.array([0 if v is None else v for v in values], dtype=np.int64)
+    return np.array(values, dtype=np.float64)     # None -> NaN
+
+def pack(meta, columns):
+    """Binary layout:
+
+        uint32 (little endian)  length of the JSON header
+        JSON header             meta plus {"rows": n, "columns": [{"name", "dtype",
+                                "offset", "length"}, ...]}; offsets are relative to
+                                the end of the header and 8-byte aligned
+        column data             little-endian int32 / int64 / float64 arrays
+
+    In JavaScript each column is e.g. new Float64Array(buf, base + offset, length).
+    """
+    arrays = [(name, _array(name, values)) for name, values in columns.items()]
+    layout, offset = [], 0
+    for name, array in arrays:
+        layout.append({"name": name, "dtype": str(array.dtype), "offset": offset, "length": len(array)})
+        offset += -(-array.nbytes // 8) * 8
+    rows = len(arrays[0][1]) if arrays else 0
+    header = json.dumps(dict(meta, rows=rows, columns=layout), separators=(",", ":")).encode()
+    header += b" " * (-(len(header) + 4) % 8)     # keep the data 8-byte aligned
+    parts = [struct.pack("<I", len(header)), header]
+    for name, array in arrays:
+        data = array.astype(array.dtype.newbyteorder("<"), copy=False).tobytes()
+        parts.append(data + b"\0" * (-len(data) % 8))
+    return b"".join(parts)
+
+def to_arrow(meta, columns):
+    """Arrow IPC stream; `meta` goes into the schema metadata as JSON."""
+    import pyarrow as pa
+    fields, arrays = [], []
+    for name, values in columns.items():
+        array = _array(name, values)
+        if dtype_of(name) == "date":
+            arrays.append(pa.array(array, type=pa.int32()).cast(pa.date32()))
+        else:
+            arrays.append(pa.array(array))
+        fields.append(name)
+    table = pa.Table.from_arrays(arrays, names=fields)
+    table = table.replace_schema_metadata({"meta": json.dumps(meta)})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+def encode(mimetype, meta, columns, json_dumps=json.dumps):
+    """Bytes of a columnar payload: `meta` (small dict) plus {name: list}."""
+    if mimetype == PACKED:
+        return pack(meta, columns)
+    if mimetype == ARROW:
+        return to_arrow(meta, columns)
+    payload = dict(meta)
+    payload["columns"] = columns
+    return json_dumps(payload).encode()